@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark importing dayu_widgets, and building the default theme on first use.
+
+Each sample runs in a fresh interpreter, the Qt binding is imported before
+the timer starts so only dayu_widgets itself is measured.
+
+usage: python -m benchmarks.import_benchmark --repeat 10
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import built-in modules
+import argparse
+import subprocess
+import sys
+
+
+SAMPLE_CODE = """
+import timeit
+from Qt import QtCore, QtGui, QtWidgets
+from Qt.QtSvg import QSvgRenderer
+import_cost = timeit.timeit("import dayu_widgets", number=1)
+from dayu_widgets import dayu_theme
+theme_cost = timeit.timeit(lambda: dayu_theme.primary_color, number=1)
+print(import_cost, theme_cost)
+"""
+
+
+def run_sample():
+    output = subprocess.check_output([sys.executable, "-c", SAMPLE_CODE])
+    import_cost, theme_cost = output.decode().split()
+    return float(import_cost), float(theme_cost)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    sample_list = [run_sample() for _ in range(args.repeat)]
+    import_list = sorted(sample[0] for sample in sample_list)
+    theme_list = sorted(sample[1] for sample in sample_list)
+    print(
+        "import dayu_widgets: {:.2f}ms, build the default theme: {:.2f}ms "
+        "(median of {})".format(
+            import_list[len(import_list) // 2] * 1000,
+            theme_list[len(theme_list) // 2] * 1000,
+            args.repeat,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
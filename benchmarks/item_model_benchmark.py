@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark MTableModel.data() while scrolling a large table.
+
+It simulates what a MTableView asks the model for on every repaint:
+all the visible cells, each with the roles that QStyledItemDelegate queries.
+
+usage: python -m benchmarks.item_model_benchmark --rows 100000 --columns 20
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import built-in modules
+import argparse
+import datetime as dt
+import timeit
+
+# Import third-party modules
+from Qt import QtCore
+from Qt import QtWidgets
+from dayu_widgets.item_model import MTableModel
+
+
+PAINT_ROLE_LIST = [
+    QtCore.Qt.FontRole,
+    QtCore.Qt.TextAlignmentRole,
+    QtCore.Qt.ForegroundRole,
+    QtCore.Qt.CheckStateRole,
+    QtCore.Qt.DecorationRole,
+    QtCore.Qt.DisplayRole,
+    QtCore.Qt.BackgroundRole,
+]
+
+
+def make_header_list(column_count):
+    header_list = []
+    for column in range(column_count):
+        attr_dict = {"label": "Column {}".format(column), "key": "c{}".format(column)}
+        if column == 0:
+            attr_dict.update({"checkable": True, "font": lambda x, y: {"bold": True}})
+        elif column % 4 == 1:
+            attr_dict.update(
+                {"color": lambda x, y: "#f5222d" if x < 0.5 else "#52c41a"}
+            )
+        elif column % 4 == 2:
+            attr_dict.update({"display": lambda x, y: "{} %".format(x)})
+        elif column % 4 == 3:
+            attr_dict.update({"alignment": "right", "bg_color": "#323232"})
+        header_list.append(attr_dict)
+    return header_list
+
+
+def make_data_list(row_count, column_count):
+    now = dt.datetime.now()
+    data_list = []
+    for row in range(row_count):
+        data_dict = {"c0": "shot_{:06d}".format(row)}
+        for column in range(1, column_count):
+            if column % 4 == 0:
+                data_dict["c{}".format(column)] = now
+            else:
+                data_dict["c{}".format(column)] = (row * column % 97) / 97.0
+        data_list.append(data_dict)
+    return data_list
+
+
+def scroll(model, visible_rows, frames, repaints=1):
+    row_count = model.rowCount()
+    column_count = model.columnCount()
+    step = max(1, (row_count - visible_rows) // max(1, frames - 1))
+    for frame in range(frames):
+        top = min(frame * step, row_count - visible_rows)
+        for _ in range(repaints):
+            for row in range(top, top + visible_rows):
+                for column in range(column_count):
+                    index = model.index(row, column)
+                    for role in PAINT_ROLE_LIST:
+                        model.data(index, role)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=20)
+    parser.add_argument("--visible-rows", type=int, default=40)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--repaints", type=int, default=1, help="paints per frame")
+    parser.add_argument("--cache-size", type=int, default=0)
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication([])
+    model = MTableModel()
+    model.set_header_list(make_header_list(args.columns))
+    model.set_cache_size(args.cache_size)
+    model.set_data_list(make_data_list(args.rows, args.columns))
+
+    cost = timeit.timeit(
+        lambda: scroll(model, args.visible_rows, args.frames, args.repaints), number=1
+    )
+    call_count = (
+        args.frames
+        * args.repaints
+        * args.visible_rows
+        * args.columns
+        * len(PAINT_ROLE_LIST)
+    )
+    print(
+        "{} x {} table, {} frames: {:.3f}s, {:.2f}ms/frame, {:.2f}us/data()".format(
+            args.rows,
+            args.columns,
+            args.frames,
+            cost,
+            cost * 1000 / args.frames,
+            cost * 1000000 / call_count,
+        )
+    )
+    if args.cache_size:
+        print("cache: {}".format(model.cache_info()))
+    return app
+
+
+if __name__ == "__main__":
+    main()
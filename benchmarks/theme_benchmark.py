@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark building a form of many widgets, which read the theme sizes in their constructors,
+applying the theme style sheet to many widgets, and switching the theme of a large window.
+
+usage: python -m benchmarks.theme_benchmark --widgets 500 --applies 200 --switch-widgets 2000
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import built-in modules
+import argparse
+import timeit
+
+# Import third-party modules
+from Qt import QtWidgets
+from dayu_widgets import dayu_theme
+from dayu_widgets.avatar import MAvatar
+from dayu_widgets.check_box import MCheckBox
+from dayu_widgets.line_edit import MLineEdit
+from dayu_widgets.push_button import MPushButton
+from dayu_widgets.switch import MSwitch
+from dayu_widgets.tool_button import MToolButton
+
+
+SIZE_NAME_LIST = ["tiny", "small", "medium", "large", "huge", "default_size"]
+
+
+def build_form(widget_count):
+    form = QtWidgets.QWidget()
+    lay = QtWidgets.QVBoxLayout()
+    widget_cls_list = [MAvatar, MCheckBox, MLineEdit, MPushButton, MSwitch, MToolButton]
+    for index in range(widget_count):
+        widget = widget_cls_list[index % len(widget_cls_list)]()
+        widget.setParent(form)
+        lay.addWidget(widget)
+    form.setLayout(lay)
+    return form
+
+
+def apply_theme(count):
+    widget_list = [QtWidgets.QWidget() for _ in range(count)]
+    for widget in widget_list:
+        dayu_theme.apply(widget)
+    return widget_list
+
+
+def switch_theme(window, count):
+    for index in range(count):
+        dayu_theme.set_theme("light" if index % 2 else "dark")
+        # the style sheet is polished lazily, layout and paint the window like a frame
+        window.grab()
+
+
+def read_sizes(count):
+    for _ in range(count):
+        for name in SIZE_NAME_LIST:
+            getattr(dayu_theme, name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--widgets", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=10000)
+    parser.add_argument("--applies", type=int, default=200)
+    parser.add_argument("--switch-widgets", type=int, default=2000)
+    parser.add_argument("--switches", type=int, default=4)
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication([])
+    cost = timeit.timeit(lambda: build_form(args.widgets), number=1)
+    print("build {} widgets: {:.3f}s".format(args.widgets, cost))
+    cost = timeit.timeit(lambda: read_sizes(args.reads), number=1)
+    read_count = args.reads * len(SIZE_NAME_LIST)
+    print(
+        "read {} theme sizes: {:.3f}s, {:.2f}us/read".format(
+            read_count, cost, cost * 1000000 / read_count
+        )
+    )
+    cost = timeit.timeit(lambda: apply_theme(args.applies), number=1)
+    print(
+        "apply theme on {} widgets: {:.3f}s, {:.2f}ms/apply".format(
+            args.applies, cost, cost * 1000 / args.applies
+        )
+    )
+
+    window = build_form(args.switch_widgets)
+    dayu_theme.apply(window)
+    window.show()
+    cost = timeit.timeit(lambda: switch_theme(window, args.switches), number=1)
+    print(
+        "switch theme of {} widgets: {:.3f}s/switch".format(
+            args.switch_widgets, cost / args.switches
+        )
+    )
+    return app
+
+
+if __name__ == "__main__":
+    main()
@@ -110,9 +110,7 @@ class MColorPaletteDialog(QtWidgets.QDialog):
             "background-color:{};".format(self.primary_color.name())
         )
         self.color_label.setText(self.primary_color.name())
-        self.color_chart.set_colors(
-            [utils.generate_color(self.primary_color, index + 1) for index in range(10)]
-        )
+        self.color_chart.set_colors(list(utils.generate_palette(self.primary_color)))
 
 
 if __name__ == "__main__":
@@ -72,9 +72,7 @@ class MHeaderView(QtWidgets.QHeaderView):
             context_menu.addSeparator()
 
         fit_action = context_menu.addAction(self.tr("Fit Size"))
-        fit_action.triggered.connect(
-            functools.partial(self._slot_set_resize_mode, True)
-        )
+        fit_action.triggered.connect(self.fit_section_sizes)
         context_menu.addSeparator()
         for column in range(self.count()):
             action = context_menu.addAction(
@@ -91,35 +89,71 @@ class MHeaderView(QtWidgets.QHeaderView):
     def _slot_set_select(self, column, state):
         current_model = self.model()
         source_model = utils.real_model(current_model)
-        source_model.beginResetModel()
-        attr = "{}_checked".format(source_model.header_list[column].get("key"))
-        for row in range(current_model.rowCount()):
-            real_index = utils.real_index(current_model.index(row, column))
-            data_obj = real_index.internalPointer()
-            if state is None:
-                old_state = utils.get_obj_value(data_obj, attr)
-                utils.set_obj_value(
-                    data_obj,
-                    attr,
-                    Qt.UnchQtCore.Qtked
-                    if old_state == QtCore.Qt.Checked
-                    else QtCore.Qt.Checked,
-                )
-            else:
-                utils.set_obj_value(data_obj, attr, state)
-        source_model.endResetModel()
-        source_model.dataChanged.emit(None, None)
+        source_model.set_check_state(
+            [
+                utils.real_index(current_model.index(row, column))
+                for row in range(current_model.rowCount())
+            ],
+            state,
+        )
 
     @QtCore.Slot(QtCore.QModelIndex, int)
     def _slot_set_section_visible(self, index, flag):
         self.setSectionHidden(index, not flag)
 
-    @QtCore.Slot(bool)
-    def _slot_set_resize_mode(self, flag):
-        if flag:
+    @QtCore.Slot()
+    def fit_section_sizes(self, sample_size=100):
+        """
+        Fit the column widths to the contents like ResizeToContents,
+        but only measure the visible rows and a random sample of the others,
+        so it keeps fast with large data.
+        The visible child rows of a tree view are measured, but the sample only
+        picks top level rows, the expanded child rows out of the viewport are not
+        measured.
+        :param sample_size: how many not visible top level rows are measured
+        :return: None
+        """
+        view = self.parent()
+        model = self.model()
+        if (
+            self.orientation() != QtCore.Qt.Horizontal
+            or model is None
+            or not isinstance(view, QtWidgets.QAbstractItemView)
+        ):
             self.resizeSections(QtWidgets.QHeaderView.ResizeToContents)
-        else:
-            self.resizeSections(QtWidgets.QHeaderView.Interactive)
+            return
+        row_count = model.rowCount()
+        viewport_height = view.viewport().height()
+        first_index = view.indexAt(QtCore.QPoint(0, 0))
+        last_index = view.indexAt(QtCore.QPoint(0, viewport_height - 1))
+        row_list = utils.get_sample_rows(
+            row_count,
+            _get_top_level_row(first_index, 0),
+            _get_top_level_row(last_index, row_count - 1),
+            sample_size=sample_size,
+            seed=row_count,
+        )
+        # (row, parent index, indentation of the first column)
+        row_info_list = [(row, QtCore.QModelIndex(), 0) for row in row_list]
+        if isinstance(view, QtWidgets.QTreeView):
+            if view.rootIsDecorated():
+                row_info_list = [
+                    (row, parent_index, view.indentation())
+                    for row, parent_index, _ in row_info_list
+                ]
+            row_info_list.extend(_get_visible_child_rows(view, first_index, last_index))
+        for column in range(self.count()):
+            if self.isSectionHidden(column):
+                continue
+            width = self.sectionSizeHint(column)
+            for row, parent_index, indentation in row_info_list:
+                index = model.index(row, column, parent_index)
+                width = max(
+                    width,
+                    view.sizeHintForIndex(index).width()
+                    + (indentation if column == 0 else 0),
+                )
+            self.resizeSection(column, width)
 
     def setClickable(self, flag):
         try:
@@ -144,3 +178,39 @@ class MHeaderView(QtWidgets.QHeaderView):
             QtWidgets.QHeaderView.setResizeMode(self, mode)
         except AttributeError:
             QtWidgets.QHeaderView.setSectionResizeMode(self, mode)
+
+
+def _get_visible_child_rows(view, first_index, last_index):
+    """
+    Get the child rows shown in the viewport of the tree view.
+    :return: list of (row, parent index, indentation of the first column)
+    """
+    row_info_list = []
+    index = first_index.sibling(first_index.row(), 0)
+    last_index = last_index.sibling(last_index.row(), 0)
+    while index.isValid():
+        parent_index = index.parent()
+        if parent_index.isValid():
+            depth = 1
+            ancestor_index = parent_index
+            while ancestor_index.parent().isValid():
+                ancestor_index = ancestor_index.parent()
+                depth += 1
+            if view.rootIsDecorated():
+                depth += 1
+            row_info_list.append(
+                (index.row(), parent_index, depth * view.indentation())
+            )
+        if index == last_index:
+            break
+        index = view.indexBelow(index)
+    return row_info_list
+
+
+def _get_top_level_row(index, default):
+    """Get the row of the top level ancestor of the index."""
+    if not index.isValid():
+        return default
+    while index.parent().isValid():
+        index = index.parent()
+    return index.row()
@@ -11,20 +11,28 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+# Import built-in modules
+import collections
+import weakref
+
 # Import third-party modules
 from Qt import QtCore
-from Qt import QtGui
-from dayu_widgets.utils import apply_formatter
 from dayu_widgets.utils import display_formatter
-from dayu_widgets.utils import font_formatter
 from dayu_widgets.utils import get_obj_value
 from dayu_widgets.utils import icon_formatter
+from dayu_widgets.utils import interned_color
+from dayu_widgets.utils import interned_font
+from dayu_widgets.utils import interned_size
+from dayu_widgets.utils import real_index
 from dayu_widgets.utils import set_obj_value
 import six
 
 
+# The image file path of the item, loaded in the background by MThumbnailLoader
+THUMBNAIL_ROLE = int(QtCore.Qt.UserRole) + 1
+
 SETTING_MAP = {
-    QtCore.Qt.BackgroundRole: {"config": "bg_color", "formatter": QtGui.QColor},
+    QtCore.Qt.BackgroundRole: {"config": "bg_color", "formatter": interned_color},
     QtCore.Qt.DisplayRole: {"config": "display", "formatter": display_formatter},
     QtCore.Qt.EditRole: {"config": "edit", "formatter": None},
     QtCore.Qt.TextAlignmentRole: {
@@ -35,8 +43,8 @@ SETTING_MAP = {
             "center": QtCore.Qt.AlignCenter,
         },
     },
-    QtCore.Qt.ForegroundRole: {"config": "color", "formatter": QtGui.QColor},
-    QtCore.Qt.FontRole: {"config": "font", "formatter": font_formatter},
+    QtCore.Qt.ForegroundRole: {"config": "color", "formatter": interned_color},
+    QtCore.Qt.FontRole: {"config": "font", "formatter": interned_font},
     QtCore.Qt.DecorationRole: {"config": "icon", "formatter": icon_formatter},
     QtCore.Qt.ToolTipRole: {"config": "tooltip", "formatter": display_formatter},
     QtCore.Qt.InitialSortOrderRole: {
@@ -46,31 +54,482 @@ SETTING_MAP = {
             "des": QtCore.Qt.DescendingOrder,
         },
     },
-    QtCore.Qt.SizeHintRole: {
-        "config": "size",
-        "formatter": lambda args: QtCore.QSize(*args),
-    },
+    QtCore.Qt.SizeHintRole: {"config": "size", "formatter": interned_size},
     QtCore.Qt.UserRole: {"config": "data"},  # anything
+    THUMBNAIL_ROLE: {"config": "thumbnail", "formatter": None},
 }
 
 
+def check_state_value(state):
+    """Get the int value of a Qt.CheckState, it can be an enum object or an int."""
+    return int(getattr(state, "value", state))
+
+
+_UNCHECKED = check_state_value(QtCore.Qt.Unchecked)
+_PARTIALLY_CHECKED = check_state_value(QtCore.Qt.PartiallyChecked)
+_CHECKED = check_state_value(QtCore.Qt.Checked)
+
+
+def _return_none(data_obj):
+    return None
+
+
+def compile_role_resolver(attr_dict, role):
+    """
+    Compile one column's header config into a callable for the given role.
+    The callable accepts the row's data object and returns the role data,
+    it does the same as apply the config formatter and then the SETTING_MAP formatter.
+    :param attr_dict: one header config dict
+    :param role: Qt.ItemDataRole
+    :return: callable, or None when the role is not configured for this column
+    """
+    key = attr_dict.get("key")
+    if role == QtCore.Qt.CheckStateRole:
+        if not attr_dict.get("checkable", False):
+            return None
+        checked_key = key + "_checked"
+
+        def _resolve_check_state(data_obj):
+            state = get_obj_value(data_obj, checked_key)
+            return QtCore.Qt.Unchecked if state is None else state
+
+        return _resolve_check_state
+
+    setting = SETTING_MAP.get(role)
+    if setting is None:
+        return None
+    formatter_from_config = attr_dict.get(setting.get("config"))  # header中该role的配置
+    if not formatter_from_config and role not in [
+        QtCore.Qt.DisplayRole,
+        QtCore.Qt.EditRole,
+        QtCore.Qt.ToolTipRole,
+    ]:
+        # 如果header中没有配置该role，而且也不是 DisplayRole/EditRole，直接返回None
+        return None
+
+    # 与 apply_formatter 的判断顺序保持一致
+    if formatter_from_config is None:
+
+        def _get_value(data_obj):
+            return get_obj_value(data_obj, key)
+
+    elif isinstance(formatter_from_config, dict):
+
+        def _get_value(data_obj):
+            return formatter_from_config.get(get_obj_value(data_obj, key), None)
+
+    elif callable(formatter_from_config):
+
+        def _get_value(data_obj):
+            return formatter_from_config(get_obj_value(data_obj, key), data_obj)
+
+    else:
+
+        def _get_value(data_obj):
+            return formatter_from_config
+
+    formatter_from_model = setting.get("formatter", None)  # role 配置的转换函数
+    if formatter_from_model is None:
+        return _get_value
+    elif isinstance(formatter_from_model, dict):
+
+        def _resolve(data_obj):
+            return formatter_from_model.get(_get_value(data_obj), None)
+
+    elif callable(formatter_from_model):
+
+        def _resolve(data_obj):
+            return formatter_from_model(_get_value(data_obj))
+
+    else:
+
+        def _resolve(data_obj):
+            return formatter_from_model
+
+    return _resolve
+
+
+def compile_text_matcher(pattern, syntax=QtCore.QRegExp.Wildcard):
+    """
+    Compile a case insensitive pattern into a plain string matcher if it does not
+    really need the regular expression engine.
+    The matcher accepts a lowercase text and returns whether it matches.
+    Wildcard patterns are searched in the text, like QRegExp.indexIn.
+    RegExp patterns must match the whole text, like QRegExp.exactMatch.
+    :param pattern: string pattern
+    :param syntax: QRegExp.Wildcard or QRegExp.RegExp
+    :return: callable, or None when QRegExp is still needed
+    """
+    if syntax == QtCore.QRegExp.Wildcard:
+        needle = pattern.strip("*")
+        if needle and not any(char in needle for char in "*?[]\\"):
+            needle = needle.lower()
+            return lambda text: needle in text
+        return None
+
+    starts_any = pattern.startswith(".*")
+    ends_any = pattern.endswith(".*") and not pattern.endswith("\\.*")
+    needle = pattern[2 if starts_any else 0 : -2 if ends_any else None]
+    if not needle or any(char in needle for char in ".^$*+?()[]{}|\\"):
+        return None
+    needle = needle.lower()
+    if starts_any and ends_any:
+        return lambda text: needle in text
+    if starts_any:
+        return lambda text: text.endswith(needle)
+    if ends_any:
+        return lambda text: text.startswith(needle)
+    return lambda text: text == needle
+
+
+def group_row_ranges(row_list):
+    """
+    Group the rows into contiguous ranges.
+    :param row_list: iterable of int, can be unsorted and duplicated
+    :return: list of (first, last) tuple, ascending
+    """
+    range_list = []
+    for row in sorted(set(row_list)):
+        if range_list and range_list[-1][1] == row - 1:
+            range_list[-1] = (range_list[-1][0], row)
+        else:
+            range_list.append((row, row))
+    return range_list
+
+
+def get_sort_key_func(attr_dict):
+    """
+    Get the sort key function of one header config.
+    It uses the "sort_key": callable(value, data_obj) config, or the raw value.
+    :param attr_dict: one header config dict
+    :return: callable(data_obj)
+    """
+    key = attr_dict.get("key")
+    sort_key = attr_dict.get("sort_key")
+    if callable(sort_key):
+        return lambda data_obj: sort_key(get_obj_value(data_obj, key), data_obj)
+    return lambda data_obj: get_obj_value(data_obj, key)
+
+
+def is_iterator(obj):
+    """Return whether the given obj is a python2/python3 iterator (eg. generator)."""
+    return hasattr(obj, "__next__") or hasattr(obj, "next")
+
+
+class MDataSource(object):
+    """
+    Data source protocol for MTableModel.set_data_source.
+    The model only asks for the rows the views need, so the whole dataset never
+    has to be loaded as a python list. Subclass it and implement row_count and
+    fetch_rows, fetch_children is optional for hierarchical data.
+    """
+
+    def row_count(self):
+        """Return the total row count."""
+        raise NotImplementedError()
+
+    def fetch_rows(self, start, count):
+        """Return the list of dict/object records in range [start, start + count)."""
+        raise NotImplementedError()
+
+    def fetch_children(self, data_obj):
+        """
+        Return the children of the given record: a MDataSource, a list or None.
+        It is only called when the children of the record are needed.
+        """
+        return None
+
+
+class MVirtualRowList(object):
+    """
+    A read-only list-like view of a MDataSource.
+    Rows are fetched by blocks, and only the recently used blocks are kept.
+    """
+
+    def __init__(self, data_source, block_size=256, cache_blocks=64, on_evict=None):
+        self.data_source = data_source
+        self.block_size = max(1, block_size)
+        self.cache_blocks = max(1, cache_blocks)
+        # called with the records of the block to evict and their cached
+        # descendants, return False to keep it
+        self.on_evict = on_evict
+        self._count = None
+        # block number -> list of records
+        self._block_cache = collections.OrderedDict()
+        # id(record) -> row, id(record) -> children list of the cached records
+        self._row_dict = {}
+        self._children_dict = {}
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.data_source.row_count()
+        return self._count
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("row {} out of range".format(row))
+        block, offset = divmod(row, self.block_size)
+        block_list = self._block_cache.pop(block, None)
+        if block_list is None:
+            block_list = self._fetch_block(block)
+        self._block_cache[block] = block_list
+        return block_list[offset] if offset < len(block_list) else None
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def _fetch_block(self, block):
+        start = block * self.block_size
+        count = min(self.block_size, len(self) - start)
+        block_list = list(self.data_source.fetch_rows(start, count) or [])
+        self._row_dict.update(
+            (id(item), row) for row, item in enumerate(block_list, start)
+        )
+        self._evict()
+        return block_list
+
+    def _evict(self):
+        for block in list(self._block_cache.keys()):
+            if len(self._block_cache) < self.cache_blocks:
+                break
+            block_list = self._block_cache.pop(block)
+            if self.on_evict is not None and (
+                self.on_evict(list(self._iter_cached_items(block_list))) is False
+            ):
+                # still in use, keep it as the most recently used
+                self._block_cache[block] = block_list
+                continue
+            for item in block_list:
+                self._row_dict.pop(id(item), None)
+                self._children_dict.pop(id(item), None)
+
+    def _iter_cached_items(self, block_list):
+        for item in block_list:
+            yield item
+            children_obj = self._children_dict.get(id(item))
+            if isinstance(children_obj, MVirtualRowList):
+                for children_block_list in children_obj._block_cache.values():
+                    for child in children_obj._iter_cached_items(children_block_list):
+                        yield child
+            elif isinstance(children_obj, list):
+                for child in children_obj:
+                    yield child
+
+    def row_of(self, data_obj):
+        """Get the row of a cached record, None if it is not cached."""
+        return self._row_dict.get(id(data_obj))
+
+    def children_of(self, data_obj):
+        """Get the children list of a cached record, None if it has no children."""
+        key = id(data_obj)
+        if key not in self._children_dict:
+            if key not in self._row_dict:
+                return None
+            children_obj = self.data_source.fetch_children(data_obj)
+            if isinstance(children_obj, MDataSource):
+                children_obj = MVirtualRowList(
+                    children_obj,
+                    block_size=self.block_size,
+                    cache_blocks=self.cache_blocks,
+                    on_evict=self.on_evict,
+                )
+            self._children_dict[key] = children_obj
+        return self._children_dict[key]
+
+    def cached_rows(self):
+        """Get the count of the cached records."""
+        return sum(len(block_list) for block_list in self._block_cache.values())
+
+
+class MLoadingItem(dict):
+    """The placeholder row shown under a node while its children are fetched."""
+
+
 class MTableModel(QtCore.QAbstractItemModel):
+    sig_fetch_progress = QtCore.Signal(int)
+    sig_fetch_finished = QtCore.Signal(int)
+    sig_fetch_canceled = QtCore.Signal(int)
+    # the records dropped from the block cache of a data source
+    sig_rows_evicted = QtCore.Signal(object)
+
     def __init__(self, parent=None):
         super(MTableModel, self).__init__(parent)
         self.origin_count = 0
         self.root_item = {"name": "root", "children": []}
         self.data_generator = None
         self.header_list = []
+        # column -> {role: callable(data_obj)}, compiled from header_list
+        self.resolver_table = []
+        # False to skip the per cell SizeHintRole, for views with fixed row height
+        self.size_hint_enabled = True
+        # id(item) -> parent item, id(parent item) -> {id(child item): row}
+        # Model items can be dict which is not hashable or weak referencable,
+        # so use the id of the items, they are kept alive by root_item.
+        self._parent_dict = {}
+        self._row_dict = {}
+        # id(item) -> {checked key: [checked children count, partial children count]}
+        self._check_count_dict = {}
+        # (id(item), column, role) -> role data, disabled when cache_size is 0
+        self.cache_size = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cell_cache = collections.OrderedDict()
+        self._row_cache_keys = {}
+        self.fetch_time_budget = 8
         self.timer = QtCore.QTimer(self)
         self.timer.timeout.connect(self.fetchMore)
+        # id(parent item) -> [parent item, children iterator, MLoadingItem]
+        self.loading_text = "Loading..."
+        self._child_fetch_dict = collections.OrderedDict()
+        self.child_timer = QtCore.QTimer(self)
+        self.child_timer.timeout.connect(self._slot_fetch_children)
+        self.modelAboutToBeReset.connect(self.clear_cache)
+        self.dataChanged.connect(self._slot_invalidate_cache)
+        self._filter_cache = None
 
     def set_header_list(self, header_list):
+        """
+        Set the column configs and compile them into the role resolver table.
+        Call it again after changing the config dicts inside header_list.
+        """
         self.header_list = header_list
+        role_list = list(SETTING_MAP.keys()) + [QtCore.Qt.CheckStateRole]
+        if not self.size_hint_enabled:
+            role_list.remove(QtCore.Qt.SizeHintRole)
+        self.resolver_table = []
+        for attr_dict in header_list:
+            resolver_dict = {}
+            for role in role_list:
+                resolver = compile_role_resolver(attr_dict, role)
+                if resolver is not None:
+                    resolver_dict[int(role)] = resolver
+            self.resolver_table.append(resolver_dict)
+        self.clear_cache()
+
+    def set_size_hint_enabled(self, flag):
+        """
+        Enable or disable the "size" config of the columns.
+        Disable it when the view uses fixed row height, so no QSize is built per cell.
+        :param flag: bool
+        :return: None
+        """
+        self.size_hint_enabled = flag
+        self.set_header_list(self.header_list)
+
+    def get_filter_cache(self):
+        """Get the MFilterCache shared by all the proxy models of this model."""
+        if self._filter_cache is None:
+            self._filter_cache = MFilterCache(self)
+        return self._filter_cache
+
+    def set_cache_size(self, size):
+        """
+        Enable the formatted value cache, keep at most size cells' role data.
+        The formatters (display, font, icon, color...) are then only run once
+        for each cell until the row is changed by setData or invalidate_rows.
+        :param size: int, 0 means disable the cache
+        :return: None
+        """
+        self.cache_size = max(0, size)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.clear_cache()
+
+    def cache_info(self):
+        """Get the cache statistics dict, to help tune the cache size."""
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self._cell_cache),
+            "max_size": self.cache_size,
+        }
+
+    @QtCore.Slot()
+    def clear_cache(self):
+        """Drop all the cached role data."""
+        self._cell_cache.clear()
+        self._row_cache_keys = {}
+
+    def invalidate_rows(self, data_obj_list):
+        """
+        Tell the model that the given items were changed outside of setData.
+        Drop their cached role data and emit dataChanged to repaint them.
+        :param data_obj_list: list of dict/object items
+        :return: None
+        """
+        last_column = max(0, self.columnCount() - 1)
+        for data_obj in data_obj_list:
+            self._drop_cache(data_obj)
+            index = self.get_item_index(data_obj)
+            if index.isValid():
+                self.dataChanged.emit(
+                    index, self.createIndex(index.row(), last_column, data_obj)
+                )
+
+    def _drop_cache(self, data_obj):
+        for key in self._row_cache_keys.pop(id(data_obj), ()):
+            self._cell_cache.pop(key, None)
+
+    @QtCore.Slot(QtCore.QModelIndex, QtCore.QModelIndex)
+    def _slot_invalidate_cache(self, top_left, bottom_right, *args):
+        if not self._cell_cache:
+            return
+        if not (top_left and top_left.isValid()):
+            self.clear_cache()
+            return
+        if top_left.row() == bottom_right.row():
+            self._drop_cache(top_left.internalPointer())
+            return
+        parent_index = top_left.parent()
+        if parent_index.isValid():
+            parent_item = parent_index.internalPointer()
+        else:
+            parent_item = self.root_item
+        children_list = self._get_children(parent_item) or []
+        for data_obj in children_list[top_left.row() : bottom_right.row() + 1]:
+            self._drop_cache(data_obj)
+
+    def _cached_data(self, resolver, index, role):
+        data_obj = index.internalPointer()
+        key = (id(data_obj), index.column(), role)
+        try:
+            # pop and set again to move it to the end, OrderedDict of python2
+            # does not have move_to_end
+            value = self._cell_cache.pop(key)
+        except KeyError:
+            self.cache_misses += 1
+            value = resolver(data_obj)
+            self._row_cache_keys.setdefault(key[0], set()).add(key)
+            if len(self._cell_cache) >= self.cache_size:
+                old_key, _ = self._cell_cache.popitem(last=False)
+                old_key_set = self._row_cache_keys.get(old_key[0])
+                if old_key_set is not None:
+                    old_key_set.discard(old_key)
+                    if not old_key_set:
+                        self._row_cache_keys.pop(old_key[0])
+        else:
+            self.cache_hits += 1
+        self._cell_cache[key] = value
+        return value
+
+    def set_fetch_time_budget(self, millisecond):
+        """
+        Set how long fetchMore may drain the data generator in one event-loop tick.
+        All the records pulled in one tick are inserted with one notification.
+        """
+        self.fetch_time_budget = max(0, millisecond)
 
     def set_data_list(self, data_list):
-        if hasattr(data_list, "next"):
+        self.cancel_fetch()
+        if is_iterator(data_list):
             self.beginResetModel()
             self.root_item["children"] = []
+            self._reset_item_index()
             self.endResetModel()
             self.data_generator = data_list
             self.origin_count = 0
@@ -78,30 +537,407 @@ class MTableModel(QtCore.QAbstractItemModel):
         else:
             self.beginResetModel()
             self.root_item["children"] = data_list if data_list is not None else []
+            self._reset_item_index()
             self.endResetModel()
             self.data_generator = None
 
+    def set_data_source(self, data_source, block_size=256, cache_blocks=64):
+        """
+        Browse a MDataSource without loading it as a python list.
+        The rows are fetched by blocks when the views ask for them, and only
+        cache_blocks blocks are kept, except the ones the views still refer to.
+        :param data_source: MDataSource instance
+        :param block_size: how many rows are fetched at once
+        :param cache_blocks: how many blocks are kept
+        :return: None
+        """
+        self.set_data_list(
+            MVirtualRowList(
+                data_source,
+                block_size=block_size,
+                cache_blocks=cache_blocks,
+                on_evict=self._evict_rows,
+            )
+        )
+
+    def _evict_rows(self, item_list):
+        in_use_set = set()
+        for index in self.persistentIndexList():
+            item = index.internalPointer() if index.isValid() else None
+            while item is not None and item is not self.root_item:
+                in_use_set.add(id(item))
+                item = self._parent_dict.get(id(item))
+        if any(id(item) in in_use_set for item in item_list):
+            return False
+        self._forget_items(item_list)
+        # the ids of the records can be reused by the records fetched later
+        self.sig_rows_evicted.emit(item_list)
+        return True
+
+    def _get_children(self, parent_item):
+        children_obj = get_obj_value(parent_item, "children")
+        if children_obj is None and parent_item is not self.root_item:
+            owner_list = get_obj_value(
+                self._parent_dict.get(id(parent_item)), "children"
+            )
+            if isinstance(owner_list, MVirtualRowList):
+                children_obj = owner_list.children_of(parent_item)
+        return children_obj
+
+    def is_fetching(self):
+        """Return whether the model is still ingesting records from a generator."""
+        return self.data_generator is not None
+
+    def cancel_fetch(self):
+        """Stop ingesting the data generator, keep the records already inserted."""
+        if self.timer.isActive():
+            self.timer.stop()
+        if self.data_generator is not None:
+            self.data_generator = None
+            self.sig_fetch_canceled.emit(self.origin_count)
+
     def clear(self):
+        self.cancel_fetch()
         self.beginResetModel()
         self.root_item["children"] = []
+        self._reset_item_index()
         self.endResetModel()
 
     def get_data_list(self):
         return self.root_item["children"]
 
+    def get_parent_item(self, data_obj):
+        """Get the parent item of the given item, root_item for top level items."""
+        return self._parent_dict.get(id(data_obj))
+
+    def get_item_index(self, data_obj, column=0):
+        """Get the QModelIndex of the given item, invalid index if not found."""
+        parent_item = self._parent_dict.get(id(data_obj), self.root_item)
+        row = self._get_row(parent_item, data_obj)
+        if row is None:
+            return QtCore.QModelIndex()
+        self._parent_dict[id(data_obj)] = parent_item
+        return self.createIndex(row, column, data_obj)
+
+    def _reset_item_index(self):
+        self._parent_dict = {}
+        self._row_dict = {}
+        self._check_count_dict = {}
+        self._child_fetch_dict.clear()
+        self.child_timer.stop()
+
+    def _forget_items(self, item_list):
+        """Drop the parent/row index of the given items and all their descendants."""
+        stack = list(item_list)
+        while stack:
+            item = stack.pop()
+            self._parent_dict.pop(id(item), None)
+            self._row_dict.pop(id(item), None)
+            self._check_count_dict.pop(id(item), None)
+            self._child_fetch_dict.pop(id(item), None)
+            self._drop_cache(item)
+            children_obj = get_obj_value(item, "children")
+            if isinstance(children_obj, list):
+                stack.extend(children_obj)
+
+    def _get_row(self, parent_item, child_item):
+        """Get the row of child_item in parent_item's children in O(1)."""
+        children_list = self._get_children(parent_item) or []
+        if isinstance(children_list, MVirtualRowList):
+            return children_list.row_of(child_item)
+        row_dict = self._row_dict.get(id(parent_item))
+        row = None if row_dict is None else row_dict.get(id(child_item))
+        if (
+            row is None
+            or row >= len(children_list)
+            or children_list[row] is not child_item
+        ):
+            # the children list was changed outside of the model, rebuild it
+            row_dict = {id(item): row for row, item in enumerate(children_list)}
+            self._row_dict[id(parent_item)] = row_dict
+            row = row_dict.get(id(child_item))
+        return row
+
     def append(self, data_dict):
-        self.root_item["children"].append(data_dict)
-        self.fetchMore()
+        self.append_many([data_dict])
+
+    def append_many(self, data_list, parent_index=None):
+        """
+        Append a batch of records under the given parent (root by default).
+        All the records are inserted with a single beginInsertRows/endInsertRows,
+        so the attached views and proxy models keep their state.
+        :param data_list: any iterable of dict/object records
+        :param parent_index: QModelIndex of the parent, None means root
+        :return: None
+        """
+        data_list = list(data_list)
+        if not data_list:
+            return
+        if parent_index and parent_index.isValid():
+            parent_item = parent_index.internalPointer()
+        else:
+            parent_index = QtCore.QModelIndex()
+            parent_item = self.root_item
+        children_list = get_obj_value(parent_item, "children")
+        if children_list is None:
+            children_list = []
+            set_obj_value(parent_item, "children", children_list)
+        start = len(children_list)
+        if id(parent_item) in self._child_fetch_dict:
+            # keep the loading placeholder as the last row
+            start -= 1
+        self.beginInsertRows(parent_index, start, start + len(data_list) - 1)
+        children_list[start:start] = data_list
+        self._check_count_dict.pop(id(parent_item), None)
+        row_dict = self._row_dict.get(id(parent_item))
+        if row_dict is not None:
+            row_dict.update(
+                (id(item), row) for row, item in enumerate(children_list[start:], start)
+            )
+        self.endInsertRows()
+
+    extend = append_many
 
     def remove(self, data_dict):
-        row = self.root_item["children"].index(data_dict)
-        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
-        self.root_item["children"].remove(data_dict)
-        self.endRemoveRows()
+        self.remove_many([data_dict])
+
+    def _get_item_list(self, item_list):
+        # accept data items, source index or proxy index, e.g. from a selection model
+        result_dict = collections.OrderedDict()
+        for item in item_list:
+            if isinstance(item, QtCore.QModelIndex):
+                if not item.isValid():
+                    continue
+                item = real_index(item).internalPointer()
+            result_dict[id(item)] = item
+        return list(result_dict.values())
+
+    def remove_many(self, item_list):
+        """
+        Remove many items, they can be under different parents.
+        The rows of each parent are grouped into contiguous ranges, and each range
+        is removed with one beginRemoveRows/endRemoveRows.
+        :param item_list: list of data items, or QModelIndex of this model or its proxy
+        :return: None
+        """
+        # id(parent item) -> [parent item, row list]
+        parent_dict = collections.OrderedDict()
+        for data_obj in self._get_item_list(item_list):
+            parent_item = self._parent_dict.get(id(data_obj), self.root_item)
+            row = self._get_row(parent_item, data_obj)
+            if row is not None:
+                parent_dict.setdefault(id(parent_item), [parent_item, []])[1].append(
+                    row
+                )
+        for parent_item, row_list in parent_dict.values():
+            self._remove_ranges(parent_item, group_row_ranges(row_list))
+
+    def remove_rows(self, range_list, parent_index=None):
+        """
+        Remove the row ranges under the given parent (root by default).
+        :param range_list: list of (first, last) tuple, last row is included
+        :param parent_index: QModelIndex of the parent, None means root
+        :return: None
+        """
+        if parent_index and parent_index.isValid():
+            parent_item = parent_index.internalPointer()
+        else:
+            parent_item = self.root_item
+        row_count = len(get_obj_value(parent_item, "children") or [])
+        row_list = []
+        for first, last in range_list:
+            row_list.extend(range(max(0, first), min(last, row_count - 1) + 1))
+        self._remove_ranges(parent_item, group_row_ranges(row_list))
+
+    def _remove_ranges(self, parent_item, range_list):
+        if not range_list:
+            return
+        if parent_item is self.root_item:
+            parent_index = QtCore.QModelIndex()
+        else:
+            parent_index = self.get_item_index(parent_item)
+        children_list = get_obj_value(parent_item, "children")
+        # from bottom to top, the rows of the remaining ranges are not changed
+        for first, last in reversed(range_list):
+            self.beginRemoveRows(parent_index, first, last)
+            removed_list = children_list[first : last + 1]
+            del children_list[first : last + 1]
+            self._row_dict.pop(id(parent_item), None)
+            self._check_count_dict.pop(id(parent_item), None)
+            self._forget_items(removed_list)
+            self.endRemoveRows()
+
+    def upsert(self, record_list, key="id", remove_missing=True):
+        """
+        Update the top level rows with the new records, without resetting the model.
+        The records are matched to the current rows by key. A matched row is
+        updated in place, so the views keep selection and scroll position, and
+        dataChanged is only emitted for the changed cells. The new records are
+        appended, and the rows missing in record_list are removed.
+        :param record_list: list of dict/object records
+        :param key: attr name of the unique key, or callable(record) return the key
+        :param remove_missing: remove the rows which are not in record_list
+        :return: dict of the inserted/updated/removed row count
+        """
+        if callable(key):
+            key_func = key
+        else:
+
+            def key_func(data_obj):
+                return get_obj_value(data_obj, key)
+
+        children_list = self.root_item["children"]
+        row_dict = {
+            key_func(data_obj): row for row, data_obj in enumerate(children_list)
+        }
+        column_key_list = [attr_dict.get("key") for attr_dict in self.header_list]
+        # row -> [(attr, value) to write, changed columns]
+        changed_dict = {}
+        seen_row_set = set()
+        insert_list = []
+        for record in record_list:
+            row = row_dict.get(key_func(record))
+            if row is None:
+                insert_list.append(record)
+                continue
+            seen_row_set.add(row)
+            data_obj = children_list[row]
+            if data_obj is record:
+                continue
+            if isinstance(record, dict):
+                attr_dict = record
+            else:
+                attr_dict = vars(record)
+            value_list = [
+                (attr, value)
+                for attr, value in attr_dict.items()
+                if attr != "children" and get_obj_value(data_obj, attr) != value
+            ]
+            if value_list:
+                changed_attr_set = set(attr for attr, _ in value_list)
+                column_list = []
+                for column, column_key in enumerate(column_key_list):
+                    for attr in (column_key, "{}_checked".format(column_key)):
+                        if attr in changed_attr_set:
+                            changed_attr_set.discard(attr)
+                            column_list.append(column)
+                if changed_attr_set:
+                    # the formatters get the whole record, any column may use it
+                    column_list = list(range(len(column_key_list)))
+                old_value_list, old_column_list = changed_dict.get(row, ([], []))
+                changed_dict[row] = (
+                    old_value_list + value_list,
+                    sorted(set(old_column_list + column_list)),
+                )
+
+        # write one run of rows and notify it before touching the next one, a
+        # sorting proxy model moves the rows of each run with the others unchanged
+        for first, last in group_row_ranges(changed_dict.keys()):
+            column_list = []
+            for row in range(first, last + 1):
+                data_obj = children_list[row]
+                value_list, row_column_list = changed_dict[row]
+                for attr, value in value_list:
+                    set_obj_value(data_obj, attr, value)
+                self._drop_cache(data_obj)
+                column_list.extend(row_column_list)
+            if column_list:
+                self.dataChanged.emit(
+                    self.index(first, min(column_list)),
+                    self.index(last, max(column_list)),
+                )
+
+        removed_count = 0
+        if remove_missing:
+            missing_row_list = [
+                row for row in range(len(children_list)) if row not in seen_row_set
+            ]
+            removed_count = len(missing_row_list)
+            self._remove_ranges(self.root_item, group_row_ranges(missing_row_list))
+        self.append_many(insert_list)
+        return {
+            "inserted": len(insert_list),
+            "updated": len(changed_dict),
+            "removed": removed_count,
+        }
+
+    def move_rows(self, item_list, destination_row, destination_parent_index=None):
+        """
+        Move the items before destination_row of the destination parent.
+        The moved items keep their order, each contiguous range is moved with one
+        beginMoveRows/endMoveRows, so the views keep their selection.
+        :param item_list: list of data items or QModelIndex, under the same parent
+        :param destination_row: the row to insert before, in the current rows
+        :param destination_parent_index: QModelIndex of the new parent, None means root
+        :return: None
+        """
+        item_list = self._get_item_list(item_list)
+        if not item_list:
+            return
+        source_item = self._parent_dict.get(id(item_list[0]), self.root_item)
+        row_list = [self._get_row(source_item, data_obj) for data_obj in item_list]
+        range_list = group_row_ranges(row for row in row_list if row is not None)
+        if destination_parent_index and destination_parent_index.isValid():
+            destination_item = destination_parent_index.internalPointer()
+        else:
+            destination_parent_index = QtCore.QModelIndex()
+            destination_item = self.root_item
+        if source_item is self.root_item:
+            source_index = QtCore.QModelIndex()
+        else:
+            source_index = self.get_item_index(source_item)
+        source_list = get_obj_value(source_item, "children")
+        destination_list = get_obj_value(destination_item, "children")
+        if destination_list is None:
+            destination_list = []
+            set_obj_value(destination_item, "children", destination_list)
+        if source_item is destination_item:
+            for first, last in range_list:
+                if first < destination_row <= last:
+                    # drop inside the moved rows, move them before the range
+                    destination_row = first
+                    break
+        target = max(0, min(destination_row, len(destination_list)))
+
+        if source_item is not destination_item:
+            # from bottom to top, insert each range in front of the last one
+            move_list = [(first, last, target) for first, last in reversed(range_list)]
+        else:
+            move_list = []
+            shift = 0
+            for first, last in range_list:
+                if last < destination_row:
+                    # the ranges moved before were above it
+                    first, last = first - shift, last - shift
+                if first <= target <= last + 1:
+                    target = last + 1
+                    continue
+                move_list.append((first, last, target))
+                if last < target:
+                    shift += last - first + 1
+                else:
+                    target += last - first + 1
+
+        for first, last, target in move_list:
+            if not self.beginMoveRows(
+                source_index, first, last, destination_parent_index, target
+            ):
+                continue
+            moved_list = source_list[first : last + 1]
+            del source_list[first : last + 1]
+            if source_item is destination_item and target > last:
+                target -= len(moved_list)
+            destination_list[target:target] = moved_list
+            for data_obj in moved_list:
+                self._parent_dict[id(data_obj)] = destination_item
+            for item in (source_item, destination_item):
+                self._row_dict.pop(id(item), None)
+                self._check_count_dict.pop(id(item), None)
+            self.endMoveRows()
 
     def flags(self, index):
         result = QtCore.QAbstractItemModel.flags(self, index)
-        if not index.isValid():
+        if not index.isValid() or isinstance(index.internalPointer(), MLoadingItem):
             return QtCore.Qt.ItemIsEnabled
         if self.header_list[index.column()].get("checkable", False):
             result |= QtCore.Qt.ItemIsUserCheckable
@@ -127,14 +963,16 @@ class MTableModel(QtCore.QAbstractItemModel):
     def index(self, row, column, parent_index=None):
         if parent_index and parent_index.isValid():
             parent_item = parent_index.internalPointer()
+            children_list = self._get_children(parent_item)
         else:
+            # fast path, views and proxy models ask for top level rows the most
             parent_item = self.root_item
+            children_list = parent_item["children"]
 
-        children_list = get_obj_value(parent_item, "children")
-        if children_list and len(children_list) > row:
+        if children_list and 0 <= row < len(children_list):
             child_item = children_list[row]
-            if child_item:
-                set_obj_value(child_item, "_parent", parent_item)
+            if child_item is not None:
+                self._parent_dict[id(child_item)] = parent_item
                 return self.createIndex(row, column, child_item)
         return QtCore.QModelIndex()
 
@@ -143,24 +981,30 @@ class MTableModel(QtCore.QAbstractItemModel):
             return QtCore.QModelIndex()
 
         child_item = index.internalPointer()
-        parent_item = get_obj_value(child_item, "_parent")
+        parent_item = self._parent_dict.get(id(child_item))
 
-        if parent_item is None:
+        if parent_item is None or parent_item is self.root_item:
             return QtCore.QModelIndex()
 
-        grand_item = get_obj_value(parent_item, "_parent")
+        grand_item = self._parent_dict.get(id(parent_item))
         if grand_item is None:
             return QtCore.QModelIndex()
-        parent_list = get_obj_value(grand_item, "children")
-        return self.createIndex(parent_list.index(parent_item), 0, parent_item)
+        row = self._get_row(grand_item, parent_item)
+        if row is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(row, 0, parent_item)
 
     def rowCount(self, parent_index=None):
         if parent_index and parent_index.isValid():
             parent_item = parent_index.internalPointer()
         else:
             parent_item = self.root_item
-        children_obj = get_obj_value(parent_item, "children")
-        if hasattr(children_obj, "next") or (children_obj is None):
+        children_obj = self._get_children(parent_item)
+        if (
+            is_iterator(children_obj)
+            or callable(children_obj)
+            or (children_obj is None)
+        ):
             return 0
         else:
             return len(children_obj)
@@ -170,10 +1014,10 @@ class MTableModel(QtCore.QAbstractItemModel):
             parent_data = parent_index.internalPointer()
         else:
             parent_data = self.root_item
-        children_obj = get_obj_value(parent_data, "children")
+        children_obj = self._get_children(parent_data)
         if children_obj is None:
             return False
-        if hasattr(children_obj, "next"):
+        if is_iterator(children_obj) or callable(children_obj):
             return True
         else:
             return len(children_obj)
@@ -182,52 +1026,114 @@ class MTableModel(QtCore.QAbstractItemModel):
         return len(self.header_list)
 
     def canFetchMore(self, index):
-        try:
-            if self.data_generator:
-                data = self.data_generator.next()
-                self.root_item["children"].append(data)
-                return True
-            return False
-        except StopIteration:
+        if index and index.isValid():
+            children_obj = get_obj_value(index.internalPointer(), "children")
+            return is_iterator(children_obj) or callable(children_obj)
+        return self.data_generator is not None
+
+    def fetchMore(self, index=None):
+        if index and index.isValid():
+            self.fetch_children(index)
+            return
+        if self.data_generator is None:
+            return
+        chunk = []
+        finished = False
+        elapsed_timer = QtCore.QElapsedTimer()
+        elapsed_timer.start()
+        while True:
+            try:
+                chunk.append(six.next(self.data_generator))
+            except StopIteration:
+                finished = True
+                break
+            if elapsed_timer.elapsed() >= self.fetch_time_budget:
+                break
+        self.append_many(chunk)
+        self.origin_count += len(chunk)
+        if chunk:
+            self.sig_fetch_progress.emit(self.origin_count)
+        if finished:
+            self.data_generator = None
             if self.timer.isActive():
                 self.timer.stop()
-            return False
+            self.sig_fetch_finished.emit(self.origin_count)
 
-    def fetchMore(self, index=None):
-        self.beginResetModel()
-        self.endResetModel()
+    def fetch_children(self, parent_index):
+        """
+        Start loading the lazy children of a node, called when it is expanded.
+        The children can be a generator, or a callable without argument returning
+        an iterable. They are pulled in batches across event-loop ticks, with a
+        loading placeholder row shown until all of them are inserted.
+        :param parent_index: QModelIndex of the node
+        :return: None
+        """
+        parent_item = parent_index.internalPointer()
+        children_obj = get_obj_value(parent_item, "children")
+        if not (is_iterator(children_obj) or callable(children_obj)):
+            return
+        if callable(children_obj) and not is_iterator(children_obj):
+            children_obj = iter(children_obj() or [])
+        loading_item = MLoadingItem()
+        set_obj_value(parent_item, "children", [])
+        self.append_many([loading_item], parent_index)
+        self._child_fetch_dict[id(parent_item)] = [
+            parent_item,
+            children_obj,
+            loading_item,
+        ]
+        self.child_timer.start()
+
+    def is_loading(self, parent_index):
+        """Return whether the children of the node are still being fetched."""
+        return id(parent_index.internalPointer()) in self._child_fetch_dict
+
+    @QtCore.Slot()
+    def _slot_fetch_children(self):
+        if not self._child_fetch_dict:
+            self.child_timer.stop()
+            return
+        key, (parent_item, children_iter, loading_item) = next(
+            iter(self._child_fetch_dict.items())
+        )
+        chunk = []
+        finished = False
+        elapsed_timer = QtCore.QElapsedTimer()
+        elapsed_timer.start()
+        while True:
+            try:
+                chunk.append(six.next(children_iter))
+            except StopIteration:
+                finished = True
+                break
+            if elapsed_timer.elapsed() >= self.fetch_time_budget:
+                break
+        parent_index = self.get_item_index(parent_item)
+        self.append_many(chunk, parent_index)
+        if finished:
+            self._child_fetch_dict.pop(key)
+            children_list = get_obj_value(parent_item, "children")
+            row = len(children_list) - 1
+            self.beginRemoveRows(parent_index, row, row)
+            children_list.pop()
+            self._forget_items([loading_item])
+            self.endRemoveRows()
+        else:
+            # take turns with the other expanded nodes
+            self._child_fetch_dict[key] = self._child_fetch_dict.pop(key)
 
     def data(self, index, role=QtCore.Qt.DisplayRole):
         if not index.isValid():
             return None
-
-        attr_dict = self.header_list[index.column()]  # 获取该列字段的配置
-        data_obj = index.internalPointer()
-        attr = attr_dict.get("key")
-        if role in SETTING_MAP.keys():
-            role_key = SETTING_MAP[role].get("config")  # role 配置的关键字
-            formatter_from_config = attr_dict.get(role_key)  # header中该role的配置
-            if not formatter_from_config and role not in [
-                QtCore.Qt.DisplayRole,
-                QtCore.Qt.EditRole,
-                QtCore.Qt.ToolTipRole,
-            ]:
-                # 如果header中没有配置该role，而且也不是 DisplayRole/EditRole，直接返回None
-                return None
-            else:
-                value = apply_formatter(
-                    formatter_from_config, get_obj_value(data_obj, attr), data_obj
-                )
-            formatter_from_model = SETTING_MAP[role].get(
-                "formatter", None
-            )  # role 配置的转换函数
-            result = apply_formatter(formatter_from_model, value)
-            return result
-
-        if role == QtCore.Qt.CheckStateRole and attr_dict.get("checkable", False):
-            state = get_obj_value(data_obj, attr + "_checked")
-            return QtCore.Qt.Unchecked if state is None else state
-        return None
+        if isinstance(index.internalPointer(), MLoadingItem):
+            if role == QtCore.Qt.DisplayRole and index.column() == 0:
+                return self.loading_text
+            return None
+        # 未配置的 role 直接返回 None，详见 compile_role_resolver
+        resolver = self.resolver_table[index.column()].get(role, _return_none)
+        if self.cache_size and resolver is not _return_none:
+            return self._cached_data(resolver, index, role)
+        return resolver(index.internalPointer())
 
     def setData(self, index, value, role=QtCore.Qt.EditRole):
         if index.isValid() and role in [QtCore.Qt.CheckStateRole, QtCore.Qt.EditRole]:
@@ -235,32 +1141,8 @@ class MTableModel(QtCore.QAbstractItemModel):
             key = attr_dict.get("key")
             data_obj = index.internalPointer()
             if role == QtCore.Qt.CheckStateRole and attr_dict.get("checkable", False):
-                key += "_checked"
-                # 更新自己
-                set_obj_value(data_obj, key, value)
-                self.dataChanged.emit(index, index)
-
-                # 更新它的children
-                for row, sub_obj in enumerate(get_obj_value(data_obj, "children", [])):
-                    set_obj_value(sub_obj, key, value)
-                    sub_index = index.child(row, index.column())
-                    self.dataChanged.emit(sub_index, sub_index)
-
-                # 更新它的parent
-                parent_index = index.parent()
-                if parent_index.isValid():
-                    parent_obj = parent_index.internalPointer()
-                    new_parent_value = value
-                    old_parent_value = get_obj_value(parent_obj, key)
-                    for sibling_obj in get_obj_value(
-                        get_obj_value(data_obj, "_parent"), "children", []
-                    ):
-                        if value != get_obj_value(sibling_obj, key):
-                            new_parent_value = 1
-                            break
-                    if new_parent_value != old_parent_value:
-                        set_obj_value(parent_obj, key, new_parent_value)
-                        self.dataChanged.emit(parent_index, parent_index)
+                # 更新自己、所有的children 和所有的parent
+                self.set_check_state([index], value)
             else:
                 set_obj_value(data_obj, key, value)
                 # 采用 self.dataChanged.emit方式在houdini16里面会报错
@@ -272,8 +1154,609 @@ class MTableModel(QtCore.QAbstractItemModel):
         else:
             return False
 
+    def set_check_state(self, index_list, state):
+        """
+        Set the check state of many items of one checkable column at once.
+        The state is propagated down to all the descendants, and up to all the
+        ancestors as Checked/PartiallyChecked/Unchecked. Each node keeps the count
+        of its checked and partially checked children, so an ancestor is updated in
+        O(1), and only one dataChanged is emitted for each changed parent.
+        :param index_list: list of QModelIndex of the source model, in the same column
+        :param state: Qt.CheckState, None means invert the state of each item
+        :return: None
+        """
+        index_list = [index for index in index_list if index.isValid()]
+        if not index_list:
+            return
+        column = index_list[0].column()
+        key = "{}_checked".format(self.header_list[column].get("key"))
+        # id(parent item) -> [parent item, changed child items or None for all]
+        changed_dict = {}
+        for index in index_list:
+            data_obj = index.internalPointer()
+            old_state = self._get_check_state(data_obj, key)
+            if state is None:
+                new_state = _UNCHECKED if old_state == _CHECKED else _CHECKED
+            else:
+                new_state = check_state_value(state)
+            self._set_subtree_check_state(data_obj, key, new_state, changed_dict)
+            self._propagate_check_state(
+                data_obj, key, old_state, new_state, changed_dict
+            )
+            self._add_check_changed(changed_dict, data_obj)
+        self._emit_check_changed(changed_dict, column)
+
+    def _add_check_changed(self, changed_dict, data_obj):
+        parent_item = self.get_parent_item(data_obj)
+        if parent_item is None:
+            return
+        child_list = changed_dict.setdefault(id(parent_item), [parent_item, []])[1]
+        if child_list is not None:
+            child_list.append(data_obj)
+
+    def _get_check_state(self, data_obj, key):
+        state = get_obj_value(data_obj, key)
+        return _UNCHECKED if state is None else check_state_value(state)
+
+    def _get_check_count(self, data_obj, key):
+        count_dict = self._check_count_dict.setdefault(id(data_obj), {})
+        count = count_dict.get(key)
+        if count is None:
+            count = [0, 0]
+            for child_obj in get_obj_value(data_obj, "children"):
+                child_state = self._get_check_state(child_obj, key)
+                if child_state == _CHECKED:
+                    count[0] += 1
+                elif child_state == _PARTIALLY_CHECKED:
+                    count[1] += 1
+            count_dict[key] = count
+        return count
+
+    def _set_subtree_check_state(self, data_obj, key, state, changed_dict):
+        stack = [data_obj]
+        while stack:
+            item = stack.pop()
+            set_obj_value(item, key, state)
+            children_obj = get_obj_value(item, "children")
+            if not isinstance(children_obj, list) or not children_obj:
+                continue
+            # all the children have the same state now
+            checked_count = len(children_obj) if state == _CHECKED else 0
+            self._check_count_dict.setdefault(id(item), {})[key] = [checked_count, 0]
+            if any(id(child_obj) in self._parent_dict for child_obj in children_obj):
+                # no need to notify the children that have never been asked by views
+                changed_dict[id(item)] = [item, None]
+            stack.extend(children_obj)
+
+    def _propagate_check_state(self, data_obj, key, old_state, new_state, changed_dict):
+        parent_item = self.get_parent_item(data_obj)
+        while (
+            old_state != new_state
+            and parent_item is not None
+            and parent_item is not self.root_item
+        ):
+            children_obj = get_obj_value(parent_item, "children")
+            if not isinstance(children_obj, list):
+                break
+            count_dict = self._check_count_dict.get(id(parent_item), {})
+            if key in count_dict:
+                count = count_dict[key]
+                for value, step in ((old_state, -1), (new_state, 1)):
+                    if value == _CHECKED:
+                        count[0] += step
+                    elif value == _PARTIALLY_CHECKED:
+                        count[1] += step
+            else:
+                # counted after the child was changed, it is up to date
+                count = self._get_check_count(parent_item, key)
+            if count[0] == len(children_obj):
+                parent_state = _CHECKED
+            elif count[0] or count[1]:
+                parent_state = _PARTIALLY_CHECKED
+            else:
+                parent_state = _UNCHECKED
+            old_state = self._get_check_state(parent_item, key)
+            new_state = parent_state
+            if old_state != new_state:
+                set_obj_value(parent_item, key, new_state)
+                self._add_check_changed(changed_dict, parent_item)
+            parent_item = self.get_parent_item(parent_item)
+
+    def _emit_check_changed(self, changed_dict, column):
+        for parent_item, child_list in changed_dict.values():
+            if parent_item is self.root_item:
+                parent_index = QtCore.QModelIndex()
+            else:
+                parent_index = self.get_item_index(parent_item)
+                if not parent_index.isValid():
+                    continue
+            if child_list is None:
+                # all the children are changed
+                row_list = [0, len(get_obj_value(parent_item, "children")) - 1]
+            else:
+                row_list = [
+                    row
+                    for row in (
+                        self._get_row(parent_item, child_obj)
+                        for child_obj in child_list
+                    )
+                    if row is not None
+                ]
+            if not row_list:
+                continue
+            self.dataChanged.emit(
+                self.index(min(row_list), column, parent_index),
+                self.index(max(row_list), column, parent_index),
+            )
+
+
+class MFilterCache(QtCore.QObject):
+    """
+    The text index and the filter results of one MTableModel.
+    It is shared by all the MSortFilterModel over the model, so the views showing
+    the same data with the same filter state do not filter it again.
+    """
+
+    def __init__(self, source_model, max_states=8):
+        super(MFilterCache, self).__init__(source_model)
+        self.max_states = max(1, max_states)
+        # column -> {id(item): lowercase display text}
+        self.text_index = {}
+        # filter state -> {id(item): accepted or not}
+        self.result_dict = collections.OrderedDict()
+        # the states whose result has been computed for all the items
+        self.complete_state_set = set()
+        # proxy model -> the filter state it shows, these states are never dropped
+        self._owner_state_dict = weakref.WeakKeyDictionary()
+        source_model.dataChanged.connect(self._slot_data_changed)
+        source_model.rowsAboutToBeRemoved.connect(self._slot_rows_removed)
+        source_model.modelAboutToBeReset.connect(self.clear)
+        source_model.sig_rows_evicted.connect(self.drop_items)
+
+    @QtCore.Slot()
+    def clear(self):
+        """Drop all the cached texts and filter results."""
+        for column_index in self.text_index.values():
+            column_index.clear()
+        for result in self.result_dict.values():
+            result.clear()
+        self.complete_state_set.clear()
+
+    def get_result(self, state, owner=None):
+        """
+        Get the filter result dict of the filter state, the least recently used
+        state is dropped when there are more than max_states, except the states
+        still shown by a proxy model.
+        :param state: hashable filter state
+        :param owner: the proxy model which shows the result, None if it only reads it
+        :return: dict of id(item) -> bool
+        """
+        if owner is not None:
+            self._owner_state_dict[owner] = state
+        result = self.result_dict.pop(state, None)
+        if result is None:
+            result = {}
+            in_use_set = set(self._owner_state_dict.values())
+            for old_state in list(self.result_dict.keys()):
+                if len(self.result_dict) < self.max_states:
+                    break
+                if old_state not in in_use_set:
+                    del self.result_dict[old_state]
+                    self.complete_state_set.discard(old_state)
+        self.result_dict[state] = result
+        return result
+
+    def set_result(self, state, result, owner=None):
+        """Set the filter result dict of the filter state, computed for all items."""
+        self.get_result(state, owner)
+        self.result_dict[state] = result
+        self.complete_state_set.add(state)
+
+    def release(self, owner):
+        """The proxy model does not show a result of this cache any more."""
+        self._owner_state_dict.pop(owner, None)
+
+    def drop_items(self, data_obj_list):
+        """Drop the cached data of the items and all their descendants."""
+        dict_list = list(self.text_index.values()) + list(self.result_dict.values())
+        stack = list(data_obj_list)
+        while stack:
+            data_obj = stack.pop()
+            for id_dict in dict_list:
+                id_dict.pop(id(data_obj), None)
+            children_obj = get_obj_value(data_obj, "children")
+            if isinstance(children_obj, list):
+                stack.extend(children_obj)
+
+    @QtCore.Slot(QtCore.QModelIndex, QtCore.QModelIndex)
+    def _slot_data_changed(self, top_left, bottom_right, *args):
+        if not (top_left and top_left.isValid()):
+            self.clear()
+            return
+        self.drop_items(
+            top_left.sibling(row, 0).internalPointer()
+            for row in range(top_left.row(), bottom_right.row() + 1)
+        )
+
+    @QtCore.Slot(QtCore.QModelIndex, int, int)
+    def _slot_rows_removed(self, parent_index, first, last):
+        source_model = self.parent()
+        self.drop_items(
+            source_model.index(row, 0, parent_index).internalPointer()
+            for row in range(first, last + 1)
+        )
+
+
+_shared_model_dict = {}
+
+
+def get_shared_model(name):
+    """
+    Get the MTableModel registered with the name, create it if it does not exist.
+    Several view sets can show one dataset with set_source_model, their proxy
+    models share the text index and the filter results of it.
+    :param name: str
+    :return: MTableModel
+    """
+    model = _shared_model_dict.get(name)
+    if model is None:
+        model = _shared_model_dict[name] = MTableModel()
+    return model
+
+
+def release_shared_model(name):
+    """Remove the MTableModel registered with the name from the registry."""
+    return _shared_model_dict.pop(name, None)
+
+
+class _MRowOrderModel(QtCore.QAbstractProxyModel):
+    """
+    Show the rows of a MTableModel in the order of a python sort key.
+    MSortFilterModel puts it between itself and the source model for the typed
+    sort. The keys of each children list are ordered with one python sorted(),
+    the rows are then mapped through the permutation, so no comparison calls
+    back into python. The order of the source model is not changed.
+    """
+
+    # the inserted rows going to more places are ordered with one layout change
+    max_insert_ranges = 256
+
+    def __init__(self, source_model, parent=None):
+        super(_MRowOrderModel, self).__init__(parent)
+        self._key_func = None
+        self._descending = False
+        # id(parent item) -> {"item": parent item, "keys": sort key of each source
+        # row, "rows": source row of each row, "source_rows": row of each source
+        # row, built when needed, "as_text": keys are compared as text}
+        self._mapping_dict = {}
+        self._pending_end = None
+        # one instance for each source model, it is deleted with the connections
+        self.setSourceModel(source_model)
+        source_model.rowsAboutToBeInserted.connect(self._slot_rows_about_to_be_inserted)
+        source_model.rowsInserted.connect(self._slot_rows_inserted)
+        source_model.rowsAboutToBeRemoved.connect(self._slot_rows_about_to_be_removed)
+        source_model.rowsRemoved.connect(self._slot_rows_removed)
+        source_model.rowsAboutToBeMoved.connect(self._slot_layout_about_to_be_changed)
+        source_model.rowsMoved.connect(self._slot_layout_changed)
+        source_model.layoutAboutToBeChanged.connect(
+            self._slot_layout_about_to_be_changed
+        )
+        source_model.layoutChanged.connect(self._slot_layout_changed)
+        source_model.dataChanged.connect(self._slot_data_changed)
+        source_model.headerDataChanged.connect(self.headerDataChanged)
+        source_model.modelAboutToBeReset.connect(self.beginResetModel)
+        source_model.modelReset.connect(self._slot_model_reset)
+        source_model.sig_rows_evicted.connect(self._drop_mapping)
+
+    def set_sort_key(self, key_func, order=QtCore.Qt.AscendingOrder):
+        """
+        Order the rows of each children list by the key of the items.
+        None keys are put at the end in both orders, the keys of different types
+        are compared as text. The rows of a data source are not ordered, it would
+        fetch all of them.
+        :param key_func: callable(data_obj), None to keep the order of the source
+        :param order: Qt.SortOrder
+        :return: None
+        """
+        self.layoutAboutToBeChanged.emit()
+        self._key_func = key_func
+        self._descending = order == QtCore.Qt.DescendingOrder
+        self._mapping_dict = {}
+        self._update_persistent_indexes()
+        self.layoutChanged.emit()
+
+    def _get_key(self, mapping, data_obj):
+        key = self._key_func(data_obj)
+        if mapping["as_text"] and key is not None:
+            key = six.text_type(key)
+        return key
+
+    def _order_rows(self, mapping, row_list):
+        key_list = mapping["keys"]
+        none_list = []
+        if None in key_list:
+            none_list = [row for row in row_list if key_list[row] is None]
+            row_list = [row for row in row_list if key_list[row] is not None]
+        else:
+            row_list = list(row_list)
+        try:
+            row_list.sort(key=key_list.__getitem__, reverse=self._descending)
+        except TypeError:
+            # values of different types, compare them as text
+            mapping["as_text"] = True
+            mapping["keys"] = key_list = [
+                key if key is None else six.text_type(key) for key in key_list
+            ]
+            row_list.sort(key=key_list.__getitem__, reverse=self._descending)
+        return row_list + none_list
+
+    def _get_mapping(self, parent_item):
+        if self._key_func is None:
+            return None
+        mapping = self._mapping_dict.get(id(parent_item))
+        if mapping is not None and mapping["item"] is parent_item:
+            return mapping
+        children_obj = self.sourceModel()._get_children(parent_item)
+        if isinstance(children_obj, MVirtualRowList):
+            return None
+        if not isinstance(children_obj, list):
+            # not fetched yet, no rows in the source model either
+            children_obj = []
+        mapping = {"item": parent_item, "as_text": False, "source_rows": None}
+        mapping["keys"] = [
+            self._get_key(mapping, data_obj) for data_obj in children_obj
+        ]
+        mapping["rows"] = self._order_rows(mapping, list(range(len(children_obj))))
+        self._mapping_dict[id(parent_item)] = mapping
+        return mapping
+
+    def _get_source_rows(self, mapping):
+        source_rows = mapping["source_rows"]
+        if source_rows is None:
+            source_rows = mapping["source_rows"] = [0] * len(mapping["rows"])
+            for row, source_row in enumerate(mapping["rows"]):
+                source_rows[source_row] = row
+        return source_rows
+
+    def _get_parent_item(self, parent_index):
+        if parent_index is not None and parent_index.isValid():
+            return parent_index.internalPointer()
+        return self.sourceModel().root_item
+
+    @QtCore.Slot(object)
+    def _drop_mapping(self, data_obj_list):
+        if not self._mapping_dict:
+            return
+        stack = list(data_obj_list)
+        while stack:
+            data_obj = stack.pop()
+            self._mapping_dict.pop(id(data_obj), None)
+            children_obj = get_obj_value(data_obj, "children")
+            if isinstance(children_obj, list):
+                stack.extend(children_obj)
+
+    def _update_persistent_indexes(self):
+        source_model = self.sourceModel()
+        if source_model is None:
+            return
+        old_list = self.persistentIndexList()
+        new_list = [
+            self.mapFromSource(
+                source_model.get_item_index(index.internalPointer(), index.column())
+            )
+            for index in old_list
+        ]
+        self.changePersistentIndexList(old_list, new_list)
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QtCore.QModelIndex()
+        return self.sourceModel().get_item_index(
+            proxy_index.internalPointer(), proxy_index.column()
+        )
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QtCore.QModelIndex()
+        data_obj = source_index.internalPointer()
+        row = source_index.row()
+        source_model = self.sourceModel()
+        parent_item = source_model.get_parent_item(data_obj) or source_model.root_item
+        mapping = self._get_mapping(parent_item)
+        if mapping is not None:
+            row = self._get_source_rows(mapping)[row]
+        return self.createIndex(row, source_index.column(), data_obj)
+
+    def index(self, row, column, parent_index=None):
+        mapping = self._get_mapping(self._get_parent_item(parent_index))
+        source_row = row
+        if mapping is not None:
+            if not 0 <= row < len(mapping["rows"]):
+                return QtCore.QModelIndex()
+            source_row = mapping["rows"][row]
+        if parent_index is not None and parent_index.isValid():
+            source_parent = self.mapToSource(parent_index)
+        else:
+            source_parent = QtCore.QModelIndex()
+        source_index = self.sourceModel().index(source_row, column, source_parent)
+        if not source_index.isValid():
+            return QtCore.QModelIndex()
+        return self.createIndex(row, column, source_index.internalPointer())
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        return self.mapFromSource(self.sourceModel().parent(self.mapToSource(index)))
+
+    def rowCount(self, parent_index=None):
+        if parent_index is not None and parent_index.column() > 0:
+            return 0
+        mapping = self._get_mapping(self._get_parent_item(parent_index))
+        if mapping is not None:
+            return len(mapping["rows"])
+        if parent_index is not None and parent_index.isValid():
+            return self.sourceModel().rowCount(self.mapToSource(parent_index))
+        return self.sourceModel().rowCount()
+
+    def columnCount(self, parent_index=None):
+        return self.sourceModel().columnCount()
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal:
+            return self.sourceModel().headerData(section, orientation, role)
+        return super(_MRowOrderModel, self).headerData(section, orientation, role)
+
+    @QtCore.Slot(QtCore.QModelIndex, int, int)
+    def _slot_rows_about_to_be_inserted(self, parent_index, first, last):
+        mapping = self._get_mapping(self._get_parent_item(parent_index))
+        if mapping is None:
+            self.beginInsertRows(self.mapFromSource(parent_index), first, last)
+            self._pending_end = self.endInsertRows
+
+    @QtCore.Slot(QtCore.QModelIndex, int, int)
+    def _slot_rows_inserted(self, parent_index, first, last):
+        parent_item = self._get_parent_item(parent_index)
+        mapping = self._get_mapping(parent_item)
+        if mapping is None:
+            self._end_pending()
+            return
+        count = last - first + 1
+        if first < len(mapping["keys"]):
+            mapping["rows"] = [
+                row + count if row >= first else row for row in mapping["rows"]
+            ]
+        children_list = self.sourceModel()._get_children(parent_item)
+        mapping["keys"][first:first] = [
+            self._get_key(mapping, data_obj)
+            for data_obj in children_list[first : last + 1]
+        ]
+        mapping["source_rows"] = None
+        row_list = mapping["rows"]
+        proxy_parent = self.mapFromSource(parent_index)
+        as_text = mapping["as_text"]
+        # the old rows are in order, sorted() only merges the new rows into them
+        new_row_list = self._order_rows(
+            mapping, row_list + list(range(first, last + 1))
+        )
+        range_list = group_row_ranges(
+            position
+            for position, row in enumerate(new_row_list)
+            if first <= row <= last
+        )
+        if mapping["as_text"] != as_text or len(range_list) > self.max_insert_ranges:
+            # the old rows are compared as text from now on, or the new rows are
+            # scattered, one layout change is cheaper than many inserts
+            self.beginInsertRows(proxy_parent, len(row_list), len(row_list) + count - 1)
+            row_list.extend(range(first, last + 1))
+            self.endInsertRows()
+            self._sort_mapping(mapping)
+            return
+        for range_first, range_last in range_list:
+            self.beginInsertRows(proxy_parent, range_first, range_last)
+            row_list[range_first:range_first] = new_row_list[
+                range_first : range_last + 1
+            ]
+            self.endInsertRows()
+
+    @QtCore.Slot(QtCore.QModelIndex, int, int)
+    def _slot_rows_about_to_be_removed(self, parent_index, first, last):
+        mapping = self._get_mapping(self._get_parent_item(parent_index))
+        proxy_parent = self.mapFromSource(parent_index)
+        if mapping is None:
+            self.beginRemoveRows(proxy_parent, first, last)
+            self._pending_end = self.endRemoveRows
+            return
+        children_list = self.sourceModel()._get_children(mapping["item"])
+        self._drop_mapping(children_list[first : last + 1])
+        source_rows = self._get_source_rows(mapping)
+        row_list = mapping["rows"]
+        for range_first, range_last in reversed(
+            group_row_ranges(source_rows[first : last + 1])
+        ):
+            self.beginRemoveRows(proxy_parent, range_first, range_last)
+            del row_list[range_first : range_last + 1]
+            self.endRemoveRows()
+
+    @QtCore.Slot(QtCore.QModelIndex, int, int)
+    def _slot_rows_removed(self, parent_index, first, last):
+        parent_item = self._get_parent_item(parent_index)
+        mapping = self._mapping_dict.get(id(parent_item))
+        if self._key_func is None or mapping is None:
+            self._end_pending()
+            return
+        count = last - first + 1
+        mapping["rows"] = [
+            row - count if row > last else row for row in mapping["rows"]
+        ]
+        del mapping["keys"][first : last + 1]
+        mapping["source_rows"] = None
+
+    def _end_pending(self):
+        end_func, self._pending_end = self._pending_end, None
+        if end_func is not None:
+            end_func()
+
+    def _slot_layout_about_to_be_changed(self, *args):
+        self.layoutAboutToBeChanged.emit()
+
+    def _slot_layout_changed(self, *args):
+        self._mapping_dict = {}
+        self._update_persistent_indexes()
+        self.layoutChanged.emit()
+
+    @QtCore.Slot()
+    def _slot_model_reset(self):
+        self._mapping_dict = {}
+        self.endResetModel()
+
+    @QtCore.Slot(QtCore.QModelIndex, QtCore.QModelIndex)
+    def _slot_data_changed(self, top_left, bottom_right, *args):
+        if not (top_left and top_left.isValid()):
+            self.dataChanged.emit(top_left, bottom_right, *args)
+            return
+        parent_index = top_left.parent()
+        parent_item = self._get_parent_item(parent_index)
+        mapping = self._get_mapping(parent_item)
+        if mapping is None:
+            top_left, bottom_right = (
+                self.mapFromSource(top_left),
+                self.mapFromSource(bottom_right),
+            )
+            self.dataChanged.emit(top_left, bottom_right, *args)
+            return
+        first, last = top_left.row(), bottom_right.row()
+        proxy_parent = self.mapFromSource(parent_index)
+        source_rows = self._get_source_rows(mapping)
+        for range_first, range_last in group_row_ranges(source_rows[first : last + 1]):
+            range_top = self.index(range_first, top_left.column(), proxy_parent)
+            range_bottom = self.index(range_last, bottom_right.column(), proxy_parent)
+            self.dataChanged.emit(range_top, range_bottom, *args)
+        if args and args[0] and QtCore.Qt.DisplayRole not in args[0]:
+            # only the check state or the style is changed
+            return
+        children_list = self.sourceModel()._get_children(parent_item)
+        key_list = mapping["keys"]
+        changed = False
+        for row in range(first, last + 1):
+            key = self._get_key(mapping, children_list[row])
+            if key != key_list[row]:
+                key_list[row] = key
+                changed = True
+        if changed:
+            self._sort_mapping(mapping)
+
+    def _sort_mapping(self, mapping):
+        self.layoutAboutToBeChanged.emit()
+        mapping["rows"] = self._order_rows(mapping, mapping["rows"])
+        mapping["source_rows"] = None
+        self._update_persistent_indexes()
+        self.layoutChanged.emit()
+
 
 class MSortFilterModel(QtCore.QSortFilterProxyModel):
+    sig_filter_progress = QtCore.Signal(int)
+    sig_filter_finished = QtCore.Signal()
+
     def __init__(self, parent=None):
         super(MSortFilterModel, self).__init__(parent)
         if hasattr(self, "setRecursiveFilteringEnabled"):
@@ -282,24 +1765,386 @@ class MSortFilterModel(QtCore.QSortFilterProxyModel):
         self.search_reg = QtCore.QRegExp()
         self.search_reg.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
         self.search_reg.setPatternSyntax(QtCore.QRegExp.Wildcard)
+        self.search_matcher = None
+        # column -> (QRegExp, matcher) of the column filters, kept by each proxy
+        # model, the header_list can be shared by several proxy models
+        self._column_filter_dict = {}
+        # column -> {id(item): lowercase display text}, shared by MFilterCache
+        # when the source model is a MTableModel
+        self.text_index_enabled = False
+        self._text_index = {}
+        self._filter_cache = None
+        # chunked filter: id(item) -> accepted or not, None when not chunked
+        self.chunked_filter_enabled = False
+        self.filter_time_budget = 8
+        self._filter_result = None
+        self._filter_pass = None
+        self._filter_timer = QtCore.QTimer(self)
+        self._filter_timer.timeout.connect(self._slot_filter_chunk)
+        # typed sort: the rows are ordered by _MRowOrderModel, None when not typed
+        self.typed_sort_enabled = False
+        self._row_order_model = None
+        self._typed_sort_column = -1
+        self._typed_sort_order = QtCore.Qt.AscendingOrder
 
     def set_header_list(self, header_list):
         self.header_list = header_list
-        for head in self.header_list:
-            reg_exp = QtCore.QRegExp()
-            reg_exp.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
-            reg_exp.setPatternSyntax(QtCore.QRegExp.RegExp)
-            head.update({"reg": reg_exp})
+        self._column_filter_dict = {}
+        self._update_filter_result()
+
+    def set_text_index_enabled(self, flag):
+        """
+        Filter with a lowercase text index of the source MTableModel.
+        The display text of each searched/filtered cell is only formatted once,
+        and kept up to date when the source rows are inserted, removed or changed.
+        Plain substring/prefix patterns are matched without QRegExp.
+        """
+        self.text_index_enabled = flag
+        self._update_filter_result()
+        self.invalidateFilter()
+
+    def set_chunked_filter_enabled(self, flag):
+        """
+        Evaluate the search pattern in time-sliced chunks across event-loop ticks.
+        The view keeps the previous result until the pass is finished, a new
+        pattern drops the running pass. It works with the text index.
+        """
+        self.cancel_filter()
+        self.chunked_filter_enabled = flag
+        if flag:
+            self.set_text_index_enabled(True)
+        else:
+            self._update_filter_result()
+
+    def set_typed_sort_enabled(self, flag):
+        """
+        Sort by the raw value of each column instead of the formatted display text.
+        A header config can give a "sort_key": callable(value, data_obj).
+        The rows are ordered by a row order model between the proxy model and the
+        source MTableModel, with one python sorted() of the sort keys, lessThan is
+        not called. The order of the source model is not changed. mapToSource
+        returns the indexes of the row order model then, use utils.real_index to
+        get the index of the source model.
+        """
+        column, order = self.sortColumn(), self.sortOrder()
+        self.typed_sort_enabled = flag
+        # do not sort the rows with lessThan while the source model is changed
+        super(MSortFilterModel, self).sort(-1, order)
+        self.setSourceModel(self.sourceModel())
+        if column >= 0:
+            self.sort(column, order)
+
+    def sourceModel(self):
+        source_model = super(MSortFilterModel, self).sourceModel()
+        if source_model is not None and source_model is self._row_order_model:
+            return source_model.sourceModel()
+        return source_model
+
+    def sortColumn(self):
+        if self._row_order_model is not None:
+            return self._typed_sort_column
+        return super(MSortFilterModel, self).sortColumn()
+
+    def sortOrder(self):
+        if self._row_order_model is not None:
+            return self._typed_sort_order
+        return super(MSortFilterModel, self).sortOrder()
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        if self._row_order_model is None:
+            super(MSortFilterModel, self).sort(column, order)
+            return
+        header_list = self.sourceModel().header_list
+        if not 0 <= column < len(header_list):
+            column = -1
+        self._typed_sort_column = column
+        self._typed_sort_order = order
+        super(MSortFilterModel, self).sort(-1, order)
+        self._row_order_model.set_sort_key(
+            get_sort_key_func(header_list[column]) if column >= 0 else None, order
+        )
+
+    def set_filter_time_budget(self, millisecond):
+        """Set how long one chunk of the chunked filter may take."""
+        self.filter_time_budget = max(0, millisecond)
+
+    def is_filtering(self):
+        """Return whether a chunked filter pass is running."""
+        return self._filter_pass is not None
+
+    def cancel_filter(self):
+        """Drop the running chunked filter pass, keep the current result."""
+        self._filter_timer.stop()
+        self._filter_pass = None
+
+    def setSourceModel(self, source_model):
+        old_model = self.sourceModel()
+        if old_model is not source_model:
+            if old_model is not None:
+                old_model.dataChanged.disconnect(self._slot_source_data_changed)
+                old_model.rowsAboutToBeRemoved.disconnect(
+                    self._slot_source_rows_removed
+                )
+                old_model.modelAboutToBeReset.disconnect(self.clear_text_index)
+                if isinstance(old_model, MTableModel):
+                    old_model.sig_rows_evicted.disconnect(
+                        self._slot_source_rows_evicted
+                    )
+            if source_model is not None:
+                source_model.dataChanged.connect(self._slot_source_data_changed)
+                source_model.rowsAboutToBeRemoved.connect(
+                    self._slot_source_rows_removed
+                )
+                source_model.modelAboutToBeReset.connect(self.clear_text_index)
+            if self._filter_cache is not None:
+                self._filter_cache.release(self)
+            if isinstance(source_model, MTableModel):
+                # connect it before the proxy model, the cache is updated first
+                self._filter_cache = source_model.get_filter_cache()
+                source_model.sig_rows_evicted.connect(self._slot_source_rows_evicted)
+                self._text_index = self._filter_cache.text_index
+            else:
+                self._filter_cache = None
+                self._text_index = {}
+            self.clear_text_index()
+            self._update_filter_result()
+        order_model = self._row_order_model
+        if self.typed_sort_enabled and isinstance(source_model, MTableModel):
+            if order_model is None or order_model.sourceModel() is not source_model:
+                # connect it after the text index, the rows are filtered with it
+                self._row_order_model = _MRowOrderModel(source_model, self)
+            source_model = self._row_order_model
+        else:
+            self._row_order_model = None
+        if super(MSortFilterModel, self).sourceModel() is not source_model:
+            super(MSortFilterModel, self).setSourceModel(source_model)
+        if order_model is not None and order_model is not self._row_order_model:
+            # its connections to the source model are dropped when it is deleted
+            order_model.set_sort_key(None)
+            order_model.deleteLater()
+            if self._row_order_model is not None and self._typed_sort_column >= 0:
+                self.sort(self._typed_sort_column, self._typed_sort_order)
+        if self._row_order_model is None:
+            self._typed_sort_column = -1
+
+    def _get_filter_state(self, search_pattern=None):
+        if search_pattern is None:
+            search_pattern = self.search_reg.pattern()
+        return (
+            search_pattern,
+            tuple(
+                column
+                for column, data_dict in enumerate(self.header_list)
+                if data_dict.get("searchable", False)
+            ),
+            tuple(
+                sorted(
+                    (column, reg_exp.pattern())
+                    for column, (reg_exp, _) in self._column_filter_dict.items()
+                )
+            ),
+        )
+
+    def _update_filter_result(self):
+        if self._filter_cache is not None and self.text_index_enabled:
+            # the views with the same filter state share the result
+            self._filter_result = self._filter_cache.get_result(
+                self._get_filter_state(), owner=self
+            )
+            return
+        if self._filter_cache is not None:
+            self._filter_cache.release(self)
+        if self.chunked_filter_enabled:
+            self._filter_result = {}
+        else:
+            self._filter_result = None
+
+    @QtCore.Slot()
+    def clear_text_index(self):
+        if self._filter_cache is None:
+            self._text_index = {}
+            if self._filter_result is not None:
+                self._filter_result = {}
+        if self._filter_pass is not None:
+            # the items of the running pass are gone, start it again
+            self._start_filter_pass(self._filter_pass["search_reg"].pattern())
+
+    def _drop_text_index(self, data_obj_list):
+        # the shared text index and filter results are updated by MFilterCache
+        dict_list = []
+        if self._filter_cache is None:
+            dict_list.extend(self._text_index.values())
+            dict_list.append(self._filter_result or {})
+        if self._filter_pass is not None:
+            dict_list.append(self._filter_pass["result"])
+        if not any(dict_list):
+            return
+        stack = list(data_obj_list)
+        while stack:
+            data_obj = stack.pop()
+            for id_dict in dict_list:
+                id_dict.pop(id(data_obj), None)
+            children_obj = get_obj_value(data_obj, "children")
+            if isinstance(children_obj, list):
+                stack.extend(children_obj)
+
+    @QtCore.Slot(QtCore.QModelIndex, QtCore.QModelIndex)
+    def _slot_source_data_changed(self, top_left, bottom_right, *args):
+        if not (top_left and top_left.isValid()):
+            self.clear_text_index()
+            return
+        self._drop_text_index(
+            top_left.sibling(row, 0).internalPointer()
+            for row in range(top_left.row(), bottom_right.row() + 1)
+        )
+
+    @QtCore.Slot(QtCore.QModelIndex, int, int)
+    def _slot_source_rows_removed(self, parent_index, first, last):
+        source_model = self.sourceModel()
+        data_obj_list = [
+            source_model.index(row, 0, parent_index).internalPointer()
+            for row in range(first, last + 1)
+        ]
+        self._drop_text_index(data_obj_list)
+
+    def _slot_source_rows_evicted(self, data_obj_list):
+        self._drop_text_index(data_obj_list)
+
+    def _get_item_text(self, column, data_obj):
+        column_index = self._text_index.get(column)
+        if column_index is None:
+            column_index = self._text_index[column] = {}
+        text = column_index.get(id(data_obj))
+        if text is None:
+            resolver = (
+                self.sourceModel()
+                .resolver_table[column]
+                .get(QtCore.Qt.DisplayRole, _return_none)
+            )
+            text = column_index[id(data_obj)] = six.text_type(
+                resolver(data_obj)
+            ).lower()
+        return text
+
+    def _accepts_item(self, data_obj, search_reg, search_matcher):
+        if search_reg.pattern():
+            for column, data_dict in enumerate(self.header_list):
+                if data_dict.get("searchable", False):
+                    text = self._get_item_text(column, data_obj)
+                    if search_matcher is None:
+                        if search_reg.indexIn(text) != -1:
+                            break
+                    elif search_matcher(text):
+                        break
+            else:
+                return False
+
+        for column, (reg_exp, matcher) in self._column_filter_dict.items():
+            text = self._get_item_text(column, data_obj)
+            if matcher is None:
+                if not reg_exp.exactMatch(text):
+                    return False
+            elif not matcher(text):
+                return False
+        return True
+
+    def _iter_source_items(self):
+        stack = list(reversed(self.sourceModel().get_data_list()))
+        while stack:
+            data_obj = stack.pop()
+            yield data_obj
+            children_obj = get_obj_value(data_obj, "children")
+            if isinstance(children_obj, list):
+                stack.extend(reversed(children_obj))
+
+    def _start_filter_pass(self, pattern):
+        self.cancel_filter()
+        state = self._get_filter_state(pattern)
+        if self._filter_cache is not None and (
+            state in self._filter_cache.complete_state_set
+        ):
+            # another view has filtered the data with the same state
+            self.search_reg.setPattern(pattern)
+            self.search_matcher = compile_text_matcher(pattern, QtCore.QRegExp.Wildcard)
+            self._filter_result = self._filter_cache.get_result(state, owner=self)
+            self.invalidateFilter()
+            self.sig_filter_finished.emit()
+            return
+        search_reg = QtCore.QRegExp(self.search_reg)
+        search_reg.setPattern(pattern)
+        self._filter_pass = {
+            "search_reg": search_reg,
+            "search_matcher": compile_text_matcher(pattern, QtCore.QRegExp.Wildcard),
+            "items": self._iter_source_items(),
+            # start with the result computed by the other views
+            "result": dict(self._filter_cache.get_result(state))
+            if self._filter_cache is not None
+            else {},
+            "count": 0,
+        }
+        self._filter_timer.start()
+
+    @QtCore.Slot()
+    def _slot_filter_chunk(self):
+        filter_pass = self._filter_pass
+        if filter_pass is None:
+            self._filter_timer.stop()
+            return
+        search_reg = filter_pass["search_reg"]
+        search_matcher = filter_pass["search_matcher"]
+        result = filter_pass["result"]
+        finished = True
+        elapsed_timer = QtCore.QElapsedTimer()
+        elapsed_timer.start()
+        for data_obj in filter_pass["items"]:
+            if id(data_obj) not in result:
+                result[id(data_obj)] = self._accepts_item(
+                    data_obj, search_reg, search_matcher
+                )
+            filter_pass["count"] += 1
+            if elapsed_timer.elapsed() >= self.filter_time_budget:
+                finished = False
+                break
+        self.sig_filter_progress.emit(filter_pass["count"])
+        if finished:
+            self.cancel_filter()
+            self.search_reg.setPattern(search_reg.pattern())
+            self.search_matcher = search_matcher
+            self._filter_result = result
+            if self._filter_cache is not None:
+                self._filter_cache.set_result(
+                    self._get_filter_state(), result, owner=self
+                )
+            self.invalidateFilter()
+            self.sig_filter_finished.emit()
 
     def filterAcceptsRow(self, source_row, source_parent):
+        if not self.search_reg.pattern() and not self._column_filter_dict:
+            # nothing to filter, do not ask the source model for the row at all
+            return True
+        # the row order model of the typed sort when there is one
+        source_model = super(MSortFilterModel, self).sourceModel()
+        if self.text_index_enabled and isinstance(self.sourceModel(), MTableModel):
+            source_index = source_model.index(source_row, 0, source_parent)
+            data_obj = source_index.internalPointer()
+            if self._filter_result is None:
+                return self._accepts_item(
+                    data_obj, self.search_reg, self.search_matcher
+                )
+            accepted = self._filter_result.get(id(data_obj))
+            if accepted is None:
+                accepted = self._accepts_item(
+                    data_obj, self.search_reg, self.search_matcher
+                )
+                self._filter_result[id(data_obj)] = accepted
+            return accepted
+
         # 如果search 栏有内容 先匹配 search 栏的内容
         if self.search_reg.pattern():
             for index, data_dict in enumerate(self.header_list):
                 if data_dict.get("searchable", False):
-                    model_index = self.sourceModel().index(
-                        source_row, index, source_parent
-                    )
-                    value = self.sourceModel().data(model_index)
+                    model_index = source_model.index(source_row, index, source_parent)
+                    value = source_model.data(model_index)
                     if self.search_reg.indexIn(six.text_type(value)) != -1:
                         # 搜索匹配上了
                         break
@@ -308,23 +2153,162 @@ class MSortFilterModel(QtCore.QSortFilterProxyModel):
                 return False
 
         # 再去匹配 filter 组合
-        for index, data_dict in enumerate(self.header_list):
-            model_index = self.sourceModel().index(source_row, index, source_parent)
-            value = self.sourceModel().data(model_index)
-            reg_exp = data_dict.get("reg", None)
-            if reg_exp and reg_exp.pattern() and (not reg_exp.exactMatch(value)):
+        for index, (reg_exp, _) in self._column_filter_dict.items():
+            model_index = source_model.index(source_row, index, source_parent)
+            value = source_model.data(model_index)
+            if not reg_exp.exactMatch(value):
                 # 不符合筛选，直接返回 False
                 return False
 
         return True
 
+    def _use_chunked_filter(self):
+        return self.chunked_filter_enabled and isinstance(
+            self.sourceModel(), MTableModel
+        )
+
     def set_search_pattern(self, pattern):
+        if self._use_chunked_filter() and (pattern or self._column_filter_dict):
+            self._start_filter_pass(pattern)
+            return
+        # nothing is filtered out without a pattern, show all the rows at once
+        self.cancel_filter()
         self.search_reg.setPattern(pattern)
+        self.search_matcher = compile_text_matcher(pattern, QtCore.QRegExp.Wildcard)
+        self._update_filter_result()
         self.invalidateFilter()
 
     def set_filter_attr_pattern(self, attr, pattern):
-        for data_dict in self.header_list:
+        for column, data_dict in enumerate(self.header_list):
             if data_dict.get("key") == attr:
-                data_dict.get("reg").setPattern(pattern)
+                if pattern:
+                    reg_exp = QtCore.QRegExp(pattern)
+                    reg_exp.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+                    reg_exp.setPatternSyntax(QtCore.QRegExp.RegExp)
+                    self._column_filter_dict[column] = (
+                        reg_exp,
+                        compile_text_matcher(pattern, QtCore.QRegExp.RegExp),
+                    )
+                else:
+                    self._column_filter_dict.pop(column, None)
                 break
+        if self._use_chunked_filter():
+            # the filter result of the last pass is out of date
+            if self._filter_pass is not None:
+                pattern = self._filter_pass["search_reg"].pattern()
+            else:
+                pattern = self.search_reg.pattern()
+            self._start_filter_pass(pattern)
+            return
+        self._update_filter_result()
         self.invalidateFilter()
+
+
+class MPageLoader(QtCore.QObject):
+    """
+    Server-side paging for MTableModel.
+    Only the current page lives in the model, the pages are fetched by the
+    user-supplied fetch_page(offset, limit) callback, and the neighbour pages are
+    prefetched into a small LRU cache so that paging back and forth is instant.
+    """
+
+    sig_page_loaded = QtCore.Signal(int, int)
+
+    def __init__(self, model, fetch_page, cache_size=5, prefetch=1, parent=None):
+        super(MPageLoader, self).__init__(parent)
+        self.model = model
+        self.fetch_page = fetch_page
+        self.cache_size = max(1, cache_size)
+        self.prefetch = max(0, prefetch)
+        self.total = None
+        self.page_size = 0
+        self.current_page = 0
+        self._loaded_key = None
+        self._page_cache = collections.OrderedDict()
+        self._prefetch_list = []
+        self._prefetch_timer = QtCore.QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(0)
+        self._prefetch_timer.timeout.connect(self._slot_prefetch)
+
+    def set_total(self, total):
+        """Set the total record count, None means unknown."""
+        self.total = total
+
+    def clear(self):
+        """Drop the cached pages, call it when the server side data is changed."""
+        self._prefetch_timer.stop()
+        self._prefetch_list = []
+        self._page_cache.clear()
+        self._loaded_key = None
+
+    def cached_pages(self):
+        """Get the (offset, limit) keys of the cached pages, least recently used first."""
+        return list(self._page_cache.keys())
+
+    def _get_page(self, offset, limit):
+        key = (offset, limit)
+        page_data = self._page_cache.pop(key, None)
+        if page_data is None:
+            page_data = list(self.fetch_page(offset, limit) or [])
+        self._page_cache[key] = page_data
+        while len(self._page_cache) > self.cache_size:
+            self._page_cache.popitem(last=False)
+        return page_data
+
+    @QtCore.Slot(int, int)
+    def load_page(self, page_size, current_page):
+        """
+        Load the page into the model, connect MPage.sig_page_changed to it.
+        :param page_size: record count per page
+        :param current_page: page number, start from 1
+        :return: None
+        """
+        self.page_size = page_size
+        self.current_page = max(1, current_page)
+        offset = (self.current_page - 1) * page_size
+        if self._loaded_key == (offset, page_size):
+            return
+        page_data = self._get_page(offset, page_size)
+        self._loaded_key = (offset, page_size)
+        self.model.set_data_list(page_data)
+        self.sig_page_loaded.emit(offset, len(page_data))
+
+        self._prefetch_list = []
+        for distance in range(1, self.prefetch + 1):
+            for page in (self.current_page + distance, self.current_page - distance):
+                page_offset = (page - 1) * page_size
+                if page < 1 or (self.total is not None and page_offset >= self.total):
+                    continue
+                if (
+                    self.total is None
+                    and page_offset > offset
+                    and (len(page_data) < page_size)
+                ):
+                    # the current page is the last one
+                    continue
+                if (page_offset, page_size) not in self._page_cache:
+                    self._prefetch_list.append((page_offset, page_size))
+        # only prefetch nearby pages, and never more than the cache can hold
+        del self._prefetch_list[self.cache_size - 1 :]
+        if self._prefetch_list:
+            self._prefetch_timer.start()
+
+    def reload(self):
+        """Fetch the current page again."""
+        self.clear()
+        if self.page_size:
+            self.load_page(self.page_size, self.current_page)
+
+    @QtCore.Slot()
+    def _slot_prefetch(self):
+        if not self._prefetch_list:
+            return
+        current_key = ((self.current_page - 1) * self.page_size, self.page_size)
+        offset, limit = self._prefetch_list.pop(0)
+        self._get_page(offset, limit)
+        # keep the current page as the most recently used one
+        if current_key in self._page_cache:
+            self._page_cache[current_key] = self._page_cache.pop(current_key)
+        if self._prefetch_list:
+            self._prefetch_timer.start()
@@ -9,6 +9,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+# Import built-in modules
+import collections
+import os
+
 # Import third-party modules
 from Qt import QtCore
 from Qt import QtGui
@@ -17,7 +21,9 @@ from dayu_widgets import dayu_theme
 from dayu_widgets import utils
 from dayu_widgets.header_view import MHeaderView
 from dayu_widgets.item_model import MTableModel
+from dayu_widgets.item_model import THUMBNAIL_ROLE
 from dayu_widgets.menu import MMenu
+from dayu_widgets.qt import MIcon
 from dayu_widgets.qt import MPixmap
 from dayu_widgets.qt import get_scale_factor
 import six
@@ -55,6 +61,22 @@ def draw_empty_content(view, text=None, pix_map=None):
     painter.end()
 
 
+def _arrow_pixmap_factory(args):
+    height, color, ratio = args
+    pix = MPixmap("down_fill.svg", color).scaledToWidth(
+        int(height * 0.5 * ratio), QtCore.Qt.SmoothTransformation
+    )
+    # Qt4 and Qt before 5.6 have no device pixel ratio, the ratio is always 1.0
+    if hasattr(pix, "setDevicePixelRatio"):
+        pix.setDevicePixelRatio(ratio)
+    return pix
+
+
+# Used for MOptionDelegate paint, the down arrow pixmap scaled for
+# (row height, icon color, device pixel ratio)
+interned_arrow_pixmap = utils.MValuePool(_arrow_pixmap_factory)
+
+
 class MOptionDelegate(QtWidgets.QStyledItemDelegate):
     def __init__(self, parent=None):
         super(MOptionDelegate, self).__init__(parent)
@@ -98,17 +120,18 @@ class MOptionDelegate(QtWidgets.QStyledItemDelegate):
         painter.save()
         icon_color = dayu_theme.icon_color
         if option.state & QtWidgets.QStyle.State_MouseOver:
-            painter.fillRect(option.rect, QtGui.QColor(dayu_theme.primary_5))
+            painter.fillRect(option.rect, utils.interned_color(dayu_theme.primary_5))
             icon_color = "#fff"
         if option.state & QtWidgets.QStyle.State_Selected:
-            painter.fillRect(option.rect, QtGui.QColor(dayu_theme.primary_6))
+            painter.fillRect(option.rect, utils.interned_color(dayu_theme.primary_6))
             icon_color = "#fff"
         painter.setRenderHint(QtGui.QPainter.Antialiasing)
         painter.setPen(QtCore.Qt.NoPen)
         painter.setBrush(QtGui.QBrush(QtCore.Qt.white))
-        pix = MPixmap("down_fill.svg", icon_color)
         h = option.rect.height()
-        pix = pix.scaledToWidth(h * 0.5, QtCore.Qt.SmoothTransformation)
+        device = painter.device()
+        ratio = getattr(device, "devicePixelRatioF", lambda: 1.0)()
+        pix = interned_arrow_pixmap((h, icon_color, ratio))
         painter.drawPixmap(
             option.rect.x() + option.rect.width() - h, option.rect.y() + h / 4, pix
         )
@@ -132,6 +155,12 @@ class MOptionDelegate(QtWidgets.QStyledItemDelegate):
 def set_header_list(self, header_list):
     scale_x, _ = get_scale_factor()
     self.header_list = header_list
+    self._link_column_set = set(
+        index for index, i in enumerate(header_list) if i.get("is_link", False)
+    )
+    self._link_cache = {}
+    if self._link_column_set:
+        self.setMouseTracking(True)
     if self.header_view:
         self.header_view.setSortIndicator(-1, QtCore.Qt.AscendingOrder)
         for index, i in enumerate(header_list):
@@ -178,44 +207,77 @@ def slot_context_menu(self, point):
         self.sig_context_menu.emit(event)
 
 
-def mouse_move_event(self, event):
-    index = self.indexAt(event.pos())
+def get_link_value(self, index):
+    """
+    Get the link value of the cell, None when the cell is not a link.
+    Only the cells of the "is_link" columns are looked up, and the values are
+    cached until the view scrolls or the model changes, so the cache only holds
+    the visible rows.
+    """
+    if not index.isValid() or index.column() not in self._link_column_set:
+        return None
+    key = (index.row(), index.column(), index.internalId())
+    if key in self._link_cache:
+        return self._link_cache[key]
     real_index = utils.real_index(index)
-    if self.header_list[real_index.column()].get("is_link", False):
-        key_name = self.header_list[real_index.column()]["attr"]
-        data_obj = utils.real_model(self.model()).data_list[real_index.row()]
-        value = utils.get_obj_value(data_obj, key_name)
-        if value:
-            self.setCursor(QtCore.Qt.PointingHandCursor)
-            return
-    self.setCursor(QtCore.Qt.ArrowCursor)
+    data_obj = real_index.internalPointer()
+    value = utils.get_obj_value(data_obj, self.header_list[real_index.column()]["key"])
+    self._link_cache[key] = (value, data_obj) if value else None
+    return self._link_cache[key]
+
+
+# the model signals that make the cached link values of the view out of date
+_LINK_CACHE_SIGNALS = (
+    "modelReset",
+    "layoutChanged",
+    "rowsInserted",
+    "rowsRemoved",
+    "dataChanged",
+)
+
+
+def slot_clear_link_cache(self, *args):
+    self._link_cache.clear()
+
+
+def mouse_move_event(self, event):
+    if self._link_column_set:
+        is_link = bool(self.get_link_value(self.indexAt(event.pos())))
+        if is_link != self._link_hovered:
+            self._link_hovered = is_link
+            self.setCursor(
+                QtCore.Qt.PointingHandCursor if is_link else QtCore.Qt.ArrowCursor
+            )
+    QtWidgets.QTableView.mouseMoveEvent(self, event)
 
 
 def mouse_release_event(self, event):
-    if event.button() != QtCore.Qt.LeftButton:
+    if event.button() != QtCore.Qt.LeftButton or not self._link_column_set:
         QtWidgets.QTableView.mouseReleaseEvent(self, event)
         return
-    index = self.indexAt(event.pos())
-    real_index = utils.real_index(index)
-    if self.headerList[real_index.column()].get("is_link", False):
-        key_name = self.header_list[real_index.column()]["attr"]
-        data_obj = utils.real_model(self.model()).data_list[real_index.row()]
-        value = utils.get_obj_value(data_obj, key_name)
-        if value:
-            if isinstance(value, dict):
-                self.sig_link_clicked.emit(value)
-            elif isinstance(value, six.string_types):
-                self.sig_link_clicked.emit(data_obj)
-            elif isinstance(value, list):
-                for i in value:
-                    self.sig_link_clicked.emit(i)
+    link = self.get_link_value(self.indexAt(event.pos()))
+    QtWidgets.QTableView.mouseReleaseEvent(self, event)
+    if link:
+        value, data_obj = link
+        if isinstance(value, dict):
+            self.sig_link_clicked.emit(value)
+        elif isinstance(value, six.string_types):
+            self.sig_link_clicked.emit(data_obj)
+        elif isinstance(value, list):
+            for i in value:
+                self.sig_link_clicked.emit(i)
 
 
 class MTableView(QtWidgets.QTableView):
     set_header_list = set_header_list
     enable_context_menu = enable_context_menu
     slot_context_menu = slot_context_menu
+    get_link_value = get_link_value
+    slot_clear_link_cache = slot_clear_link_cache
+    mouseMoveEvent = mouse_move_event
+    mouseReleaseEvent = mouse_release_event
     sig_context_menu = QtCore.Signal(object)
+    sig_link_clicked = QtCore.Signal(object)
 
     def __init__(self, size=None, show_row_count=False, parent=None):
         super(MTableView, self).__init__(parent)
@@ -235,6 +297,21 @@ class MTableView(QtWidgets.QTableView):
         self.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.setAlternatingRowColors(True)
         self.setShowGrid(False)
+        self._link_column_set = set()
+        self._link_cache = {}
+        self._link_hovered = False
+        self.verticalScrollBar().valueChanged.connect(self.slot_clear_link_cache)
+
+    def setModel(self, model):
+        old_model = self.model()
+        if old_model is not None:
+            for name in _LINK_CACHE_SIGNALS:
+                getattr(old_model, name).disconnect(self.slot_clear_link_cache)
+        self._link_cache.clear()
+        super(MTableView, self).setModel(model)
+        if model is not None:
+            for name in _LINK_CACHE_SIGNALS:
+                getattr(model, name).connect(self.slot_clear_link_cache)
 
     def set_no_data_text(self, text):
         self._no_data_text = text
@@ -242,6 +319,21 @@ class MTableView(QtWidgets.QTableView):
     def set_no_data_image(self, image):
         self._no_data_image = image
 
+    def set_fixed_row_height(self, height=None):
+        """
+        Make all the rows the same height, the view then never measures the rows,
+        and the model skips the per cell size hint.
+        Call it after setModel.
+        :param height: row height, default is dayu_theme.default_size
+        :return: None
+        """
+        ver_header_view = self.verticalHeader()
+        ver_header_view.setResizeMode(QtWidgets.QHeaderView.Fixed)
+        ver_header_view.setDefaultSectionSize(height or dayu_theme.default_size)
+        model = utils.real_model(self.model())
+        if isinstance(model, MTableModel):
+            model.set_size_hint_enabled(False)
+
     def setShowGrid(self, flag):
         self.header_view.setProperty("grid", flag)
         self.verticalHeader().setProperty("grid", flag)
@@ -267,6 +359,7 @@ class MTableView(QtWidgets.QTableView):
         #     'align': None,  # 选填，该单元格文字的对齐方式
         #     'font': None,  # 选填，该单元格文字的格式，例如加下划线、加粗等等
         #     'icon': None,  # 选填，该单格元的图标，注意，当 QListView 使用图标模式时，每个item的图片也是在这里设置
+        #     'thumbnail': None,  # 选填，该单元格图片文件的路径，MBigView.set_thumbnail_loader 后在后台线程加载
         #     'tooltip': None,  # 选填，鼠标指向该单元格时，显示的提示信息
         #     'size': None,  # 选填，该列的 hint size，设置
         #     'data': None,
@@ -336,6 +429,169 @@ class MTreeView(QtWidgets.QTreeView):
     def set_no_data_text(self, text):
         self._no_data_text = text
 
+    def set_uniform_row_heights(self, flag=True):
+        """
+        Make all the rows as high as the first one, the view then only measures
+        the first row, and the model skips the per cell size hint.
+        Call it after setModel.
+        :param flag: bool
+        :return: None
+        """
+        self.setUniformRowHeights(flag)
+        model = utils.real_model(self.model())
+        if isinstance(model, MTableModel):
+            model.set_size_hint_enabled(not flag)
+
+
+def _get_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except (OSError, TypeError):
+        return None
+
+
+class _MThumbnailSignals(QtCore.QObject):
+    sig_done = QtCore.Signal(object, object, object)
+
+
+class _MThumbnailTask(QtCore.QRunnable):
+    """Decode one image file into a QImage scaled to the size, in a worker thread."""
+
+    def __init__(self, key, signals):
+        super(_MThumbnailTask, self).__init__()
+        self.key = key
+        self.signals = signals
+
+    def run(self):
+        path, width, height = self.key
+        # the file is checked here, not each time the item is painted
+        mtime = _get_mtime(path)
+        reader = QtGui.QImageReader(path)
+        image_size = reader.size()
+        if image_size.isValid():
+            # let the decoder scale, big images are never fully decoded
+            reader.setScaledSize(
+                image_size.scaled(width, height, QtCore.Qt.KeepAspectRatio)
+            )
+        image = reader.read()
+        if not image.isNull() and (image.width() > width or image.height() > height):
+            image = image.scaled(
+                width, height, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation
+            )
+        self.signals.sig_done.emit(self.key, image, mtime)
+
+
+class MThumbnailLoader(QtCore.QObject):
+    """
+    Load the thumbnails of image files on a thread pool.
+    get_thumbnail returns None until the image is decoded, then sig_thumbnail_ready
+    is emitted. The decoded thumbnails are kept in a LRU cache keyed by
+    (path, width, height), so a changed icon size is decoded again. The files are
+    not checked when the items are painted, call reload after they are changed.
+    """
+
+    sig_thumbnail_ready = QtCore.Signal(six.string_types[0])
+
+    def __init__(self, max_size=512, thread_count=None, parent=None):
+        super(MThumbnailLoader, self).__init__(parent)
+        self.max_size = max_size
+        self.pool = QtCore.QThreadPool(self)
+        if thread_count:
+            self.pool.setMaxThreadCount(thread_count)
+        self._cache = collections.OrderedDict()
+        self._pending_set = set()
+        self._signals = _MThumbnailSignals(self)
+        self._signals.sig_done.connect(self._slot_done)
+
+    def get_thumbnail(self, path, size):
+        """
+        Get the thumbnail pixmap of the image file, request it if not loaded yet.
+        :param path: image file path
+        :param size: QSize, the thumbnail fits in it
+        :return: QPixmap, a null one if the file can not be read. None if it is loading
+        """
+        key = (path, size.width(), size.height())
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache[key] = self._cache.pop(key)
+            return entry[0]
+        if key not in self._pending_set:
+            self._pending_set.add(key)
+            self.pool.start(_MThumbnailTask(key, self._signals))
+        return None
+
+    def cached_count(self):
+        return len(self._cache)
+
+    def is_loading(self):
+        return bool(self._pending_set)
+
+    @QtCore.Slot()
+    def clear_queue(self):
+        """
+        Drop the requests that are not started yet, e.g. after the view scrolled.
+        The items still visible request their thumbnails again when painted.
+        """
+        self.pool.clear()
+        self._pending_set.clear()
+
+    def clear(self):
+        self.clear_queue()
+        self._cache.clear()
+
+    def reload(self, path=None):
+        """
+        Check the files of the cached thumbnails again. The thumbnails of the
+        changed files are dropped, and sig_thumbnail_ready is emitted for them,
+        so the views paint them again and they are decoded again.
+        :param path: image file path, None to check all the cached files
+        :return: list of the changed file paths
+        """
+        mtime_dict = {}
+        changed_list = []
+        for key, (_, mtime) in list(self._cache.items()):
+            if path is not None and key[0] != path:
+                continue
+            if key[0] not in mtime_dict:
+                mtime_dict[key[0]] = _get_mtime(key[0])
+            if mtime_dict[key[0]] != mtime:
+                del self._cache[key]
+                if key[0] not in changed_list:
+                    changed_list.append(key[0])
+        for changed_path in changed_list:
+            self.sig_thumbnail_ready.emit(changed_path)
+        return changed_list
+
+    @QtCore.Slot(object, object, object)
+    def _slot_done(self, key, image, mtime):
+        self._pending_set.discard(key)
+        # QPixmap can only be created in the GUI thread
+        self._cache[key] = (QtGui.QPixmap.fromImage(image), mtime)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        self.sig_thumbnail_ready.emit(key[0])
+
+
+class MThumbnailDelegate(QtWidgets.QStyledItemDelegate):
+    """
+    Show the "thumbnail" image of the items through a MThumbnailLoader,
+    a placeholder icon is shown until the image is loaded.
+    """
+
+    def __init__(self, loader, parent=None):
+        super(MThumbnailDelegate, self).__init__(parent)
+        self.loader = loader
+        self.placeholder = MIcon("media_line.svg")
+
+    def initStyleOption(self, option, index):
+        super(MThumbnailDelegate, self).initStyleOption(option, index)
+        path = index.data(THUMBNAIL_ROLE)
+        if not path:
+            return
+        pix_map = self.loader.get_thumbnail(path, option.decorationSize)
+        option.icon = self.placeholder if pix_map is None else QtGui.QIcon(pix_map)
+        option.features |= QtWidgets.QStyleOptionViewItem.HasDecoration
+
 
 class MBigView(QtWidgets.QListView):
     set_header_list = set_header_list
@@ -354,6 +610,34 @@ class MBigView(QtWidgets.QListView):
         self.setMovement(QtWidgets.QListView.Static)
         self.setSpacing(10)
         self.setIconSize(QtCore.QSize(128, 128))
+        self.thumbnail_loader = None
+
+    def set_thumbnail_loader(self, loader=None):
+        """
+        Load the "thumbnail" images of the header config in background threads,
+        instead of the "icon" config which is loaded in the GUI thread.
+        Only the painted items are requested, and the queued requests are dropped
+        when the view scrolls.
+        :param loader: MThumbnailLoader, create a new one if None
+        :return: MThumbnailLoader
+        """
+        if self.thumbnail_loader is not None:
+            self.thumbnail_loader.sig_thumbnail_ready.disconnect(
+                self._slot_thumbnail_ready
+            )
+            self.verticalScrollBar().valueChanged.disconnect(
+                self.thumbnail_loader.clear_queue
+            )
+        self.thumbnail_loader = loader or MThumbnailLoader(parent=self)
+        self.thumbnail_loader.sig_thumbnail_ready.connect(self._slot_thumbnail_ready)
+        self.verticalScrollBar().valueChanged.connect(self.thumbnail_loader.clear_queue)
+        self.setItemDelegate(MThumbnailDelegate(self.thumbnail_loader, parent=self))
+        return self.thumbnail_loader
+
+    @QtCore.Slot(six.string_types[0])
+    def _slot_thumbnail_ready(self, path):
+        # the updates are merged into one repaint
+        self.viewport().update()
 
     def wheelEvent(self, event):
         """Override wheelEvent while user press ctrl, zoom the list view icon size."""
@@ -14,11 +14,17 @@ from __future__ import print_function
 # Import third-party modules
 from Qt import QtCore
 from Qt import QtWidgets
+from dayu_widgets import utils
 from dayu_widgets.button_group import MToolButtonGroup
+from dayu_widgets.item_model import MPageLoader
 from dayu_widgets.item_model import MSortFilterModel
 from dayu_widgets.item_model import MTableModel
 from dayu_widgets.item_view import MBigView
 from dayu_widgets.item_view import MTableView
+from dayu_widgets.item_view_set import chunked_search
+from dayu_widgets.item_view_set import set_source_model
+from dayu_widgets.item_view_set import slot_delay_search_text_changed
+from dayu_widgets.item_view_set import slot_search_text_changed
 from dayu_widgets.line_edit import MLineEdit
 from dayu_widgets.page import MPage
 from dayu_widgets.tool_button import MToolButton
@@ -27,17 +33,25 @@ from dayu_widgets.tool_button import MToolButton
 class MItemViewFullSet(QtWidgets.QWidget):
     sig_double_clicked = QtCore.Signal(QtCore.QModelIndex)
     sig_left_clicked = QtCore.Signal(QtCore.QModelIndex)
+    sig_search_progress = QtCore.Signal(int)
+    sig_search_finished = QtCore.Signal()
     sig_current_changed = QtCore.Signal(QtCore.QModelIndex, QtCore.QModelIndex)
     sig_current_row_changed = QtCore.Signal(QtCore.QModelIndex, QtCore.QModelIndex)
     sig_current_column_changed = QtCore.Signal(QtCore.QModelIndex, QtCore.QModelIndex)
     sig_selection_changed = QtCore.Signal(QtCore.QItemSelection, QtCore.QItemSelection)
     sig_context_menu = QtCore.Signal(object)
+    set_source_model = set_source_model
+    chunked_search = chunked_search
+    _slot_search_text_changed = slot_search_text_changed
+    _slot_delay_search_text_changed = slot_delay_search_text_changed
 
     def __init__(self, table_view=True, big_view=False, parent=None):
         super(MItemViewFullSet, self).__init__(parent)
         self.sort_filter_model = MSortFilterModel()
         self.source_model = MTableModel()
         self.sort_filter_model.setSourceModel(self.source_model)
+        self.sort_filter_model.sig_filter_progress.connect(self.sig_search_progress)
+        self.sort_filter_model.sig_filter_finished.connect(self.sig_search_finished)
 
         self.stack_widget = QtWidgets.QStackedWidget()
 
@@ -95,12 +109,14 @@ class MItemViewFullSet(QtWidgets.QWidget):
             self.sort_filter_model.set_search_pattern
         )
         self.search_line_edit.setVisible(False)
+        self._chunked_search = False
 
         self.top_lay.addStretch()
         self.top_lay.addWidget(self.search_line_edit)
         self.tool_bar.setLayout(self.top_lay)
 
         self.page_set = MPage()
+        self.page_loader = None
         self.main_lay = QtWidgets.QVBoxLayout()
         self.main_lay.setSpacing(5)
         self.main_lay.setContentsMargins(0, 0, 0, 0)
@@ -132,7 +148,7 @@ class MItemViewFullSet(QtWidgets.QWidget):
     def slot_left_clicked(self, start_index):
         button = QtWidgets.QApplication.mouseButtons()
         if button == QtCore.Qt.LeftButton:
-            real_index = self.sort_filter_model.mapToSource(start_index)
+            real_index = utils.real_index(start_index)
             self.sig_left_clicked.emit(real_index)
 
     def set_header_list(self, header_list):
@@ -159,13 +175,46 @@ class MItemViewFullSet(QtWidgets.QWidget):
             view = self.stack_widget.widget(index)
             view.set_header_list(self.source_model.header_list)
 
+    def set_page_fetcher(self, fetch_page, cache_size=5, prefetch=1):
+        """
+        Enable the server-side paging mode, only the current page is kept in the model.
+        Call set_record_count with the total count to load the first page.
+        :param fetch_page: callable(offset, limit) return the data list of the page
+        :param cache_size: how many pages are kept in the LRU cache
+        :param prefetch: how many pages before/after the current one are prefetched
+        :return: MPageLoader
+        """
+        if self.page_loader is not None:
+            self.page_set.sig_page_changed.disconnect(self.page_loader.load_page)
+        self.page_loader = MPageLoader(
+            self.source_model,
+            fetch_page,
+            cache_size=cache_size,
+            prefetch=prefetch,
+            parent=self,
+        )
+        self.page_set.sig_page_changed.connect(self.page_loader.load_page)
+        return self.page_loader
+
     @QtCore.Slot(int)
     def set_record_count(self, total):
+        if self.page_loader is not None:
+            self.page_loader.clear()
+            self.page_loader.set_total(total)
         self.page_set.set_total(total)
+        if self.page_loader is not None:
+            self.page_loader.load_page(
+                self.page_set.field("page_size_selected"),
+                self.page_set.field("current_page"),
+            )
 
     def get_data(self):
         return self.source_model.get_data_list()
 
+    def remove_selection(self):
+        """Remove the selected rows, one notification for each contiguous range."""
+        self.source_model.remove_many(self.selection_model.selectedIndexes())
+
     def searchable(self):
         """Enable search line edit visible."""
         self.search_line_edit.setVisible(True)
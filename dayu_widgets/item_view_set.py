@@ -14,6 +14,7 @@ from __future__ import print_function
 # Import third-party modules
 from Qt import QtCore
 from Qt import QtWidgets
+from dayu_widgets import utils
 from dayu_widgets.item_model import MSortFilterModel
 from dayu_widgets.item_model import MTableModel
 from dayu_widgets.item_view import MBigView
@@ -24,13 +25,75 @@ from dayu_widgets.line_edit import MLineEdit
 from dayu_widgets.tool_button import MToolButton
 
 
+def set_source_model(self, source_model):
+    """
+    Show the data of another MTableModel, e.g. one from get_shared_model.
+    The text index of the proxy model is enabled, so the view sets over one model
+    share the data, the text index and the filter results, instead of keeping a
+    copy each. The views use the header list of the new model, or the current
+    one when the new model has no header list.
+    :param source_model: MTableModel
+    :return: self
+    """
+    header_list = source_model.header_list or self.source_model.header_list
+    self.source_model = source_model
+    self.sort_filter_model.set_text_index_enabled(True)
+    self.sort_filter_model.setSourceModel(source_model)
+    self.set_header_list(header_list)
+    return self
+
+
+def chunked_search(self, delay=None):
+    """
+    Search after the user stops typing, and filter the rows in time-sliced chunks,
+    so the view keeps responsive with large data. It can be called again to change
+    the delay.
+    :param delay: debounce duration in milliseconds, default is the line edit's
+    :return: self
+    """
+    if delay is not None:
+        self.search_line_edit.set_delay_duration(delay)
+    if self._chunked_search:
+        return self
+    self._chunked_search = True
+    self.search_line_edit.textChanged.disconnect(
+        self.sort_filter_model.set_search_pattern
+    )
+    self.search_line_edit.textChanged.connect(self._slot_search_text_changed)
+    self.search_line_edit.sig_delay_text_changed.connect(
+        self._slot_delay_search_text_changed
+    )
+    self.sort_filter_model.set_chunked_filter_enabled(True)
+    return self
+
+
+def slot_search_text_changed(self, text):
+    # user keeps typing, the running pass is stale
+    self.sort_filter_model.cancel_filter()
+    if not text:
+        # the clear button does not start the delay timer, show all rows at once
+        self.sort_filter_model.set_search_pattern(text)
+
+
+def slot_delay_search_text_changed(self, text):
+    # the empty text is already applied by slot_search_text_changed
+    if text:
+        self.sort_filter_model.set_search_pattern(text)
+
+
 class MItemViewSet(QtWidgets.QWidget):
     sig_double_clicked = QtCore.Signal(QtCore.QModelIndex)
     sig_left_clicked = QtCore.Signal(QtCore.QModelIndex)
+    sig_search_progress = QtCore.Signal(int)
+    sig_search_finished = QtCore.Signal()
     TableViewType = MTableView
     BigViewType = MBigView
     TreeViewType = MTreeView
     ListViewType = MListView
+    set_source_model = set_source_model
+    chunked_search = chunked_search
+    _slot_search_text_changed = slot_search_text_changed
+    _slot_delay_search_text_changed = slot_delay_search_text_changed
 
     def __init__(self, view_type=None, parent=None):
         super(MItemViewSet, self).__init__(parent)
@@ -41,6 +104,8 @@ class MItemViewSet(QtWidgets.QWidget):
         self.sort_filter_model = MSortFilterModel()
         self.source_model = MTableModel()
         self.sort_filter_model.setSourceModel(self.source_model)
+        self.sort_filter_model.sig_filter_progress.connect(self.sig_search_progress)
+        self.sort_filter_model.sig_filter_finished.connect(self.sig_search_finished)
         view_class = view_type or MItemViewSet.TableViewType
         self.item_view = view_class()
         self.item_view.doubleClicked.connect(self.sig_double_clicked)
@@ -56,6 +121,7 @@ class MItemViewSet(QtWidgets.QWidget):
             self.sort_filter_model.set_search_pattern
         )
         self._search_line_edit.setVisible(False)
+        self._chunked_search = False
         self._search_lay = QtWidgets.QHBoxLayout()
         self._search_lay.setContentsMargins(0, 0, 0, 0)
         self._search_lay.addStretch()
@@ -69,7 +135,7 @@ class MItemViewSet(QtWidgets.QWidget):
     def slot_left_clicked(self, start_index):
         button = QtWidgets.QApplication.mouseButtons()
         if button == QtCore.Qt.LeftButton:
-            real_index = self.sort_filter_model.mapToSource(start_index)
+            real_index = utils.real_index(start_index)
             self.sig_left_clicked.emit(real_index)
 
     def set_header_list(self, header_list):
@@ -88,6 +154,10 @@ class MItemViewSet(QtWidgets.QWidget):
     def get_data(self):
         return self.source_model.get_data_list()
 
+    @property
+    def search_line_edit(self):
+        return self._search_line_edit
+
     def searchable(self):
         """Enable search line edit visible."""
         self._search_line_edit.setVisible(True)
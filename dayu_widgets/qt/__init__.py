@@ -55,7 +55,8 @@ class MCacheDict(object):
         full_path = utils.get_static_file(path)
         if full_path is None:
             return self.cls()
-        key = "{}{}".format(full_path.lower(), color or "")
+        # the items without color use dayu_theme.icon_color, see clear
+        key = (full_path.lower(), color or None)
         pix_map = self._cache_pix_dict.get(key, None)
         if pix_map is None:
             if full_path.endswith("svg"):
@@ -65,6 +66,19 @@ class MCacheDict(object):
             self._cache_pix_dict.update({key: pix_map})
         return pix_map
 
+    def clear(self, default_color_only=False):
+        """
+        Drop the cached items.
+        :param default_color_only: only drop the ones rendered with the theme icon color,
+                                   they are out of date after the theme changed
+        :return: None
+        """
+        if default_color_only:
+            for key in [key for key in self._cache_pix_dict if key[1] is None]:
+                self._cache_pix_dict.pop(key)
+        else:
+            self._cache_pix_dict.clear()
+
 
 def get_scale_factor():
     standard_dpi = 96.0
@@ -12,15 +12,38 @@ from __future__ import print_function
 
 # Import built-in modules
 import string
+import weakref
 
 # Import third-party modules
+from Qt import QtCore
+from Qt import QtWidgets
 from dayu_widgets import DEFAULT_STATIC_FOLDER
 from dayu_widgets import utils
+from dayu_widgets.qt import MIcon
+from dayu_widgets.qt import MPixmap
 from dayu_widgets.qt import get_scale_factor
+import six
+
+
+# (scale factor x, scale factor y) -> size table
+_theme_size_cache = {}
 
 
 def get_theme_size():
-    scale_factor_x, scale_factor_y = get_scale_factor()
+    """
+    Get the size table of the current screen DPI.
+    The table is computed once for each scale factor, treat it as read-only.
+    :return: dict
+    """
+    scale_factor = get_scale_factor()
+    size_dict = _theme_size_cache.get(scale_factor)
+    if size_dict is None:
+        size_dict = _compute_theme_size(*scale_factor)
+        _theme_size_cache[scale_factor] = size_dict
+    return size_dict
+
+
+def _compute_theme_size(scale_factor_x, scale_factor_y):
     return {
         "border_radius_large": int(6 * scale_factor_x),
         "border_radius_base": int(4 * scale_factor_x),
@@ -92,11 +115,203 @@ def get_theme_size():
     }
 
 
+# MTheme preset color -> utils.generate_color(color, 1...10)
+PRESET_PALETTE_DICT = {
+    "#1890ff": (
+        "#e6f8ff",
+        "#bbe8ff",
+        "#92d6ff",
+        "#69c2ff",
+        "#41abff",
+        "#1891ff",
+        "#096fd9",
+        "#0051b3",
+        "#003b8c",
+        "#002766",
+    ),
+    "#722ed1": (
+        "#f9f0ff",
+        "#f0dcff",
+        "#d5adf8",
+        "#b47feb",
+        "#9454de",
+        "#742ed1",
+        "#551dab",
+        "#3a0f85",
+        "#23065e",
+        "#120338",
+    ),
+    "#13c2c2": (
+        "#e6fffb",
+        "#b5f5ed",
+        "#86e9e0",
+        "#5cdcd4",
+        "#35cfcb",
+        "#13c1c2",
+        "#07969c",
+        "#006d75",
+        "#00464f",
+        "#002329",
+    ),
+    "#52c41a": (
+        "#f7ffee",
+        "#d9f7bf",
+        "#b7eb90",
+        "#94de64",
+        "#73d13d",
+        "#52c41a",
+        "#389e0d",
+        "#227703",
+        "#125100",
+        "#082b00",
+    ),
+    "#eb2f96": (
+        "#fff0f6",
+        "#ffd7e7",
+        "#ffaed1",
+        "#ff85be",
+        "#f859a9",
+        "#eb2f94",
+        "#c51d7d",
+        "#9f0f66",
+        "#78064e",
+        "#520338",
+    ),
+    "#ef5b97": (
+        "#fff0f4",
+        "#fff0f4",
+        "#ffdce7",
+        "#ffb3cd",
+        "#fc88b3",
+        "#ef5b96",
+        "#c9427d",
+        "#a32d64",
+        "#7c1c4c",
+        "#561337",
+    ),
+    "#f5222d": (
+        "#fff2f0",
+        "#ffccc7",
+        "#ffa39e",
+        "#ff7775",
+        "#ff4c4f",
+        "#f5222c",
+        "#cf1222",
+        "#a90619",
+        "#820013",
+        "#5c0010",
+    ),
+    "#fa8c16": (
+        "#fff7e6",
+        "#ffe7ba",
+        "#ffd591",
+        "#ffc168",
+        "#ffa93f",
+        "#fa8c16",
+        "#d46b08",
+        "#ae4e00",
+        "#873800",
+        "#612500",
+    ),
+    "#fadb14": (
+        "#ffffe6",
+        "#fffeb8",
+        "#fffa8f",
+        "#fff366",
+        "#ffe93d",
+        "#fad814",
+        "#d4af06",
+        "#ae8800",
+        "#876600",
+        "#614500",
+    ),
+    "#fa541c": (
+        "#fff2e9",
+        "#ffd8c0",
+        "#ffbc97",
+        "#ff9c6e",
+        "#ff7a45",
+        "#fa531c",
+        "#d4380d",
+        "#ae2102",
+        "#871400",
+        "#610b00",
+    ),
+    "#2f54eb": (
+        "#f0f6ff",
+        "#d7e4ff",
+        "#aec5ff",
+        "#85a4ff",
+        "#597df8",
+        "#2f52eb",
+        "#1d37c5",
+        "#0f219f",
+        "#061078",
+        "#030752",
+    ),
+    "#a0d911": (
+        "#fcffe6",
+        "#f4ffb7",
+        "#eaff8e",
+        "#d3f360",
+        "#bae636",
+        "#a0d910",
+        "#7bb305",
+        "#5b8d00",
+        "#3e6600",
+        "#254000",
+    ),
+    "#faad14": (
+        "#fffbe6",
+        "#fff0b8",
+        "#ffe48f",
+        "#ffd466",
+        "#ffc23d",
+        "#faaa14",
+        "#d48506",
+        "#ae6500",
+        "#874a00",
+        "#613200",
+    ),
+    "#4ebbff": (
+        "#f0fcff",
+        "#f0fcff",
+        "#c9efff",
+        "#a0e0ff",
+        "#77ceff",
+        "#4ebaff",
+        "#3794d9",
+        "#2471b3",
+        "#15528c",
+        "#0e3866",
+    ),
+}
+
+
+def get_color_palette(color):
+    """
+    Get the 10 color steps of the base color, from light to dark.
+    The palettes of the MTheme preset colors are precomputed, the others are memoized.
+    :param color: base color. #RRGGBB
+    :return: tuple of 10 #rrggbb strings, the same as generate_color(color, 1...10)
+    """
+    palette = None
+    if isinstance(color, six.string_types):
+        palette = PRESET_PALETTE_DICT.get(color.lower())
+    if palette is None:
+        palette = utils.generate_palette(color)
+    return palette
+
+
 class QssTemplate(string.Template):
     delimiter = "@"
     idpattern = r"[_a-z][_a-z0-9]*"
 
 
+class _MThemeSignals(QtCore.QObject):
+    sig_theme_changed = QtCore.Signal()
+
+
 class MTheme(object):
     blue = "#1890ff"
     purple = "#722ed1"
@@ -116,6 +331,30 @@ class MTheme(object):
 
     def __init__(self, theme="light", primary_color=None):
         super(MTheme, self).__init__()
+        # the palette and the qss template are built on first use, see _init_theme
+        self._init_args = (theme, primary_color)
+        self._initialized = False
+        # the size table the size attributes are set from, see _init_size
+        self._size_dict = None
+        self._screen = None
+        # the substituted default_qss, dropped whenever an attribute changes
+        self._qss = None
+        self._application_mode = False
+        # the targets of apply, the style sheet is applied again when the theme changes
+        self._application = None
+        self._widget_set = weakref.WeakSet()
+        self._signals = _MThemeSignals()
+
+    @property
+    def sig_theme_changed(self):
+        """Emitted after the widgets got the style sheet of the changed theme."""
+        return self._signals.sig_theme_changed
+
+    def _init_theme(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        theme, primary_color = self._init_args
         default_qss_file = utils.get_static_file("main.qss")
         with open(default_qss_file, "r") as f:
             self.default_qss = QssTemplate(f.read())
@@ -134,8 +373,8 @@ class MTheme(object):
         ) = (None,) * 10
         self.hyperlink_style = ""
         self._init_color()
-        self.set_primary_color(primary_color or MTheme.blue)
-        self.set_theme(theme)
+        self._set_primary_color(primary_color or MTheme.blue)
+        self._set_theme(theme)
         self._init_font()
         # self._init_size()
         self.unit = "px"
@@ -146,24 +385,34 @@ class MTheme(object):
         self.text_warning_color = self.warning_7
 
     def set_theme(self, theme):
+        self._set_theme(theme)
+        self.refresh()
+
+    def set_primary_color(self, color):
+        self._set_primary_color(color)
+        self.refresh()
+
+    def _set_theme(self, theme):
         if theme == "light":
             self._light()
         else:
             self._dark()
         self._init_icon(theme)
 
-    def set_primary_color(self, color):
+    def _set_primary_color(self, color):
         self.primary_color = color
-        self.primary_1 = utils.generate_color(color, 1)
-        self.primary_2 = utils.generate_color(color, 2)
-        self.primary_3 = utils.generate_color(color, 3)
-        self.primary_4 = utils.generate_color(color, 4)
-        self.primary_5 = utils.generate_color(color, 5)
-        self.primary_6 = utils.generate_color(color, 6)
-        self.primary_7 = utils.generate_color(color, 7)
-        self.primary_8 = utils.generate_color(color, 8)
-        self.primary_9 = utils.generate_color(color, 9)
-        self.primary_10 = utils.generate_color(color, 10)
+        (
+            self.primary_1,
+            self.primary_2,
+            self.primary_3,
+            self.primary_4,
+            self.primary_5,
+            self.primary_6,
+            self.primary_7,
+            self.primary_8,
+            self.primary_9,
+            self.primary_10,
+        ) = get_color_palette(color)
         # item
         self.item_hover_bg = self.primary_1
         # rich text hyperlink style
@@ -205,49 +454,12 @@ class MTheme(object):
         self.error_color = self.red
         self.warning_color = self.gold
 
-        self.info_1 = utils.fade_color(self.info_color, "15%")
-        self.info_2 = utils.generate_color(self.info_color, 2)
-        self.info_3 = utils.fade_color(self.info_color, "35%")
-        self.info_4 = utils.generate_color(self.info_color, 4)
-        self.info_5 = utils.generate_color(self.info_color, 5)
-        self.info_6 = utils.generate_color(self.info_color, 6)
-        self.info_7 = utils.generate_color(self.info_color, 7)
-        self.info_8 = utils.generate_color(self.info_color, 8)
-        self.info_9 = utils.generate_color(self.info_color, 9)
-        self.info_10 = utils.generate_color(self.info_color, 10)
-
-        self.success_1 = utils.fade_color(self.success_color, "15%")
-        self.success_2 = utils.generate_color(self.success_color, 2)
-        self.success_3 = utils.fade_color(self.success_color, "35%")
-        self.success_4 = utils.generate_color(self.success_color, 4)
-        self.success_5 = utils.generate_color(self.success_color, 5)
-        self.success_6 = utils.generate_color(self.success_color, 6)
-        self.success_7 = utils.generate_color(self.success_color, 7)
-        self.success_8 = utils.generate_color(self.success_color, 8)
-        self.success_9 = utils.generate_color(self.success_color, 9)
-        self.success_10 = utils.generate_color(self.success_color, 10)
-
-        self.warning_1 = utils.fade_color(self.warning_color, "15%")
-        self.warning_2 = utils.generate_color(self.warning_color, 2)
-        self.warning_3 = utils.fade_color(self.warning_color, "35%")
-        self.warning_4 = utils.generate_color(self.warning_color, 4)
-        self.warning_5 = utils.generate_color(self.warning_color, 5)
-        self.warning_6 = utils.generate_color(self.warning_color, 6)
-        self.warning_7 = utils.generate_color(self.warning_color, 7)
-        self.warning_8 = utils.generate_color(self.warning_color, 8)
-        self.warning_9 = utils.generate_color(self.warning_color, 9)
-        self.warning_10 = utils.generate_color(self.warning_color, 10)
-
-        self.error_1 = utils.fade_color(self.error_color, "15%")
-        self.error_2 = utils.generate_color(self.error_color, 2)
-        self.error_3 = utils.fade_color(self.error_color, "35%")
-        self.error_4 = utils.generate_color(self.error_color, 4)
-        self.error_5 = utils.generate_color(self.error_color, 5)
-        self.error_6 = utils.generate_color(self.error_color, 6)
-        self.error_7 = utils.generate_color(self.error_color, 7)
-        self.error_8 = utils.generate_color(self.error_color, 8)
-        self.error_9 = utils.generate_color(self.error_color, 9)
-        self.error_10 = utils.generate_color(self.error_color, 10)
+        for name in ["info", "success", "warning", "error"]:
+            color = getattr(self, "{}_color".format(name))
+            for index, step_color in enumerate(get_color_palette(color), 1):
+                setattr(self, "{}_{}".format(name, index), step_color)
+            setattr(self, "{}_1".format(name), utils.fade_color(color, "15%"))
+            setattr(self, "{}_3".format(name), utils.fade_color(color, "35%"))
 
     def _init_font(self):
         # font
@@ -263,11 +475,58 @@ class MTheme(object):
         self.h3_size = int(self.font_size_base * 1.71)
         self.h4_size = int(self.font_size_base * 1.41)
 
-    def __getattribute__(self, item):
-        try:
-            return object.__getattribute__(self, item)
-        except AttributeError:
-            return get_theme_size().get(item, 0)
+    def _init_size(self):
+        """
+        Set the sizes of the current screen DPI as attributes.
+        The sizes changed by the user are kept when the DPI changes.
+        """
+        old_size_dict = self._size_dict or {}
+        size_dict = get_theme_size()
+        for key, value in size_dict.items():
+            if key not in self.__dict__ or self.__dict__[key] == old_size_dict.get(key):
+                setattr(self, key, value)
+        self._size_dict = size_dict
+        self._connect_screen()
+
+    def _connect_screen(self):
+        app = QtWidgets.QApplication.instance()
+        screen = getattr(app, "primaryScreen", lambda: None)()
+        if screen is None or screen is self._screen:
+            return
+        if self._screen is None:
+            app.primaryScreenChanged.connect(self._slot_screen_changed)
+        else:
+            self._screen.logicalDotsPerInchChanged.disconnect(self._slot_screen_changed)
+        screen.logicalDotsPerInchChanged.connect(self._slot_screen_changed)
+        self._screen = screen
+
+    def _slot_screen_changed(self, *args):
+        if get_theme_size() is not self._size_dict:
+            self._init_size()
+            self.refresh()
+        else:
+            self._connect_screen()
+
+    def __setattr__(self, key, value):
+        if not key.startswith("_") and self.__dict__.get("_initialized") is False:
+            # build the defaults first, so they will not override the value
+            self._init_theme()
+        object.__setattr__(self, key, value)
+        if key != "_qss":
+            object.__setattr__(self, "_qss", None)
+
+    def __getattr__(self, item):
+        # only called for the missing attributes, the palette and the sizes are set
+        # on first use
+        if self.__dict__.get("_initialized") is False:
+            self._init_theme()
+            if item in self.__dict__:
+                return self.__dict__[item]
+        if self.__dict__.get("_size_dict") is None and "_screen" in self.__dict__:
+            self._init_size()
+            if item in self.__dict__:
+                return self.__dict__[item]
+        return 0
 
     def _dark(self):
         self.title_color = "#ffffff"
@@ -303,17 +562,94 @@ class MTheme(object):
         self.mask_color = utils.fade_color(self.background_color, "90%")
         self.toast_color = "#333333"
 
+    def get_qss(self):
+        """
+        Get the style sheet of the current theme.
+        It is substituted once and reused until a color, a size or the DPI changes,
+        so the widgets get the same string.
+        :return: str
+        """
+        if self._size_dict is None:
+            self._init_size()
+        if self._qss is None:
+            size_dict = dict(get_theme_size())
+            size_dict.update(vars(self))
+            self._qss = self.default_qss.substitute(size_dict)
+        return self._qss
+
     def apply(self, widget):
-        size_dict = get_theme_size()
-        size_dict.update(vars(self))
-        widget.setStyleSheet(self.default_qss.substitute(size_dict))
+        if self._application_mode:
+            # the widget gets the style sheet from the application
+            return
+        self._widget_set.add(widget)
+        widget.setStyleSheet(self.get_qss())
+
+    def refresh(self):
+        """
+        Apply the style sheet of the changed theme to the application or the widgets
+        which used apply or deco, then emit sig_theme_changed.
+        When this theme is dayu_theme, the cached MPixmap/MIcon rendered with its
+        icon color are dropped.
+        :return: None
+        """
+        # Import third-party modules
+        from dayu_widgets import dayu_theme
+
+        if self is dayu_theme:
+            MPixmap.clear(default_color_only=True)
+            MIcon.clear(default_color_only=True)
+        if self._application is not None:
+            self._application.setStyleSheet(self.get_qss())
+        widget_list = []
+        for widget in list(self._widget_set):
+            try:
+                window = widget.window()
+            except RuntimeError:  # the C++ object is already deleted
+                self._widget_set.discard(widget)
+                continue
+            widget_list.append((window, widget))
+        if widget_list:
+            self._apply_widgets(widget_list)
+        self.sig_theme_changed.emit()
+
+    def _apply_widgets(self, widget_list):
+        qss = self.get_qss()
+        tracked_set = set(widget for _, widget in widget_list)
+        window_list = list(set(window for window, _ in widget_list))
+        # repaint each window once, after all of its widgets are polished
+        for window in window_list:
+            window.setUpdatesEnabled(False)
+        for _, widget in widget_list:
+            parent = widget.parentWidget()
+            while parent is not None and parent not in tracked_set:
+                parent = parent.parentWidget()
+            if parent is None:
+                widget.setStyleSheet(qss)
+            elif widget.styleSheet():
+                # the style sheet of the tracked ancestor cascades to the widget,
+                # so it is only parsed once for each tracked top widget
+                widget.setStyleSheet("")
+        for window in window_list:
+            window.setUpdatesEnabled(True)
+
+    def apply_application(self, app=None):
+        """
+        Set the style sheet once on the QApplication instead of on each widget,
+        Qt then parses it only once. apply does nothing after it.
+        :param app: QApplication, default is the current one
+        :return: None
+        """
+        app = app or QtWidgets.QApplication.instance()
+        app.setStyleSheet(self.get_qss())
+        self._application = app
+        self._application_mode = True
 
     def deco(self, cls):
         original_init__ = cls.__init__
 
         def my__init__(instance, *args, **kwargs):
             original_init__(instance, *args, **kwargs)
-            instance.setStyleSheet(self.default_qss.substitute(vars(self)))
+            self.apply(instance)
 
         def polish(instance):
             instance.style().polish(instance)
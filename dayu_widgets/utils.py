@@ -18,6 +18,7 @@ import datetime as dt
 import functools
 import math
 import os
+import random
 
 # Import third-party modules
 from Qt import QtCore
@@ -118,6 +119,60 @@ def fade_color(color, alpha):
     )
 
 
+# 这里生成颜色的算法，来自 Ant Design, 只做了语言的转换，和颜色的类型的转换，没对算法做任何修改
+# https://github.com/ant-design/ant-design/blob/master/components/style/color/colorPalette.less
+# https://zhuanlan.zhihu.com/p/32422584
+_HUE_STEP = 2
+_SATURATION_STEP = 16
+_SATURATION_STEP2 = 5
+_BRIGHTNESS_STEP1 = 5
+_BRIGHTNESS_STEP2 = 15
+_LIGHT_COLOR_COUNT = 5
+_DARK_COLOR_COUNT = 4
+
+
+def _get_hue(h_comp, i, is_light):
+    if 60 <= h_comp <= 240:
+        hue = h_comp - _HUE_STEP * i if is_light else h_comp + _HUE_STEP * i
+    else:
+        hue = h_comp + _HUE_STEP * i if is_light else h_comp - _HUE_STEP * i
+    if hue < 0:
+        hue += 359
+    elif hue >= 359:
+        hue -= 359
+    return hue / 359.0
+
+
+def _get_saturation(s_comp, i, is_light):
+    if is_light:
+        saturation = s_comp - _SATURATION_STEP * i
+    elif i == _DARK_COLOR_COUNT:
+        saturation = s_comp + _SATURATION_STEP
+    else:
+        saturation = s_comp + _SATURATION_STEP2 * i
+    saturation = min(100.0, saturation)
+    if is_light and i == _LIGHT_COLOR_COUNT and saturation > 10:
+        saturation = 10
+    saturation = max(6.0, saturation)
+    return round(saturation * 10) / 1000.0
+
+
+def _get_value(v_comp, i, is_light):
+    if is_light:
+        return min((v_comp * 100 + _BRIGHTNESS_STEP1 * i) / 100, 1.0)
+    return max((v_comp * 100 - _BRIGHTNESS_STEP2 * i) / 100, 0.0)
+
+
+def _generate_color_step(h_comp, s_comp, v_comp, index):
+    light = index <= 6
+    i = _LIGHT_COLOR_COUNT + 1 - index if light else index - _LIGHT_COLOR_COUNT - 1
+    return QtGui.QColor.fromHsvF(
+        _get_hue(h_comp, i, light),
+        _get_saturation(s_comp, i, light),
+        _get_value(v_comp, i, light),
+    ).name()
+
+
 def generate_color(primary_color, index):
     """
     Reference to ant-design color system algorithm.
@@ -125,62 +180,14 @@ def generate_color(primary_color, index):
     :param index: color step. 1-10 from light to dark
     :return: result color
     """
-    # 这里生成颜色的算法，来自 Ant Design, 只做了语言的转换，和颜色的类型的转换，没对算法做任何修改
-    # https://github.com/ant-design/ant-design/blob/master/components/style/color/colorPalette.less
-    # https://zhuanlan.zhihu.com/p/32422584
-
-    hue_step = 2
-    saturation_step = 16
-    saturation_step2 = 5
-    brightness_step1 = 5
-    brightness_step2 = 15
-    light_color_count = 5
-    dark_color_count = 4
-
-    def _get_hue(color, i, is_light):
-        h_comp = color.hue()
-        if 60 <= h_comp <= 240:
-            hue = h_comp - hue_step * i if is_light else h_comp + hue_step * i
-        else:
-            hue = h_comp + hue_step * i if is_light else h_comp - hue_step * i
-        if hue < 0:
-            hue += 359
-        elif hue >= 359:
-            hue -= 359
-        return hue / 359.0
-
-    def _get_saturation(color, i, is_light):
-        s_comp = color.saturationF() * 100
-        if is_light:
-            saturation = s_comp - saturation_step * i
-        elif i == dark_color_count:
-            saturation = s_comp + saturation_step
-        else:
-            saturation = s_comp + saturation_step2 * i
-        saturation = min(100.0, saturation)
-        if is_light and i == light_color_count and saturation > 10:
-            saturation = 10
-        saturation = max(6.0, saturation)
-        return round(saturation * 10) / 1000.0
-
-    def _get_value(color, i, is_light):
-        v_comp = color.valueF()
-        if is_light:
-            return min((v_comp * 100 + brightness_step1 * i) / 100, 1.0)
-        return max((v_comp * 100 - brightness_step2 * i) / 100, 0.0)
-
-    light = index <= 6
     hsv_color = (
         QtGui.QColor(primary_color)
         if isinstance(primary_color, six.string_types)
         else primary_color
     )
-    index = light_color_count + 1 - index if light else index - light_color_count - 1
-    return QtGui.QColor.fromHsvF(
-        _get_hue(hsv_color, index, light),
-        _get_saturation(hsv_color, index, light),
-        _get_value(hsv_color, index, light),
-    ).name()
+    return _generate_color_step(
+        hsv_color.hue(), hsv_color.saturationF() * 100, hsv_color.valueF(), index
+    )
 
 
 @singledispatch
@@ -206,8 +213,10 @@ def real_index(index):
     Get the source index whenever user give a source index or proxy index.
     """
     model = index.model()
-    if isinstance(model, QtCore.QSortFilterProxyModel):
-        return model.mapToSource(index)
+    # MSortFilterModel maps through a row order model when it sorts by typed keys
+    while isinstance(model, QtCore.QAbstractProxyModel):
+        index = model.mapToSource(index)
+        model = index.model()
     return index
 
 
@@ -335,6 +344,116 @@ def font_formatter(setting_dict):
     return _font
 
 
+class MValuePool(object):
+    """
+    Intern Qt value objects (QColor, QFont, QSize...) by their normalized config value.
+    The same config value always gets the same object, so painting a large table
+    only creates as many objects as the distinct config values.
+    The returned objects are shared, treat them as read-only.
+    """
+
+    def __init__(self, factory, key_func=None, max_size=1024):
+        super(MValuePool, self).__init__()
+        self.factory = factory
+        self.key_func = key_func
+        self.max_size = max_size
+        self._pool = {}
+
+    def __call__(self, value):
+        key = self.key_func(value) if self.key_func else value
+        try:
+            result = self._pool.get(key)
+        except TypeError:  # unhashable config value, can not be interned
+            return self.factory(value)
+        if result is None:
+            if len(self._pool) >= self.max_size:
+                self._pool.clear()
+            result = self.factory(value)
+            self._pool[key] = result
+        return result
+
+    def __len__(self):
+        return len(self._pool)
+
+    def clear(self):
+        self._pool.clear()
+
+
+def _color_key(value):
+    if isinstance(value, six.string_types):
+        return value.strip().lower()
+    if isinstance(value, QtGui.QColor):
+        return value.rgba()
+    return value
+
+
+def _font_key(setting_dict):
+    return (
+        bool(setting_dict.get("underline") or False),
+        bool(setting_dict.get("bold") or False),
+    )
+
+
+def _size_factory(args):
+    return QtCore.QSize(*args)
+
+
+# Used for QAbstractItemModel data method for Qt.BackgroundRole/ForegroundRole
+interned_color = MValuePool(QtGui.QColor, _color_key)
+# Used for QAbstractItemModel data method for Qt.FontRole
+interned_font = MValuePool(font_formatter, _font_key)
+# Used for QAbstractItemModel data method for Qt.SizeHintRole
+interned_size = MValuePool(_size_factory, tuple)
+
+
+def _palette_factory(primary_color):
+    hsv_color = (
+        QtGui.QColor(primary_color)
+        if isinstance(primary_color, six.string_types)
+        else primary_color
+    )
+    # the color is parsed and converted to HSV only once for all the steps
+    h_comp, s_comp, v_comp = (
+        hsv_color.hue(),
+        hsv_color.saturationF() * 100,
+        hsv_color.valueF(),
+    )
+    return tuple(
+        _generate_color_step(h_comp, s_comp, v_comp, index) for index in range(1, 11)
+    )
+
+
+def _palette_key(value):
+    # the steps are computed from the HSV components, a QColor made from HSV
+    # keeps its hue even when it is gray, so its RGB value is not enough
+    if isinstance(value, QtGui.QColor):
+        return value.hue(), value.saturationF(), value.valueF()
+    return _color_key(value)
+
+
+_palette_pool = MValuePool(_palette_factory, _palette_key)
+
+
+def generate_palette(primary_color):
+    """
+    Get all the 10 color steps of the base color, from light to dark.
+    The result is the same as generate_color(primary_color, 1...10),
+    and it is memoized by the base color.
+    :param primary_color: base color. #RRGGBB or QColor
+    :return: tuple of 10 #rrggbb strings
+    """
+    return _palette_pool(primary_color)
+
+
+def generate_palettes(color_list):
+    """
+    Get the palettes of many base colors in one call, e.g. to preview candidates.
+    :param color_list: list of base colors
+    :return: list of palette tuples, in the same order
+    """
+    return [_palette_pool(color) for color in color_list]
+
+
 @singledispatch
 def icon_formatter(input_other_type):
     """
@@ -440,6 +559,27 @@ def get_page_display_string(current, per, total):
     )
 
 
+def get_sample_rows(row_count, first, last, sample_size=100, seed=None):
+    """
+    Get the rows to measure when fitting the column width of a large view:
+    all the visible rows plus a random sample of the others.
+    :param row_count: total row count
+    :param first: first visible row
+    :param last: last visible row
+    :param sample_size: how many other rows are sampled
+    :param seed: random seed, to get the same sample every time
+    :return: sorted row list
+    """
+    if row_count <= 0:
+        return []
+    first = max(0, first)
+    last = min(row_count - 1, max(first, last))
+    row_set = set(six.moves.range(first, last + 1))
+    sample_size = min(sample_size, row_count)
+    row_set.update(random.Random(seed).sample(six.moves.range(row_count), sample_size))
+    return sorted(row_set)
+
+
 def add_settings(organization, app_name, event_name="closeEvent"):
     def _read_settings():
         settings = QtCore.QSettings(
@@ -0,0 +1,42 @@
+"""
+Test the row sampling of MHeaderView.fit_section_sizes.
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import third-party modules
+from Qt import QtCore
+from Qt import QtGui
+from Qt import QtWidgets
+from dayu_widgets.header_view import _get_visible_child_rows
+
+
+def test_visible_child_rows(qtbot):
+    """The expanded child rows shown in the viewport are measured too."""
+    model = QtGui.QStandardItemModel()
+    for i in range(3):
+        item = QtGui.QStandardItem("item_{}".format(i))
+        child_item = QtGui.QStandardItem("child_{}".format(i))
+        child_item.appendRow(QtGui.QStandardItem("grandchild_{}".format(i)))
+        item.appendRow(child_item)
+        model.appendRow(item)
+    view = QtWidgets.QTreeView()
+    qtbot.addWidget(view)
+    view.setModel(model)
+    view.resize(300, 400)
+    view.expand(model.index(0, 0))
+    view.expand(model.index(0, 0, model.index(0, 0)))
+    view.show()
+
+    first_index = view.indexAt(QtCore.QPoint(0, 0))
+    last_index = view.indexAt(QtCore.QPoint(0, view.viewport().height() - 1))
+    row_info_list = _get_visible_child_rows(view, first_index, last_index)
+    assert [
+        (model.index(row, 0, parent_index).data(), indentation)
+        for row, parent_index, indentation in row_info_list
+    ] == [
+        ("child_0", view.indentation() * 2),
+        ("grandchild_0", view.indentation() * 3),
+    ]
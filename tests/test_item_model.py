@@ -0,0 +1,1164 @@
+"""
+Test MTableModel and MSortFilterModel.
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import third-party modules
+from Qt import QtCore
+from dayu_widgets.item_model import MDataSource
+from dayu_widgets.item_model import MPageLoader
+from dayu_widgets.item_model import MSortFilterModel
+from dayu_widgets.item_model import MTableModel
+from dayu_widgets.item_model import SETTING_MAP
+from dayu_widgets.item_model import THUMBNAIL_ROLE
+from dayu_widgets.item_model import compile_text_matcher
+from dayu_widgets.item_model import get_shared_model
+from dayu_widgets.item_model import group_row_ranges
+from dayu_widgets.item_model import release_shared_model
+from dayu_widgets.utils import apply_formatter
+from dayu_widgets.utils import get_obj_value
+from dayu_widgets.utils import real_index
+import pytest
+
+
+HEADER_LIST = [
+    {"label": "Name", "key": "name", "searchable": True},
+    {"label": "Age", "key": "age"},
+]
+
+
+def _make_model(data_list=None):
+    model = MTableModel()
+    model.set_header_list(HEADER_LIST)
+    if data_list is not None:
+        model.set_data_list(data_list)
+    return model
+
+
+def _record_signals(model):
+    record = []
+    model.modelReset.connect(lambda: record.append("reset"))
+    model.rowsInserted.connect(
+        lambda parent, start, end: record.append(("insert", start, end))
+    )
+    model.rowsRemoved.connect(
+        lambda parent, start, end: record.append(("remove", start, end))
+    )
+    return record
+
+
+def test_append_inserts_rows_without_reset(qtbot):
+    """append/append_many only emit row insert notifications."""
+    model = _make_model([{"name": "a", "age": 1}])
+    record = _record_signals(model)
+    model.append({"name": "b", "age": 2})
+    model.append_many({"name": str(i), "age": i} for i in range(3))
+    model.extend([])
+    assert record == [("insert", 1, 1), ("insert", 2, 4)]
+    assert model.rowCount() == 5
+    assert model.data(model.index(4, 0)) == "2"
+
+
+def test_append_many_under_parent(qtbot):
+    """append_many with a parent index inserts into the children list."""
+    model = _make_model([{"name": "root"}])
+    record = _record_signals(model)
+    parent_index = model.index(0, 0)
+    model.append_many([{"name": "child_1"}, {"name": "child_2"}], parent_index)
+    assert record == [("insert", 0, 1)]
+    assert model.rowCount(parent_index) == 2
+    child_index = model.index(1, 0, parent_index)
+    assert model.data(child_index) == "child_2"
+    assert child_index.parent() == parent_index
+
+
+def test_generator_ingestion_in_chunks(qtbot):
+    """A python3 generator is drained in chunks, one insert per chunk."""
+    model = _make_model()
+    record = _record_signals(model)
+    progress = []
+    model.sig_fetch_progress.connect(progress.append)
+    model.set_data_list({"name": str(i), "age": i} for i in range(1000))
+    assert model.is_fetching()
+    with qtbot.waitSignal(model.sig_fetch_finished, timeout=5000) as blocker:
+        pass
+    assert blocker.args == [1000]
+    assert not model.is_fetching()
+    assert model.rowCount() == 1000
+    inserts = [i for i in record if i != "reset"]
+    assert len(inserts) == len(progress)
+    assert progress[-1] == 1000
+
+
+def test_generator_ingestion_time_budget(qtbot):
+    """With zero time budget, every fetchMore only pulls one record."""
+    model = _make_model()
+    model.set_fetch_time_budget(0)
+    model.set_data_list(iter([{"name": "a"}, {"name": "b"}]))
+    model.timer.stop()
+    model.fetchMore()
+    assert model.rowCount() == 1
+    model.fetchMore()
+    model.fetchMore()
+    assert model.rowCount() == 2
+    assert not model.is_fetching()
+
+
+def test_generator_ingestion_cancel(qtbot):
+    """cancel_fetch keeps the inserted records and drops the generator."""
+    model = _make_model()
+    model.set_fetch_time_budget(0)
+    model.set_data_list({"name": str(i)} for i in range(10))
+    model.fetchMore()
+    with qtbot.waitSignal(model.sig_fetch_canceled) as blocker:
+        model.cancel_fetch()
+    assert blocker.args == [1]
+    assert not model.is_fetching()
+    assert not model.canFetchMore(QtCore.QModelIndex())
+    assert model.rowCount() == 1
+
+
+def test_parent_index_without_touching_data(qtbot):
+    """parent() resolves through the model side index, data is left untouched."""
+    grand_child = {"name": "grand_child"}
+    child_list = [{"name": str(i)} for i in range(100)]
+    child_list[50]["children"] = [grand_child]
+    data_list = [{"name": "root", "children": child_list}]
+    model = _make_model(data_list)
+
+    root_index = model.index(0, 0)
+    child_index = model.index(50, 1, root_index)
+    grand_child_index = model.index(0, 0, child_index)
+    parent_index = grand_child_index.parent()
+    assert parent_index.row() == 50
+    assert parent_index.column() == 0
+    assert parent_index.internalPointer() is child_list[50]
+    assert parent_index.parent() == root_index
+    assert not root_index.parent().isValid()
+    assert model.get_parent_item(grand_child) is child_list[50]
+    assert model.get_parent_item(data_list[0]) is model.root_item
+    for data_obj in [data_list[0], grand_child] + child_list:
+        assert "_parent" not in data_obj
+
+
+def test_parent_index_after_remove(qtbot):
+    """The row index is refreshed when rows are removed."""
+    data_list = [{"name": str(i), "children": [{"name": "c"}]} for i in range(3)]
+    model = _make_model(data_list)
+    child_index = model.index(0, 0, model.index(2, 0))
+    assert child_index.parent().row() == 2
+    model.remove(data_list[0])
+    child_index = model.index(0, 0, model.index(1, 0))
+    assert child_index.parent().row() == 1
+    assert child_index.parent().internalPointer()["name"] == "2"
+
+
+def _reference_data(attr_dict, data_obj, role):
+    """The role data computed the way MTableModel.data used to do."""
+    attr = attr_dict.get("key")
+    if role in SETTING_MAP.keys():
+        formatter_from_config = attr_dict.get(SETTING_MAP[role].get("config"))
+        if not formatter_from_config and role not in [
+            QtCore.Qt.DisplayRole,
+            QtCore.Qt.EditRole,
+            QtCore.Qt.ToolTipRole,
+        ]:
+            return None
+        value = apply_formatter(
+            formatter_from_config, get_obj_value(data_obj, attr), data_obj
+        )
+        return apply_formatter(SETTING_MAP[role].get("formatter", None), value)
+    if role == QtCore.Qt.CheckStateRole and attr_dict.get("checkable", False):
+        state = get_obj_value(data_obj, attr + "_checked")
+        return QtCore.Qt.Unchecked if state is None else state
+    return None
+
+
+def test_compiled_resolvers_match_formatters(qtbot):
+    """The compiled role resolvers give the same result as the formatters."""
+    header_list = [
+        {
+            "label": "Name",
+            "key": "name",
+            "checkable": True,
+            "font": lambda x, y: {"underline": True},
+            "tooltip": lambda x, y: "{} tip".format(x),
+            "alignment": "right",
+        },
+        {
+            "label": "Score",
+            "key": "score",
+            "display": lambda x, y: "{} points".format(x),
+            "color": lambda x, y: "#ff0000" if x < 60 else "#00ff00",
+            "bg_color": "#222222",
+            "size": (100, 20),
+            "order": "des",
+        },
+        {"label": "Grade", "key": "grade", "display": {1: "A", 2: "B"}},
+        {"label": "Ratio", "key": "ratio", "edit": lambda x, y: x * 100},
+        {"label": "Data", "key": "data", "data": lambda x, y: y},
+    ]
+    data_list = [
+        {"name": "a", "score": 59, "grade": 1, "ratio": 0.5, "name_checked": 2},
+        {"name": "b", "score": 88, "grade": 3, "ratio": 0.123},
+        {"name": None, "score": 60, "grade": 2, "ratio": 1.0},
+    ]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(data_list)
+    role_list = list(SETTING_MAP.keys()) + [
+        QtCore.Qt.CheckStateRole,
+        QtCore.Qt.StatusTipRole,
+    ]
+    for row, data_obj in enumerate(data_list):
+        for column, attr_dict in enumerate(header_list):
+            index = model.index(row, column)
+            for role in role_list:
+                expected = _reference_data(attr_dict, data_obj, role)
+                assert model.data(index, role) == expected, (row, column, role)
+
+
+def test_cell_cache_hit_and_miss(qtbot):
+    """The formatter only runs once per cell while the cache is enabled."""
+    call_list = []
+
+    def _display(value, data_obj):
+        call_list.append(value)
+        return "{} years".format(value)
+
+    header_list = [{"label": "Age", "key": "age", "display": _display}]
+    data_list = [{"age": i} for i in range(5)]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(data_list)
+    model.set_cache_size(3)
+    for _ in range(3):
+        assert model.data(model.index(0, 0)) == "0 years"
+    assert model.data(model.index(0, 0), QtCore.Qt.FontRole) is None
+    assert call_list == [0]
+    assert model.cache_info() == {"hits": 2, "misses": 1, "size": 1, "max_size": 3}
+
+    for row in range(5):
+        model.data(model.index(row, 0))
+    assert model.cache_info()["size"] == 3
+    model.data(model.index(0, 0))  # evicted by the least recently used rule
+    assert call_list == [0, 1, 2, 3, 4, 0]
+
+
+def test_cell_cache_invalidation(qtbot):
+    """setData, invalidate_rows and reset drop the cached role data."""
+    header_list = [{"label": "Name", "key": "name", "editable": True}]
+    data_list = [{"name": "a"}, {"name": "b"}]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(data_list)
+    model.set_cache_size(100)
+    index = model.index(0, 0)
+    assert model.data(index) == "a"
+    assert model.setData(index, "c")
+    assert model.data(index) == "c"
+
+    assert model.data(model.index(1, 0)) == "b"
+    data_list[1]["name"] = "d"
+    assert model.data(model.index(1, 0)) == "b"
+    with qtbot.waitSignal(model.dataChanged):
+        model.invalidate_rows([data_list[1]])
+    assert model.data(model.index(1, 0)) == "d"
+
+    model.set_data_list([{"name": "e"}])
+    assert model.data(model.index(0, 0)) == "e"
+    assert model.cache_info()["size"] == 1
+
+
+def test_size_hint_disabled(qtbot):
+    """With fixed row height, the "size" config is not resolved for any cell."""
+    header_list = [{"label": "Name", "key": "name", "size": lambda x, y: (100, 40)}]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list([{"name": "a"}])
+    index = model.index(0, 0)
+    assert model.data(index, QtCore.Qt.SizeHintRole) == QtCore.QSize(100, 40)
+
+    model.set_size_hint_enabled(False)
+    assert model.data(index, QtCore.Qt.SizeHintRole) is None
+    assert model.data(index) == "a"
+    model.set_header_list(header_list)
+    assert model.data(index, QtCore.Qt.SizeHintRole) is None
+
+    model.set_size_hint_enabled(True)
+    assert model.data(index, QtCore.Qt.SizeHintRole) == QtCore.QSize(100, 40)
+
+
+def test_thumbnail_role(qtbot):
+    """The "thumbnail" config gives the image path, it is not loaded by the model."""
+    model = MTableModel()
+    model.set_header_list(
+        [
+            {"label": "Name", "key": "name", "thumbnail": lambda x, y: y["path"]},
+            {"label": "Age", "key": "age"},
+        ]
+    )
+    model.set_data_list([{"name": "a", "age": 1, "path": "/a.png"}])
+    assert model.data(model.index(0, 0), THUMBNAIL_ROLE) == "/a.png"
+    assert model.data(model.index(0, 1), THUMBNAIL_ROLE) is None
+
+
+def test_sort_filter_model_search_and_filter(qtbot):
+    """MSortFilterModel filters the rows with search pattern and column filters."""
+    header_list = [
+        {"label": "Name", "key": "name", "searchable": True},
+        {"label": "City", "key": "city"},
+    ]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(
+        [
+            {"name": "Jack", "city": "Beijing"},
+            {"name": "Jim", "city": "Shanghai"},
+            {"name": "Lucy", "city": "Beijing"},
+        ]
+    )
+    proxy_model = MSortFilterModel()
+    proxy_model.setSourceModel(model)
+    proxy_model.set_header_list(header_list)
+    assert proxy_model.rowCount() == 3
+    proxy_model.set_search_pattern("J")
+    assert proxy_model.rowCount() == 2
+    proxy_model.set_filter_attr_pattern("city", "beijing")
+    assert proxy_model.rowCount() == 1
+    proxy_model.set_search_pattern("")
+    assert proxy_model.rowCount() == 2
+
+
+@pytest.mark.parametrize(
+    "pattern, syntax, text, result",
+    (
+        ("ji", QtCore.QRegExp.Wildcard, "jim", True),
+        ("*IM*", QtCore.QRegExp.Wildcard, "jim", True),
+        ("im", QtCore.QRegExp.Wildcard, "jack", False),
+        ("bei", QtCore.QRegExp.RegExp, "beijing", False),
+        ("Beijing", QtCore.QRegExp.RegExp, "beijing", True),
+        ("bei.*", QtCore.QRegExp.RegExp, "beijing", True),
+        (".*jing", QtCore.QRegExp.RegExp, "beijing", True),
+        (".*iji.*", QtCore.QRegExp.RegExp, "beijing", True),
+        (".*iji", QtCore.QRegExp.RegExp, "beijing", False),
+    ),
+)
+def test_compile_text_matcher(pattern, syntax, text, result):
+    """Plain patterns are compiled to string matchers like QRegExp does."""
+    matcher = compile_text_matcher(pattern, syntax)
+    assert matcher is not None
+    assert matcher(text) is result
+
+
+@pytest.mark.parametrize(
+    "pattern, syntax",
+    (
+        ("j?m", QtCore.QRegExp.Wildcard),
+        ("j*m", QtCore.QRegExp.Wildcard),
+        ("*", QtCore.QRegExp.Wildcard),
+        ("bei|shang", QtCore.QRegExp.RegExp),
+        ("^bei", QtCore.QRegExp.RegExp),
+        (".*", QtCore.QRegExp.RegExp),
+    ),
+)
+def test_compile_text_matcher_need_regexp(pattern, syntax):
+    """Patterns using the regular expression syntax are left to QRegExp."""
+    assert compile_text_matcher(pattern, syntax) is None
+
+
+@pytest.mark.parametrize("search", ("", "j", "J*", "*c?", "xx"))
+@pytest.mark.parametrize("city", ("", "beijing", "shang.*", "BEI.*|.*hai"))
+def test_sort_filter_model_text_index(qtbot, search, city):
+    """Filtering with the text index gives the same result as without it."""
+    header_list = [
+        {"label": "Name", "key": "name", "searchable": True},
+        {"label": "City", "key": "city", "searchable": True},
+    ]
+    data_list = [
+        {"name": name, "city": city}
+        for name in ("Jack", "Jim", "Lucy", "Lily")
+        for city in ("Beijing", "Shanghai", "Jinan")
+    ]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(data_list)
+    result_list = []
+    for flag in (False, True):
+        proxy_model = MSortFilterModel()
+        proxy_model.setSourceModel(model)
+        proxy_model.set_header_list(header_list)
+        proxy_model.set_text_index_enabled(flag)
+        proxy_model.set_search_pattern(search)
+        proxy_model.set_filter_attr_pattern("city", city)
+        result_list.append(
+            [
+                proxy_model.mapToSource(proxy_model.index(row, 0)).row()
+                for row in range(proxy_model.rowCount())
+            ]
+        )
+    assert result_list[0] == result_list[1]
+
+
+def test_sort_filter_model_text_index_update(qtbot):
+    """The text index follows setData, insert and remove of the source model."""
+    header_list = [{"label": "Name", "key": "name", "searchable": True}]
+    data_list = [{"name": "Jack"}, {"name": "Lucy"}]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(data_list)
+    proxy_model = MSortFilterModel()
+    proxy_model.setSourceModel(model)
+    proxy_model.set_header_list(header_list)
+    proxy_model.set_text_index_enabled(True)
+    proxy_model.set_search_pattern("j")
+    assert proxy_model.rowCount() == 1
+
+    model.setData(model.index(1, 0), "Jenny")
+    assert proxy_model.rowCount() == 2
+    model.append({"name": "John"})
+    assert proxy_model.rowCount() == 3
+    model.remove(data_list[0])
+    assert proxy_model.rowCount() == 2
+    model.set_data_list([{"name": "Lily"}])
+    assert proxy_model.rowCount() == 0
+
+
+def _make_search_proxy_model(row_count):
+    header_list = [{"label": "Name", "key": "name", "searchable": True}]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list([{"name": "item_{}".format(i)} for i in range(row_count)])
+    proxy_model = MSortFilterModel()
+    proxy_model.setSourceModel(model)
+    proxy_model.set_header_list(header_list)
+    return model, proxy_model
+
+
+def test_sort_filter_model_chunked_filter(qtbot):
+    """The chunked filter gives the same result once the pass is finished."""
+    model, proxy_model = _make_search_proxy_model(500)
+    proxy_model.set_chunked_filter_enabled(True)
+    proxy_model.set_filter_time_budget(0)
+    progress_list = []
+    proxy_model.sig_filter_progress.connect(progress_list.append)
+    with qtbot.waitSignal(proxy_model.sig_filter_finished):
+        proxy_model.set_search_pattern("_1*")
+        # the view keeps the previous result until the pass is finished
+        assert proxy_model.rowCount() == 500
+        assert proxy_model.is_filtering()
+    assert not proxy_model.is_filtering()
+    assert len(progress_list) > 1
+    assert progress_list[-1] == 500
+    assert proxy_model.rowCount() == 111
+
+    model.append({"name": "item_1000"})
+    assert proxy_model.rowCount() == 112
+
+
+def test_sort_filter_model_chunked_filter_drop_stale_pass(qtbot):
+    """A new pattern drops the running pass."""
+    model, proxy_model = _make_search_proxy_model(500)
+    proxy_model.set_chunked_filter_enabled(True)
+    proxy_model.set_filter_time_budget(0)
+    finished_list = []
+    proxy_model.sig_filter_finished.connect(lambda: finished_list.append(True))
+    proxy_model.set_search_pattern("_1")
+    with qtbot.waitSignal(proxy_model.sig_filter_finished):
+        proxy_model.set_search_pattern("_49")
+    assert finished_list == [True]
+    assert proxy_model.rowCount() == 11
+
+
+def test_sort_filter_model_chunked_filter_clear(qtbot):
+    """Clearing the pattern shows all the rows at once, without a chunked pass."""
+    model, proxy_model = _make_search_proxy_model(500)
+    proxy_model.set_chunked_filter_enabled(True)
+    proxy_model.set_filter_time_budget(0)
+    with qtbot.waitSignal(proxy_model.sig_filter_finished):
+        proxy_model.set_search_pattern("_1*")
+    proxy_model.set_search_pattern("_49")
+    assert proxy_model.is_filtering()
+    proxy_model.set_search_pattern("")
+    assert not proxy_model.is_filtering()
+    assert proxy_model.rowCount() == 500
+
+    # the column filter is kept
+    proxy_model.set_filter_attr_pattern("name", "item_1.*")
+    qtbot.waitUntil(lambda: not proxy_model.is_filtering())
+    proxy_model.set_search_pattern("_2")
+    proxy_model.set_search_pattern("")
+    assert not proxy_model.is_filtering()
+    assert proxy_model.rowCount() == 111
+
+
+def test_page_loader(qtbot):
+    """MPageLoader keeps only the current page in the model, and prefetches."""
+    record_list = [{"name": "item_{}".format(i)} for i in range(95)]
+    fetch_list = []
+
+    def fetch_page(offset, limit):
+        fetch_list.append((offset, limit))
+        return record_list[offset : offset + limit]
+
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name"}])
+    loader = MPageLoader(model, fetch_page, cache_size=3, prefetch=1)
+    loader.set_total(len(record_list))
+    with qtbot.waitSignal(loader.sig_page_loaded) as blocker:
+        loader.load_page(25, 1)
+    assert blocker.args == [0, 25]
+    assert model.rowCount() == 25
+    assert model.data(model.index(0, 0)) == "item_0"
+    qtbot.waitUntil(lambda: len(fetch_list) == 2)
+    assert fetch_list == [(0, 25), (25, 25)]
+
+    loader.load_page(25, 2)
+    assert model.data(model.index(0, 0)) == "item_25"
+    assert len(fetch_list) == 2
+    qtbot.waitUntil(lambda: len(fetch_list) == 3)
+    assert fetch_list[-1] == (50, 25)
+
+    loader.load_page(25, 1)
+    assert len(fetch_list) == 3
+    assert len(loader.cached_pages()) == 3
+
+    loader.load_page(25, 4)
+    assert model.rowCount() == 20
+    qtbot.wait(10)
+    # there is no page after the last one
+    assert (100, 25) not in fetch_list
+    assert loader.cached_pages()[-1] == (75, 25)
+
+
+class _RangeDataSource(MDataSource):
+    def __init__(self, count, depth=1):
+        self.count = count
+        self.depth = depth
+        self.fetch_list = []
+
+    def row_count(self):
+        return self.count
+
+    def fetch_rows(self, start, count):
+        self.fetch_list.append((start, count))
+        return [
+            {"name": "{}_{}".format(self.depth, row)}
+            for row in range(start, start + count)
+        ]
+
+    def fetch_children(self, data_obj):
+        if self.depth == 1:
+            return _RangeDataSource(3, depth=2)
+        return None
+
+
+def test_data_source_lazy_rows(qtbot):
+    """MTableModel only fetches the blocks of the rows asked by the views."""
+    data_source = _RangeDataSource(1000000)
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name"}])
+    model.set_data_source(data_source, block_size=100, cache_blocks=2)
+    assert model.rowCount() == 1000000
+    assert data_source.fetch_list == []
+
+    assert model.data(model.index(500050, 0)) == "1_500050"
+    assert data_source.fetch_list == [(500000, 100)]
+    assert model.data(model.index(500099, 0)) == "1_500099"
+    assert model.data(model.index(999999, 0)) == "1_999999"
+    assert data_source.fetch_list == [(500000, 100), (999900, 100)]
+
+    # the least recently used block is dropped
+    model.index(0, 0)
+    assert model.get_data_list().cached_rows() == 200
+    model.index(500000, 0)
+    assert data_source.fetch_list[-1] == (500000, 100)
+
+
+def test_data_source_keep_rows_in_use(qtbot):
+    """The blocks referred by persistent indexes are not dropped."""
+    data_source = _RangeDataSource(1000)
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name"}])
+    model.set_data_source(data_source, block_size=10, cache_blocks=1)
+    persistent_index = QtCore.QPersistentModelIndex(model.index(5, 0))
+    model.index(500, 0)
+    model.index(900, 0)
+    assert persistent_index.isValid()
+    assert model.data(QtCore.QModelIndex(persistent_index)) == "1_5"
+    assert data_source.fetch_list.count((0, 10)) == 1
+
+
+def test_data_source_children(qtbot):
+    """The children of a record are fetched from the data source on demand."""
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name"}])
+    model.set_data_source(_RangeDataSource(50), block_size=10)
+    parent_index = model.index(42, 0)
+    assert model.hasChildren(parent_index)
+    assert model.rowCount(parent_index) == 3
+    child_index = model.index(2, 0, parent_index)
+    assert model.data(child_index) == "2_2"
+    assert not model.hasChildren(child_index)
+    assert model.parent(child_index) == parent_index
+
+
+def test_data_source_behind_proxy(qtbot):
+    """A proxy model without pattern does not fetch all the rows."""
+    data_source = _RangeDataSource(10000)
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name", "searchable": True}])
+    model.set_data_source(data_source, block_size=100)
+    proxy_model = MSortFilterModel()
+    proxy_model.setSourceModel(model)
+    proxy_model.set_header_list(model.header_list)
+    assert proxy_model.rowCount() == 10000
+    assert proxy_model.data(proxy_model.index(20, 0)) == "1_20"
+    assert data_source.fetch_list == [(0, 100)]
+
+
+class _RowDataSource(_RangeDataSource):
+    def fetch_rows(self, start, count):
+        return [{"name": "row_{}".format(row)} for row in range(start, start + count)]
+
+
+def test_data_source_filter_after_evict(qtbot):
+    """The text index and the filter results of the evicted rows are dropped."""
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name", "searchable": True}])
+    model.set_data_source(_RowDataSource(4000), cache_blocks=2)
+    proxy_model = MSortFilterModel()
+    proxy_model.set_text_index_enabled(True)
+    proxy_model.setSourceModel(model)
+    proxy_model.set_header_list(model.header_list)
+    proxy_model.set_search_pattern("row_1")
+    # row_1, row_10 - row_19, row_100 - row_199, row_1000 - row_1999
+    assert proxy_model.rowCount() == 1111
+    proxy_model.set_search_pattern("row_2")
+    assert proxy_model.rowCount() == 1111
+    proxy_model.set_search_pattern("row_1")
+    assert proxy_model.rowCount() == 1111
+
+
+@pytest.mark.parametrize("lazy_type", ("generator", "callable"))
+def test_lazy_children(qtbot, lazy_type):
+    """The lazy children of a node are fetched in batches behind a placeholder."""
+    child_list = [{"name": "child_{}".format(i)} for i in range(50)]
+    if lazy_type == "generator":
+        children = (child for child in child_list)
+    else:
+        children = lambda: child_list[:]
+    data_list = [{"name": "root", "children": children}, {"name": "other"}]
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name"}])
+    model.set_fetch_time_budget(0)
+    model.set_data_list(data_list)
+    parent_index = model.index(0, 0)
+    assert model.hasChildren(parent_index)
+    assert model.rowCount(parent_index) == 0
+    assert model.canFetchMore(parent_index)
+    assert not model.canFetchMore(model.index(1, 0))
+
+    insert_list = []
+    model.rowsInserted.connect(lambda *args: insert_list.append(args[1:]))
+    with qtbot.waitSignal(model.rowsRemoved):
+        model.fetchMore(parent_index)
+        assert model.is_loading(parent_index)
+        assert not model.canFetchMore(parent_index)
+        assert model.rowCount(parent_index) == 1
+        assert model.data(model.index(0, 0, parent_index)) == model.loading_text
+    assert not model.is_loading(parent_index)
+    assert model.rowCount(parent_index) == 50
+    assert len(insert_list) > 2
+    assert [model.data(model.index(row, 0, parent_index)) for row in range(50)] == [
+        child["name"] for child in child_list
+    ]
+    child_index = model.index(49, 0, parent_index)
+    assert model.parent(child_index) == parent_index
+
+
+def _make_check_model():
+    data_list = [
+        {
+            "name": "group_{}".format(group),
+            "children": [
+                {
+                    "name": "sub_{}_{}".format(group, sub),
+                    "children": [
+                        {"name": "leaf_{}_{}_{}".format(group, sub, leaf)}
+                        for leaf in range(3)
+                    ],
+                }
+                for sub in range(2)
+            ],
+        }
+        for group in range(2)
+    ]
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name", "checkable": True}])
+    model.set_data_list(data_list)
+    return model
+
+
+def _check_state(model, *row_list):
+    index = QtCore.QModelIndex()
+    for row in row_list:
+        index = model.index(row, 0, index)
+    return model.data(index, QtCore.Qt.CheckStateRole)
+
+
+def test_check_state_propagation(qtbot):
+    """The check state goes down to all descendants and up to all ancestors."""
+    model = _make_check_model()
+    leaf_index = model.index(1, 0, model.index(0, 0, model.index(0, 0)))
+    changed_list = []
+    model.dataChanged.connect(
+        lambda top_left, bottom_right, *args: changed_list.append(
+            (top_left.internalPointer()["name"], top_left.row(), bottom_right.row())
+        )
+    )
+    model.setData(leaf_index, QtCore.Qt.Checked, QtCore.Qt.CheckStateRole)
+    assert _check_state(model, 0, 0, 1) == QtCore.Qt.Checked
+    assert _check_state(model, 0, 0) == QtCore.Qt.PartiallyChecked
+    assert _check_state(model, 0) == QtCore.Qt.PartiallyChecked
+    assert _check_state(model, 1) == QtCore.Qt.Unchecked
+    # one dataChanged for each level
+    assert len(changed_list) == 3
+
+    model.setData(model.index(0, 0), QtCore.Qt.Checked, QtCore.Qt.CheckStateRole)
+    assert _check_state(model, 0, 1, 2) == QtCore.Qt.Checked
+    assert _check_state(model, 0, 0) == QtCore.Qt.Checked
+
+    model.setData(leaf_index, QtCore.Qt.Unchecked, QtCore.Qt.CheckStateRole)
+    assert _check_state(model, 0, 0) == QtCore.Qt.PartiallyChecked
+    assert _check_state(model, 0) == QtCore.Qt.PartiallyChecked
+    model.setData(leaf_index, QtCore.Qt.Checked, QtCore.Qt.CheckStateRole)
+    assert _check_state(model, 0) == QtCore.Qt.Checked
+
+
+def test_check_state_select_all_and_invert(qtbot):
+    """Select all/invert of top level rows emit one dataChanged for the root."""
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name", "checkable": True}])
+    model.set_data_list([{"name": str(i)} for i in range(1000)])
+    index_list = [model.index(row, 0) for row in range(model.rowCount())]
+    model.setData(model.index(3, 0), QtCore.Qt.Checked, QtCore.Qt.CheckStateRole)
+    changed_list = []
+    model.dataChanged.connect(
+        lambda top_left, bottom_right, *args: changed_list.append(
+            (top_left.row(), bottom_right.row())
+        )
+    )
+    model.set_check_state(index_list, None)
+    assert changed_list == [(0, 999)]
+    assert _check_state(model, 3) == QtCore.Qt.Unchecked
+    assert _check_state(model, 4) == QtCore.Qt.Checked
+    model.set_check_state(index_list, QtCore.Qt.Unchecked)
+    assert all(_check_state(model, row) == QtCore.Qt.Unchecked for row in range(1000))
+
+
+def test_group_row_ranges():
+    """The rows are grouped into contiguous ranges."""
+    assert group_row_ranges([5, 1, 2, 3, 9, 2, 10]) == [(1, 3), (5, 5), (9, 10)]
+    assert group_row_ranges([]) == []
+
+
+def _make_name_model(count):
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name"}])
+    model.set_data_list([{"name": i} for i in range(count)])
+    return model
+
+
+def _names(model, parent_index=None):
+    parent_index = parent_index or QtCore.QModelIndex()
+    return [
+        model.index(row, 0, parent_index).internalPointer()["name"]
+        for row in range(model.rowCount(parent_index))
+    ]
+
+
+def test_remove_many(qtbot):
+    """remove_many emits one notification per contiguous range."""
+    model = _make_name_model(100)
+    data_list = list(model.get_data_list())
+    remove_list = []
+    model.rowsRemoved.connect(
+        lambda parent, first, last: remove_list.append((first, last))
+    )
+    model.remove_many(
+        [data_list[i] for i in (10, 11, 12, 50, 99)] + [model.index(13, 0)]
+    )
+    assert remove_list == [(99, 99), (50, 50), (10, 13)]
+    assert _names(model) == [i for i in range(100) if i not in (10, 11, 12, 13, 50, 99)]
+    assert model.get_item_index(data_list[20]).row() == 16
+
+    model.remove_rows([(0, 4), (3, 6), (90, 200)])
+    assert remove_list[-2:] == [(90, 93), (0, 6)]
+    assert _names(model)[0] == 7
+
+
+def test_remove_many_through_proxy(qtbot):
+    """The proxy indexes of a selection can be removed directly."""
+    model = _make_name_model(10)
+    proxy_model = MSortFilterModel()
+    proxy_model.setSourceModel(model)
+    proxy_model.set_header_list(model.header_list)
+    proxy_model.sort(0, QtCore.Qt.DescendingOrder)
+    model.remove_many([proxy_model.index(0, 0), proxy_model.index(1, 0)])
+    assert _names(model) == list(range(8))
+    assert proxy_model.rowCount() == 8
+
+
+@pytest.mark.parametrize(
+    "row_list, destination, result",
+    (
+        ([1, 2, 5], 0, [1, 2, 5, 0, 3, 4, 6, 7]),
+        ([1, 2, 5], 8, [0, 3, 4, 6, 7, 1, 2, 5]),
+        ([0, 6], 4, [1, 2, 3, 0, 6, 4, 5, 7]),
+        ([2, 3, 4], 3, [0, 1, 2, 3, 4, 5, 6, 7]),
+        ([2, 3], 4, [0, 1, 2, 3, 4, 5, 6, 7]),
+        ([6, 1], 3, [0, 2, 1, 6, 3, 4, 5, 7]),
+    ),
+)
+def test_move_rows(qtbot, row_list, destination, result):
+    """The moved rows keep their order, one notification per range."""
+    model = _make_name_model(8)
+    data_list = list(model.get_data_list())
+    move_list = []
+    model.rowsMoved.connect(lambda *args: move_list.append(args))
+    model.move_rows([data_list[row] for row in row_list], destination)
+    assert _names(model) == result
+    assert len(move_list) <= len(group_row_ranges(row_list))
+    for row, name in enumerate(result):
+        assert model.get_item_index(data_list[name]).row() == row
+
+
+def test_move_rows_to_other_parent(qtbot):
+    """The rows can be moved under another parent."""
+    model = _make_name_model(6)
+    data_list = list(model.get_data_list())
+    parent_obj = data_list[5]
+    model.move_rows([data_list[1], data_list[2], data_list[4]], 0, model.index(5, 0))
+    assert _names(model) == [0, 3, 5]
+    parent_index = model.index(2, 0)
+    assert _names(model, parent_index) == [1, 2, 4]
+    assert model.parent(model.index(2, 0, parent_index)).internalPointer() is parent_obj
+
+
+def test_upsert(qtbot):
+    """upsert updates the rows in place with minimal notifications."""
+    model = MTableModel()
+    model.set_header_list(
+        [
+            {"label": "Name", "key": "name"},
+            {"label": "Status", "key": "status"},
+            {"label": "Progress", "key": "progress"},
+        ]
+    )
+    model.set_data_list(
+        [
+            {"id": i, "name": "job_{}".format(i), "status": "wait", "progress": 0}
+            for i in range(10)
+        ]
+    )
+    data_obj = model.get_data_list()[3]
+    persistent_index = QtCore.QPersistentModelIndex(model.index(3, 0))
+    signal_list = []
+    model.modelReset.connect(lambda: signal_list.append("reset"))
+    model.rowsInserted.connect(
+        lambda parent, first, last: signal_list.append(("insert", first, last))
+    )
+    model.rowsRemoved.connect(
+        lambda parent, first, last: signal_list.append(("remove", first, last))
+    )
+    model.dataChanged.connect(
+        lambda top_left, bottom_right, *args: signal_list.append(
+            (
+                "change",
+                top_left.row(),
+                top_left.column(),
+                bottom_right.row(),
+                bottom_right.column(),
+            )
+        )
+    )
+    record_list = [
+        {"id": i, "name": "job_{}".format(i), "status": "wait", "progress": 0}
+        for i in range(10)
+        if i not in (0, 1)
+    ]
+    record_list[1]["status"] = "run"
+    record_list[2]["status"] = "run"
+    record_list[2]["progress"] = 50
+    record_list.append({"id": 10, "name": "job_10", "status": "wait", "progress": 0})
+    result = model.upsert(record_list)
+    assert result == {"inserted": 1, "updated": 2, "removed": 2}
+    assert signal_list == [
+        ("change", 3, 1, 4, 2),
+        ("remove", 0, 1),
+        ("insert", 8, 8),
+    ]
+    assert model.get_data_list()[1] is data_obj
+    assert persistent_index.row() == 1
+    assert model.data(model.index(1, 1)) == "run"
+
+    signal_list[:] = []
+    assert model.upsert(record_list) == {"inserted": 0, "updated": 0, "removed": 0}
+    assert signal_list == []
+
+
+@pytest.mark.parametrize(
+    "old_list, new_list",
+    (
+        ([2, 3, 1], [4, 3, 5]),
+        ([5, 1, 4, 2, 3], [0, 9, 4, 8, 1]),
+        ([1, 2, 3, 4, 5, 6], [6, 5, 4, 3, 2, 1]),
+    ),
+)
+def test_upsert_sorted_proxy(qtbot, old_list, new_list):
+    """A sorting proxy model keeps the rows in order after upsert."""
+    model = MTableModel()
+    model.set_header_list([{"label": "Value", "key": "v"}])
+    model.set_data_list([{"id": i, "v": v} for i, v in enumerate(old_list)])
+    proxy_model = MSortFilterModel()
+    proxy_model.setSourceModel(model)
+    proxy_model.set_header_list(model.header_list)
+    proxy_model.sort(0)
+    model.upsert([{"id": i, "v": v} for i, v in enumerate(new_list)])
+    assert [
+        proxy_model.index(row, 0).data() for row in range(proxy_model.rowCount())
+    ] == sorted(new_list)
+
+
+def test_sort_filter_model_typed_sort(qtbot):
+    """Typed sort compares the raw values or the sort_key, not the display text."""
+    header_list = [
+        {
+            "label": "Size",
+            "key": "size",
+            "display": lambda x, y: "{:.2f}".format(x or 0),
+        },
+        {"label": "Name", "key": "name", "sort_key": lambda x, y: x.lower()},
+    ]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(
+        [
+            {"size": 10.0, "name": "b"},
+            {"size": 9.0, "name": "C"},
+            {"size": None, "name": "a"},
+            {"size": 100.5, "name": "D"},
+        ]
+    )
+    proxy_model = MSortFilterModel()
+    proxy_model.setSourceModel(model)
+    proxy_model.set_header_list(header_list)
+
+    def sorted_column(column):
+        return [
+            proxy_model.mapToSource(proxy_model.index(row, 0)).internalPointer()[
+                header_list[column]["key"]
+            ]
+            for row in range(proxy_model.rowCount())
+        ]
+
+    proxy_model.sort(0)
+    assert sorted_column(0)[1:] == [10.0, 100.5, 9.0]
+    proxy_model.set_typed_sort_enabled(True)
+    proxy_model.sort(0)
+    assert sorted_column(0) == [9.0, 10.0, 100.5, None]
+    proxy_model.sort(0, QtCore.Qt.DescendingOrder)
+    assert sorted_column(0) == [100.5, 10.0, 9.0, None]
+
+    proxy_model.sort(1, QtCore.Qt.DescendingOrder)
+    assert sorted_column(1) == ["D", "C", "b", "a"]
+    # the source model and the other proxy models keep their order
+    other_proxy_model = MSortFilterModel()
+    other_proxy_model.setSourceModel(model)
+    assert [data_obj["name"] for data_obj in model.get_data_list()] == [
+        "b",
+        "C",
+        "a",
+        "D",
+    ]
+    assert other_proxy_model.index(0, 1).data() == "b"
+
+    model.append({"size": 1.0, "name": "bb"})
+    model.append({"size": 2.0, "name": "ba"})
+    assert sorted_column(1) == ["D", "C", "bb", "ba", "b", "a"]
+    model.setData(model.index(2, 1), "z")
+    assert sorted_column(1) == ["z", "D", "C", "bb", "ba", "b"]
+    # sorted by the display text again
+    proxy_model.set_typed_sort_enabled(False)
+    assert sorted_column(1) == ["z", "bb", "ba", "b", "D", "C"]
+    proxy_model.sort(1)
+    assert sorted_column(1) == ["C", "D", "b", "ba", "bb", "z"]
+
+
+class _CountLessThanModel(MSortFilterModel):
+    less_than_count = 0
+
+    def lessThan(self, source_left, source_right):
+        self.less_than_count += 1
+        return super(_CountLessThanModel, self).lessThan(source_left, source_right)
+
+
+def test_sort_filter_model_typed_sort_rows(qtbot):
+    """Typed sort orders the rows with one sorted() permutation, not lessThan."""
+    header_list = [{"label": "Value", "key": "v", "searchable": True}]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(
+        [
+            {"v": 3, "children": [{"v": 2}, {"v": None}, {"v": 1}]},
+            {"v": 1},
+            {"v": None},
+            {"v": 2},
+        ]
+    )
+    proxy_model = _CountLessThanModel()
+    proxy_model.setSourceModel(model)
+    proxy_model.set_header_list(header_list)
+    proxy_model.set_typed_sort_enabled(True)
+    proxy_model.sort(0)
+    assert proxy_model.sortColumn() == 0
+    assert proxy_model.sourceModel() is model
+
+    def sorted_values(parent_index=QtCore.QModelIndex()):
+        return [
+            real_index(proxy_model.index(row, 0, parent_index)).internalPointer()["v"]
+            for row in range(proxy_model.rowCount(parent_index))
+        ]
+
+    assert sorted_values() == [1, 2, 3, None]
+    parent_index = proxy_model.index(2, 0)
+    assert sorted_values(parent_index) == [1, 2, None]
+    assert proxy_model.parent(proxy_model.index(0, 0, parent_index)) == parent_index
+    # the real index is an index of the source model
+    assert real_index(parent_index).model() is model
+    assert real_index(parent_index).row() == 0
+
+    persistent_index = QtCore.QPersistentModelIndex(proxy_model.index(1, 0))
+    model.append_many([{"v": 0}, {"v": 5}, {"v": 2}])
+    assert sorted_values() == [0, 1, 2, 2, 3, 5, None]
+    assert persistent_index.row() == 2
+    model.append_many([{"v": 1.5}], model.index(0, 0))
+    assert sorted_values(proxy_model.index(4, 0)) == [1, 1.5, 2, None]
+    model.remove(model.get_data_list()[1])
+    assert sorted_values() == [0, 2, 2, 3, 5, None]
+    assert persistent_index.row() == 1
+    model.setData(model.index(1, 0), 10)
+    assert sorted_values() == [0, 2, 2, 3, 5, 10]
+    # the parent row is kept for its matched child row
+    proxy_model.set_search_pattern("2")
+    assert sorted_values() == [2, 2, 3]
+    proxy_model.set_search_pattern("")
+
+    # values of different types are compared as text
+    model.append({"v": "a"})
+    assert sorted_values() == [0, 10, 2, 2, 3, 5, "a"]
+    proxy_model.sort(0, QtCore.Qt.DescendingOrder)
+    assert sorted_values() == ["a", 5, 3, 2, 2, 10, 0]
+    assert proxy_model.less_than_count == 0
+    assert [data_obj["v"] for data_obj in model.get_data_list()] == [
+        3,
+        10,
+        2,
+        0,
+        5,
+        2,
+        "a",
+    ]
+
+
+def test_sort_filter_model_column_filter_per_proxy(qtbot):
+    """The proxy models sharing one header list keep their own column filters."""
+    header_list = [{"label": "Name", "key": "name"}, {"label": "City", "key": "city"}]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(
+        [
+            {"name": "Jack", "city": "Beijing"},
+            {"name": "Jim", "city": "Shanghai"},
+            {"name": "Lucy", "city": "Beijing"},
+        ]
+    )
+    proxy_list = []
+    for _ in range(2):
+        proxy_model = MSortFilterModel()
+        proxy_model.setSourceModel(model)
+        proxy_model.set_header_list(header_list)
+        proxy_list.append(proxy_model)
+    proxy_list[0].set_filter_attr_pattern("city", "beijing")
+    proxy_list[1].set_filter_attr_pattern("name", "j.*")
+    assert proxy_list[0].rowCount() == 2
+    assert proxy_list[1].rowCount() == 2
+    assert "reg" not in header_list[0] and "reg" not in header_list[1]
+    proxy_list[0].set_filter_attr_pattern("city", "")
+    assert proxy_list[0].rowCount() == 3
+    assert proxy_list[1].rowCount() == 2
+
+
+def test_shared_model_filter_cache(qtbot, monkeypatch):
+    """The proxy models over one shared model reuse the filter results."""
+    header_list = [{"label": "Name", "key": "name", "searchable": True}]
+    model = get_shared_model("test_shared_model")
+    assert get_shared_model("test_shared_model") is model
+    model.set_header_list(header_list)
+    model.set_data_list([{"name": "item_{}".format(i)} for i in range(100)])
+    proxy_list = []
+    for _ in range(2):
+        proxy_model = MSortFilterModel()
+        proxy_model.setSourceModel(model)
+        proxy_model.set_header_list(header_list)
+        proxy_model.set_text_index_enabled(True)
+        proxy_list.append(proxy_model)
+
+    call_list = []
+    origin_accepts_item = MSortFilterModel._accepts_item
+
+    def _accepts_item(self, *args):
+        call_list.append(args[0])
+        return origin_accepts_item(self, *args)
+
+    monkeypatch.setattr(MSortFilterModel, "_accepts_item", _accepts_item)
+    proxy_list[0].set_search_pattern("_1")
+    assert proxy_list[0].rowCount() == 11
+    assert len(call_list) == 100
+    proxy_list[1].set_search_pattern("_1")
+    assert proxy_list[1].rowCount() == 11
+    assert len(call_list) == 100
+
+    model.setData(model.index(0, 0), "item_1000")
+    assert proxy_list[0].rowCount() == proxy_list[1].rowCount() == 12
+    assert len(call_list) == 101
+
+    assert release_shared_model("test_shared_model") is model
+    assert get_shared_model("test_shared_model") is not model
+    release_shared_model("test_shared_model")
+
+
+def test_shared_model_filter_state_in_use(qtbot):
+    """The filter result used by a proxy model is not dropped by the others."""
+    header_list = [{"label": "Name", "key": "name", "searchable": True}]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list([{"name": "apple"}, {"name": "pear"}])
+    proxy_list = []
+    for _ in range(2):
+        proxy_model = MSortFilterModel()
+        proxy_model.setSourceModel(model)
+        proxy_model.set_header_list(header_list)
+        proxy_model.set_text_index_enabled(True)
+        proxy_list.append(proxy_model)
+    proxy_list[0].set_search_pattern("apple")
+    assert proxy_list[0].rowCount() == 1
+    for i in range(9):
+        proxy_list[1].set_search_pattern("pattern_{}".format(i))
+        assert proxy_list[1].rowCount() == 0
+    model.setData(model.index(0, 0), "zzz")
+    assert proxy_list[0].rowCount() == 0
@@ -0,0 +1,208 @@
+"""
+Test MOptionDelegate and the thumbnail loading of MBigView.
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import built-in modules
+import os
+
+# Import third-party modules
+from Qt import QtCore
+from Qt import QtGui
+from Qt import QtWidgets
+from dayu_widgets import item_view
+from dayu_widgets.item_model import MTableModel
+from dayu_widgets.item_view import MBigView
+from dayu_widgets.item_view import MOptionDelegate
+from dayu_widgets.item_view import MTableView
+from dayu_widgets.item_view import MThumbnailLoader
+from dayu_widgets.item_view import interned_arrow_pixmap
+
+
+def test_option_delegate_arrow_pixmap_cache(qtbot):
+    """Painting the cells with the same height scales the arrow only once."""
+    model = MTableModel()
+    model.set_header_list([{"label": "Name", "key": "name", "selectable": True}])
+    model.set_data_list([{"name": "a"}, {"name": "b"}])
+    delegate = MOptionDelegate()
+    interned_arrow_pixmap.clear()
+
+    canvas = QtGui.QPixmap(100, 60)
+    painter = QtGui.QPainter(canvas)
+    for row in range(2):
+        option = QtWidgets.QStyleOptionViewItem()
+        option.rect = QtCore.QRect(0, row * 30, 100, 30)
+        delegate.paint(painter, option, model.index(row, 0))
+    painter.end()
+    assert len(interned_arrow_pixmap) == 1
+
+    pix = interned_arrow_pixmap((30, "#fff", 2.0))
+    assert pix.width() == 30
+    assert pix.devicePixelRatio() == 2.0
+    assert len(interned_arrow_pixmap) == 2
+
+
+def _save_image(path, width, height):
+    image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
+    image.fill(QtGui.QColor("#f00"))
+    assert image.save(str(path))
+    return str(path)
+
+
+def test_thumbnail_loader(qtbot, tmpdir):
+    """The thumbnails are decoded in background, scaled and kept in a LRU cache."""
+    loader = MThumbnailLoader(max_size=2)
+    path_list = [
+        _save_image(tmpdir.join("{}.png".format(i)), 400, 200) for i in range(3)
+    ]
+    size = QtCore.QSize(100, 100)
+
+    with qtbot.waitSignal(loader.sig_thumbnail_ready) as blocker:
+        assert loader.get_thumbnail(path_list[0], size) is None
+        assert loader.is_loading()
+    assert blocker.args == [path_list[0]]
+    pix_map = loader.get_thumbnail(path_list[0], size)
+    assert (pix_map.width(), pix_map.height()) == (100, 50)
+    assert not loader.is_loading()
+
+    for path in path_list[1:]:
+        with qtbot.waitSignal(loader.sig_thumbnail_ready):
+            loader.get_thumbnail(path, size)
+    assert loader.cached_count() == 2
+    with qtbot.waitSignal(loader.sig_thumbnail_ready):
+        assert loader.get_thumbnail(path_list[0], size) is None  # evicted
+
+    with qtbot.waitSignal(loader.sig_thumbnail_ready):
+        assert loader.get_thumbnail(path_list[2], QtCore.QSize(50, 50)) is None
+    assert loader.get_thumbnail(path_list[2], QtCore.QSize(50, 50)).width() == 50
+
+
+def test_thumbnail_loader_bad_file(qtbot, tmpdir):
+    """A file can not be read gets a null pixmap, and is not requested again."""
+    loader = MThumbnailLoader()
+    path = str(tmpdir.join("missing.png"))
+    with qtbot.waitSignal(loader.sig_thumbnail_ready):
+        assert loader.get_thumbnail(path, QtCore.QSize(64, 64)) is None
+    assert loader.get_thumbnail(path, QtCore.QSize(64, 64)).isNull()
+    assert not loader.is_loading()
+
+
+def test_thumbnail_loader_reload(qtbot, tmpdir, monkeypatch):
+    """The files are not checked when painted, only when reloaded."""
+    loader = MThumbnailLoader()
+    path = _save_image(tmpdir.join("image.png"), 400, 200)
+    size = QtCore.QSize(100, 100)
+    with qtbot.waitSignal(loader.sig_thumbnail_ready):
+        loader.get_thumbnail(path, size)
+
+    stat_list = []
+    getmtime = os.path.getmtime
+    monkeypatch.setattr(
+        os.path, "getmtime", lambda x: stat_list.append(x) or getmtime(x)
+    )
+    for _ in range(10):
+        assert loader.get_thumbnail(path, size).width() == 100
+    assert stat_list == []
+    assert loader.reload() == []
+    assert stat_list == [path]
+
+    _save_image(path, 200, 400)
+    mtime = getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+    with qtbot.waitSignal(loader.sig_thumbnail_ready) as blocker:
+        assert loader.reload(path) == [path]
+    assert blocker.args == [path]
+    with qtbot.waitSignal(loader.sig_thumbnail_ready):
+        assert loader.get_thumbnail(path, size) is None
+    assert loader.get_thumbnail(path, size).width() == 50
+
+
+class _ThumbnailView(MBigView):
+    def __init__(self, parent=None):
+        super(_ThumbnailView, self).__init__(parent)
+        self.ready_list = []
+
+    def _slot_thumbnail_ready(self, path):
+        self.ready_list.append(path)
+
+
+def test_big_view_swap_thumbnail_loader(qtbot):
+    """The view can switch to another thumbnail loader."""
+    view = _ThumbnailView()
+    qtbot.addWidget(view)
+    old_loader = view.set_thumbnail_loader()
+    new_loader = MThumbnailLoader(parent=view)
+    assert view.set_thumbnail_loader(new_loader) is new_loader
+    assert view.thumbnail_loader is new_loader
+    assert view.itemDelegate().loader is new_loader
+    old_loader.sig_thumbnail_ready.emit("old.png")
+    new_loader.sig_thumbnail_ready.emit("new.png")
+    assert view.ready_list == ["new.png"]
+
+
+def _get_link_table_view(qtbot, monkeypatch):
+    # the link columns do not use MHeaderView, keep the view light
+    monkeypatch.setattr(item_view, "MHeaderView", QtWidgets.QHeaderView)
+    header_list = [
+        {"label": "Name", "key": "name"},
+        {"label": "Link", "key": "link", "is_link": True},
+    ]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list(
+        [
+            {"name": "dict", "link": {"name": "target"}},
+            {"name": "str", "link": "target"},
+            {"name": "list", "link": [{"name": "a"}, {"name": "b"}]},
+            {"name": "empty", "link": None},
+        ]
+    )
+    view = MTableView()
+    qtbot.addWidget(view)
+    view.setModel(model)
+    view.set_header_list(header_list)
+    return view, model
+
+
+def test_table_view_link_value(qtbot, monkeypatch):
+    """Only the cells of the is_link columns are links, the values are cached."""
+    view, model = _get_link_table_view(qtbot, monkeypatch)
+    assert view.hasMouseTracking()
+    assert view.get_link_value(model.index(0, 0)) is None
+    assert view.get_link_value(model.index(3, 1)) is None
+    assert view.get_link_value(QtCore.QModelIndex()) is None
+    value, data_obj = view.get_link_value(model.index(1, 1))
+    assert value == "target"
+    assert data_obj is model.get_data_list()[1]
+    assert len(view._link_cache) == 2
+
+    model.setData(model.index(1, 1), "other")
+    assert view._link_cache == {}
+    assert view.get_link_value(model.index(1, 1))[0] == "other"
+    model.layoutChanged.emit()
+    assert view._link_cache == {}
+
+
+def test_table_view_link_clicked(qtbot, monkeypatch):
+    """The clicked link emits the dict, the record of a str, or each list item."""
+    view, model = _get_link_table_view(qtbot, monkeypatch)
+    view.resize(400, 300)
+    view.show()
+    data_list = model.get_data_list()
+    payload_list = []
+    view.sig_link_clicked.connect(payload_list.append)
+    for row in range(4):
+        qtbot.mouseClick(
+            view.viewport(),
+            QtCore.Qt.LeftButton,
+            pos=view.visualRect(model.index(row, 1)).center(),
+        )
+    assert payload_list == [
+        data_list[0]["link"],
+        data_list[1],
+        data_list[2]["link"][0],
+        data_list[2]["link"][1],
+    ]
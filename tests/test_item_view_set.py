@@ -0,0 +1,66 @@
+"""
+Test the shared source model and the chunked search of MItemViewSet.
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import third-party modules
+from dayu_widgets.item_model import MTableModel
+from dayu_widgets.item_view import MListView
+from dayu_widgets.item_view_set import MItemViewSet
+
+
+def test_item_view_set_source_model(qtbot):
+    """The view sets over one model share it, and use its header list."""
+    header_list = [{"label": "Name", "key": "name", "searchable": True}]
+    model = MTableModel()
+    model.set_header_list(header_list)
+    model.set_data_list([{"name": "item_{}".format(i)} for i in range(20)])
+
+    view_set_list = []
+    for _ in range(2):
+        view_set = MItemViewSet(view_type=MListView)
+        qtbot.addWidget(view_set)
+        assert view_set.set_source_model(model) is view_set
+        view_set_list.append(view_set)
+    for view_set in view_set_list:
+        assert view_set.source_model is model
+        assert view_set.sort_filter_model.sourceModel() is model
+        assert view_set.sort_filter_model.text_index_enabled
+        assert view_set.sort_filter_model.header_list is header_list
+        assert view_set.item_view.header_list is header_list
+
+    view_set_list[0].sort_filter_model.set_search_pattern("_1")
+    assert view_set_list[0].sort_filter_model.rowCount() == 11
+    assert view_set_list[1].sort_filter_model.rowCount() == 20
+
+    # a model without header list gets the one of the view set
+    other_model = MTableModel()
+    view_set_list[1].set_source_model(other_model)
+    assert other_model.header_list is header_list
+
+
+def test_item_view_set_chunked_search(qtbot, monkeypatch):
+    """The chunked search can be set up twice, and clearing the text filters once."""
+    view_set = MItemViewSet(view_type=MListView)
+    qtbot.addWidget(view_set)
+    view_set.set_header_list([{"label": "Name", "key": "name", "searchable": True}])
+    view_set.setup_data([{"name": "item_{}".format(i)} for i in range(20)])
+    assert view_set.chunked_search() is view_set
+    assert view_set.chunked_search(delay=100) is view_set
+    assert view_set.sort_filter_model.chunked_filter_enabled
+
+    pattern_list = []
+    monkeypatch.setattr(
+        view_set.sort_filter_model, "set_search_pattern", pattern_list.append
+    )
+    line_edit = view_set.search_line_edit
+    line_edit.setText("item_1")
+    assert pattern_list == []
+    line_edit.sig_delay_text_changed.emit("item_1")
+    assert pattern_list == ["item_1"]
+    line_edit.setText("")
+    line_edit.sig_delay_text_changed.emit("")
+    assert pattern_list == ["item_1", ""]
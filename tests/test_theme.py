@@ -0,0 +1,157 @@
+"""
+Test MTheme.
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import third-party modules
+from Qt import QtWidgets
+from dayu_widgets import dayu_theme
+from dayu_widgets import theme
+from dayu_widgets import utils
+from dayu_widgets.qt import MPixmap
+from dayu_widgets.theme import MTheme
+from dayu_widgets.theme import PRESET_PALETTE_DICT
+from dayu_widgets.theme import get_color_palette
+from dayu_widgets.theme import get_theme_size
+import pytest
+
+
+def test_theme_size_attributes(qtbot):
+    """The sizes are computed once and set as real attributes on first use."""
+    assert get_theme_size() is get_theme_size()
+    test_theme = MTheme("dark")
+    assert "small" not in vars(test_theme)
+    assert test_theme.small == get_theme_size()["small"]
+    assert vars(test_theme)["drag_size"] == get_theme_size()["drag_size"]
+    assert test_theme.not_a_size == 0
+
+
+def test_theme_size_dpi_changed(qtbot, monkeypatch):
+    """The sizes follow the DPI, the ones changed by the user are kept."""
+    test_theme = MTheme("dark")
+    small = test_theme.small
+    large = test_theme.large
+    test_theme.default_size = large
+    scale_x, scale_y = theme.get_scale_factor()
+    monkeypatch.setattr(theme, "get_scale_factor", lambda: (scale_x * 2, scale_y * 2))
+    test_theme._slot_screen_changed()
+    assert test_theme.small == get_theme_size()["small"]
+    assert test_theme.small != small
+    assert test_theme.large != large
+    assert test_theme.default_size == large
+
+
+def test_theme_qss_cache(qtbot):
+    """The style sheet is substituted once until the theme changes."""
+    test_theme = MTheme("dark")
+    qss = test_theme.get_qss()
+    assert test_theme.get_qss() is qss
+    assert "@" not in qss
+
+    test_theme.set_primary_color(MTheme.red)
+    assert test_theme.get_qss() is not qss
+    assert test_theme.primary_6 in test_theme.get_qss()
+
+
+class _FakeApplication(object):
+    def __init__(self):
+        self.style_sheet_list = []
+
+    def setStyleSheet(self, style_sheet):
+        self.style_sheet_list.append(style_sheet)
+
+
+def test_theme_apply_application(qtbot):
+    """In application mode, the style sheet is set once on the QApplication."""
+    test_theme = MTheme("dark")
+    widget = QtWidgets.QWidget()
+    qtbot.addWidget(widget)
+    test_theme.apply(widget)
+    assert widget.styleSheet() == test_theme.get_qss()
+
+    app = _FakeApplication()
+    test_theme.apply_application(app)
+    widget = QtWidgets.QWidget()
+    qtbot.addWidget(widget)
+    test_theme.apply(widget)
+    assert widget.styleSheet() == ""
+    assert app.style_sheet_list == [test_theme.get_qss()]
+
+
+def test_theme_lazy_init():
+    """The palette and the qss template are only built on first use."""
+    test_theme = MTheme("light")
+    assert "primary_6" not in vars(test_theme)
+    assert "default_qss" not in vars(test_theme)
+    assert test_theme.primary_6 == get_color_palette(MTheme.blue)[5]
+    assert test_theme.background_color == "#f8f8f9"
+
+    test_theme = MTheme("light")
+    test_theme.set_primary_color(MTheme.red)
+    test_theme.text_color_inverse = "#000"
+    assert test_theme.primary_color == MTheme.red
+    assert test_theme.primary_1 == get_color_palette(MTheme.red)[0]
+    assert test_theme.text_color_inverse == "#000"
+
+
+@pytest.mark.parametrize("color", sorted(PRESET_PALETTE_DICT.keys()) + ["#123456"])
+def test_color_palette(color):
+    """The precomputed palettes are the same as generate_color."""
+    palette = get_color_palette(color)
+    assert palette == tuple(
+        utils.generate_color(color, index) for index in range(1, 11)
+    )
+
+
+def test_theme_switch(qtbot):
+    """Switching the theme applies the new style sheet to the tracked widgets."""
+    test_theme = MTheme("dark")
+    widget = QtWidgets.QWidget()
+    qtbot.addWidget(widget)
+    test_theme.apply(widget)
+    dead_widget = QtWidgets.QWidget()
+    test_theme.apply(dead_widget)
+    del dead_widget
+
+    with qtbot.waitSignal(test_theme.sig_theme_changed):
+        test_theme.set_theme("light")
+    assert widget.styleSheet() == test_theme.get_qss()
+    assert test_theme.background_color in widget.styleSheet()
+    assert list(test_theme._widget_set) == [widget]
+
+    # the child gets the style sheet from its tracked parent
+    child_widget = QtWidgets.QWidget(widget)
+    test_theme.apply(child_widget)
+    other_widget = QtWidgets.QWidget()
+    qtbot.addWidget(other_widget)
+    test_theme.apply(other_widget)
+    with qtbot.waitSignal(test_theme.sig_theme_changed):
+        test_theme.set_theme("dark")
+    assert widget.styleSheet() == test_theme.get_qss()
+    assert other_widget.styleSheet() == test_theme.get_qss()
+    assert child_widget.styleSheet() == ""
+
+    with qtbot.waitSignal(test_theme.sig_theme_changed):
+        test_theme.set_primary_color(MTheme.green)
+    assert test_theme.primary_6 in widget.styleSheet()
+
+
+def test_theme_switch_pixmap_cache(qtbot):
+    """The cached pixmaps rendered with the icon color of dayu_theme are dropped."""
+    test_theme = MTheme("dark")
+    MPixmap("check.svg")
+    MPixmap("check.svg", "#ff0000")
+    key_list = list(MPixmap._cache_pix_dict.keys())
+    assert len(key_list) >= 2
+    # the other themes do not change the icon color of MPixmap
+    test_theme.set_theme("light")
+    assert list(MPixmap._cache_pix_dict.keys()) == key_list
+    dayu_theme.set_theme("light")
+    try:
+        assert all(key[1] is not None for key in MPixmap._cache_pix_dict)
+        assert any(key[1] == "#ff0000" for key in MPixmap._cache_pix_dict)
+    finally:
+        dayu_theme.set_theme("dark")
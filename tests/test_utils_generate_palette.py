@@ -0,0 +1,50 @@
+"""
+Test generate_palette and generate_palettes.
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import built-in modules
+import random
+
+# Import third-party modules
+from Qt import QtGui
+from dayu_widgets import utils
+import pytest
+
+
+def _random_color_list(count):
+    rand = random.Random(count)
+    return ["#{:06x}".format(rand.randrange(1 << 24)) for _ in range(count)]
+
+
+@pytest.mark.parametrize(
+    "color",
+    ["#f5222d", "#a0d911", "#722ed1", "#ffb7b2", "#000000", "#ffffff", "#808080"]
+    + _random_color_list(200),
+)
+def test_generate_palette(color):
+    """The palette is exactly the same as generate_color for each step."""
+    result = tuple(utils.generate_color(color, index) for index in range(1, 11))
+    assert utils.generate_palette(color) == result
+    assert utils.generate_palette(QtGui.QColor(color)) == result
+
+
+def test_generate_palettes():
+    """The palettes are in the same order as the colors, and memoized."""
+    color_list = _random_color_list(50)
+    palette_list = utils.generate_palettes(color_list)
+    assert palette_list == [utils.generate_palette(color) for color in color_list]
+    assert utils.generate_palettes(color_list)[0] is palette_list[0]
+
+
+def test_generate_palette_hsv_color():
+    """The QColor made from HSV gets its own palette, even with the same RGB."""
+    rgb_color = QtGui.QColor(128, 128, 128)
+    hsv_color = QtGui.QColor.fromHsv(200, 0, 128)
+    assert rgb_color.rgba() == hsv_color.rgba()
+    for color in (rgb_color, hsv_color):
+        result = tuple(utils.generate_color(color, index) for index in range(1, 11))
+        assert utils.generate_palette(color) == result
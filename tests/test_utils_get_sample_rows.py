@@ -0,0 +1,34 @@
+"""
+Test get_sample_rows.
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import third-party modules
+from dayu_widgets import utils
+import pytest
+
+
+@pytest.mark.parametrize(
+    "row_count, first, last, sample_size, result",
+    (
+        (0, 0, 10, 100, []),
+        (5, 0, 2, 100, [0, 1, 2, 3, 4]),
+        (5, -1, 10, 0, [0, 1, 2, 3, 4]),
+        (1000, 10, 12, 0, [10, 11, 12]),
+    ),
+)
+def test_get_sample_rows(row_count, first, last, sample_size, result):
+    """Test get_sample_rows with small data."""
+    assert utils.get_sample_rows(row_count, first, last, sample_size) == result
+
+
+def test_get_sample_rows_large():
+    """Only the visible rows and the sample are measured."""
+    row_list = utils.get_sample_rows(1000000, 100, 130, sample_size=50, seed=1)
+    assert set(range(100, 131)).issubset(row_list)
+    assert 31 < len(row_list) <= 81
+    assert row_list == sorted(set(row_list))
+    assert row_list == utils.get_sample_rows(1000000, 100, 130, 50, seed=1)
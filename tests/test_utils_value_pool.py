@@ -0,0 +1,68 @@
+"""
+Test MValuePool and the interned Qt value formatters.
+"""
+# Import future modules
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Import third-party modules
+from Qt import QtCore
+from Qt import QtGui
+from dayu_widgets import utils
+import pytest
+
+
+@pytest.mark.parametrize(
+    "value_1, value_2",
+    (
+        ("#ff0000", "#FF0000"),
+        ("#ff0000", " #ff0000 "),
+        ("red", "Red"),
+        (QtGui.QColor("#00ff00"), "#00ff00"),
+    ),
+)
+def test_interned_color(qtbot, value_1, value_2):
+    """Same color config value gets the same QColor object."""
+    color = utils.interned_color(value_1)
+    assert isinstance(color, QtGui.QColor)
+    assert color == QtGui.QColor(value_1)
+    if isinstance(value_1, QtGui.QColor):
+        assert utils.interned_color(value_1) is color
+    else:
+        assert utils.interned_color(value_2) is color
+
+
+def test_interned_font(qtbot):
+    """Same font setting gets the same QFont object."""
+    font = utils.interned_font({"underline": True})
+    assert font.underline()
+    assert not font.bold()
+    assert utils.interned_font({"underline": True, "bold": None}) is font
+    assert utils.interned_font({"underline": True, "bold": True}) is not font
+
+
+def test_interned_size(qtbot):
+    """Same size config gets the same QSize object."""
+    size = utils.interned_size((100, 20))
+    assert size == QtCore.QSize(100, 20)
+    assert utils.interned_size([100, 20]) is size
+
+
+def test_value_pool_bound_and_unhashable():
+    """The pool never grows over max_size, unhashable values are not interned."""
+    call_list = []
+
+    def _factory(value):
+        call_list.append(value)
+        return [value]
+
+    pool = utils.MValuePool(_factory, max_size=2)
+    assert pool(1) is pool(1)
+    pool(2)
+    pool(3)
+    assert len(pool) <= 2
+    assert pool([4]) is not pool([4])
+    assert call_list == [1, 2, 3, [4], [4]]
+    pool.clear()
+    assert len(pool) == 0